@@ -0,0 +1,153 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analysis.profiling import timed
+
+# scipy.sparse is imported by the functions that build and query matrices, so
+# analyzers can hold an AffinityCache without loading scipy at startup
+
+# Results kept per analyzer (one per data version and filters)
+AFFINITY_CACHE_SIZE = 8
+
+
+@timed('affinity.matrix')
+def customer_product_matrix(customers, products):
+    """Binary customer x product CSR matrix (1 where the customer bought the product)
+
+    Returns the matrix and the product labels of its columns. Only
+    customers and products that occur get a row or column; repeat purchases
+    of a product by the same customer count once.
+    """
+    import scipy.sparse as sp
+
+    customer_codes, customer_labels = pd.factorize(customers)
+    product_codes, product_labels = pd.factorize(products)
+    valid = (customer_codes >= 0) & (product_codes >= 0)
+    shape = (len(customer_labels), len(product_labels))
+    matrix = sp.csr_matrix(
+        (np.ones(int(valid.sum()), dtype=np.int32), (customer_codes[valid], product_codes[valid])),
+        shape=shape
+    )
+    # Conversion summed repeat purchases; keep presence only
+    matrix.data[:] = 1
+    return matrix, pd.Index(product_labels, name='Product')
+
+
+class ProductAffinity:
+    """Co-purchase statistics of products over a binary customer x product matrix
+
+    ``cooccurrence = Bᵀ·B`` counts, for every pair of products, the customers
+    who bought both; its diagonal is each product's customer count. The work
+    is one sparse product whose cost grows with the products per customer,
+    not with customers x products, and the pairs are never materialized
+    through a self-join.
+    """
+
+    def __init__(self, matrix, products):
+        import scipy.sparse as sp
+
+        self.matrix = sp.csr_matrix(matrix)
+        self.products = pd.Index(products, name='Product')
+        self.n_customers = int(np.count_nonzero(np.diff(self.matrix.indptr)))
+        self.cooccurrence = (self.matrix.T @ self.matrix).tocsr()
+        self.support = self.cooccurrence.diagonal()
+
+    @classmethod
+    def from_transactions(cls, df):
+        return cls(*customer_product_matrix(df['Customer_ID'], df['Product']))
+
+    @property
+    def nbytes(self):
+        return sum(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+                   for m in (self.matrix, self.cooccurrence)) + self.support.nbytes
+
+    def _scores(self, a, b, both):
+        """Support, confidence (of b given a) and lift for pair arrays"""
+        n = max(self.n_customers, 1)
+        support_a = self.support[a].astype(np.float64)
+        support_b = self.support[b].astype(np.float64)
+        return both / n, both / support_a, both * n / (support_a * support_b)
+
+    @timed('affinity.pairs')
+    def pairs(self, min_customers=2, top=None, sort_by='Lift'):
+        """Product pairs bought by at least min_customers of the same customers
+
+        Each unordered pair appears once; Confidence is P(Product_B | Product_A)
+        with Product_A the more widely bought of the two.
+        """
+        import scipy.sparse as sp
+
+        upper = sp.triu(self.cooccurrence, k=1).tocoo()
+        keep = upper.data >= min_customers
+        a, b, both = upper.row[keep], upper.col[keep], upper.data[keep].astype(np.float64)
+        # Orient each pair from the more to the less widely bought product
+        swap = self.support[b] > self.support[a]
+        a, b = np.where(swap, b, a), np.where(swap, a, b)
+        support, confidence, lift = self._scores(a, b, both)
+        result = pd.DataFrame({
+            'Product_A': self.products[a],
+            'Product_B': self.products[b],
+            'Customers': both.astype(np.int64),
+            'Support': support,
+            'Confidence': confidence,
+            'Lift': lift
+        }).sort_values([sort_by, 'Customers'], ascending=False, kind='stable').reset_index(drop=True)
+        return result.head(top) if top else result
+
+    def lift_matrix(self):
+        """Dense product x product lift (diagonal NaN); meant for a modest number of products"""
+        support = np.maximum(self.support, 1).astype(np.float64)
+        lift = self.cooccurrence.toarray() * max(self.n_customers, 1) / np.outer(support, support)
+        np.fill_diagonal(lift, np.nan)
+        return pd.DataFrame(lift, index=self.products, columns=self.products.rename(None))
+
+    def also_bought(self, product, top=10, min_customers=1):
+        """Products most often bought by the customers who bought ``product``"""
+        columns = ['Product', 'Customers', 'Confidence', 'Lift']
+        position = self.products.get_indexer([product])[0]
+        if position < 0:
+            return pd.DataFrame(columns=columns)
+        row = self.cooccurrence.getrow(position)
+        others = (row.indices != position) & (row.data >= min_customers)
+        b, both = row.indices[others], row.data[others].astype(np.float64)
+        _, confidence, lift = self._scores(np.full(len(b), position), b, both)
+        return pd.DataFrame({
+            'Product': self.products[b],
+            'Customers': both.astype(np.int64),
+            'Confidence': confidence,
+            'Lift': lift
+        }, columns=columns).sort_values(['Customers', 'Lift'], ascending=False,
+                                        kind='stable').head(top).reset_index(drop=True)
+
+
+class AffinityCache:
+    """Least recently used ProductAffinity results by key (data version and filters), shared by an analyzer's views"""
+
+    def __init__(self, size=AFFINITY_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+
+    def get(self, key, build):
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        affinity = build()
+        with self._lock:
+            self._results[key] = affinity
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+        return affinity
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(affinity.nbytes for affinity in self._results.values())
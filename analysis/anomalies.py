@@ -0,0 +1,311 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analysis.dates import date_keys
+from analysis.profiling import timed
+
+# Dimensions identifying one daily series
+SERIES_KEYS = ['Category', 'Region', 'Product']
+
+# Consistency constants: scaled MAD / mean absolute deviation estimate the
+# standard deviation of normal data
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+# Spare day columns kept after a fit (and the minimum step when growing)
+MIN_SPARE_DAYS = 32
+
+# Memory allowed for the rolling window views of one block of series
+_BLOCK_BYTES = 64 * 2**20
+
+
+def _series_codes(df, keys):
+    """Integer series id per row and the key values of each series"""
+    codes = np.zeros(len(df), dtype=np.int64)
+    level_labels = []
+    for key in keys:
+        key_codes, key_labels = pd.factorize(df[key], sort=True)
+        level_labels.append(np.asarray(key_labels, dtype=object))
+        codes = codes * len(key_labels) + key_codes
+    # Keep only combinations that occur, numbered in key order
+    present, series = np.unique(codes, return_inverse=True)
+    labels = {}
+    for key, key_labels in zip(reversed(keys), reversed(level_labels)):
+        present, code = np.divmod(present, len(key_labels))
+        labels[key] = key_labels[code]
+    return series, pd.DataFrame({key: labels[key] for key in keys})
+
+
+@timed('anomalies.series_matrix')
+def series_matrix(df, keys=SERIES_KEYS, value='Total_Amount'):
+    """Dense series x day matrix of daily totals (days without sales are 0)
+
+    Returns the matrix, the series labels (one row per matrix row) and the
+    dates of the matrix columns.
+    """
+    series, labels = _series_codes(df, keys)
+    days = date_keys(df['Date']).astype(np.int64)
+    first_day = int(days.min()) if len(days) else 0
+    n_days = int(days.max()) - first_day + 1 if len(days) else 0
+    matrix = np.bincount(series * n_days + (days - first_day),
+                         weights=df[value].to_numpy(np.float64),
+                         minlength=len(labels) * n_days).reshape(len(labels), n_days)
+    dates = pd.to_datetime(np.arange(first_day, first_day + n_days), unit='D')
+    return matrix, labels, dates
+
+
+def _median(values):
+    """Median over the last axis
+
+    Sorting short windows is faster than the partition np.median uses.
+    """
+    ordered = np.sort(values, axis=-1)
+    n = ordered.shape[-1]
+    return 0.5 * (ordered[..., (n - 1) // 2] + ordered[..., n // 2])
+
+
+def robust_baseline(history, min_scale=1.0):
+    """Median and robust scale of each row over the last axis
+
+    The scale is the scaled MAD, falling back to the scaled mean absolute
+    deviation where the MAD is zero (sparse series whose window is mostly
+    empty days), and never below ``min_scale``.
+    """
+    median = _median(history)
+    deviation = np.abs(history - median[..., None])
+    scale = MAD_SCALE * _median(deviation)
+    fallback = MEAN_AD_SCALE * deviation.mean(axis=-1)
+    scale = np.where(scale > 0, scale, fallback)
+    return median, np.maximum(scale, min_scale)
+
+
+@timed('anomalies.rolling_scores')
+def rolling_scores(matrix, window=28, min_scale=1.0):
+    """Trailing-window baseline, scale and z-score for every series and day at once
+
+    Day t is scored against days t-window .. t-1, so the first ``window``
+    days have no score (NaN). Series are processed in blocks that bound the
+    memory of the window views.
+    """
+    n_series, n_days = matrix.shape
+    baseline = np.full(matrix.shape, np.nan)
+    scale = np.full(matrix.shape, np.nan)
+    if n_days > window:
+        block_rows = max(1, _BLOCK_BYTES // ((n_days - window) * window * 8))
+        for start in range(0, n_series, block_rows):
+            block = matrix[start:start + block_rows]
+            # Window ending the day before each scored day
+            history = sliding_window_view(block, window, axis=1)[:, :-1]
+            baseline[start:start + block_rows, window:], scale[start:start + block_rows, window:] = \
+                robust_baseline(history, min_scale)
+    with np.errstate(invalid='ignore'):
+        z = (matrix - baseline) / scale
+    return baseline, scale, z
+
+
+class AnomalyDetector:
+    """Robust rolling z-scores for every Category x Region x Product daily series
+
+    The transactions are pivoted once into a dense series x day matrix.
+    Baselines (rolling median) and scales (rolling MAD) are computed for
+    all series together with array operations. append_day() adds one more
+    day and scores only that column against the trailing window; the
+    arrays keep spare day columns so appending does not copy them.
+    """
+
+    def __init__(self, window=28, threshold=3.5, min_scale=1.0, keys=SERIES_KEYS, value='Total_Amount'):
+        self.window = window
+        self.threshold = threshold
+        self.min_scale = min_scale
+        self.keys = list(keys)
+        self.value = value
+        # Values, baselines, scales and z-scores; columns past _n_days are spare capacity
+        self._matrix = self._baseline = self._scale = self._z = np.zeros((0, 0))
+        self._n_days = 0
+        self.labels = pd.DataFrame(columns=self.keys)
+        self.dates = pd.DatetimeIndex([])
+        self._index = {}
+
+    @timed('anomalies.fit')
+    def fit(self, df):
+        """Build the series matrix from transactions and score every day"""
+        matrix, self.labels, self.dates = series_matrix(df, self.keys, self.value)
+        self._index = {tuple(row): i for i, row in enumerate(self.labels.itertuples(index=False))}
+        baseline, scale, z = rolling_scores(matrix, self.window, self.min_scale)
+        self._n_days = matrix.shape[1]
+        capacity = self._n_days + max(MIN_SPARE_DAYS, self._n_days // 4)
+        self._matrix, self._baseline, self._scale, self._z = (
+            np.full((len(self.labels), capacity), fill) for fill in (0.0, np.nan, np.nan, np.nan))
+        for buffer, values in zip(self._buffers, (matrix, baseline, scale, z)):
+            buffer[:, :self._n_days] = values
+        return self
+
+    @property
+    def _buffers(self):
+        return self._matrix, self._baseline, self._scale, self._z
+
+    @property
+    def matrix(self):
+        return self._matrix[:, :self._n_days]
+
+    @property
+    def baseline(self):
+        return self._baseline[:, :self._n_days]
+
+    @property
+    def scale(self):
+        return self._scale[:, :self._n_days]
+
+    @property
+    def z(self):
+        return self._z[:, :self._n_days]
+
+    @property
+    def n_series(self):
+        return len(self.labels)
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self._buffers)
+
+    def _reserve_days(self, extra):
+        """Make room for extra day columns, growing the capacity geometrically"""
+        needed = self._n_days + extra
+        capacity = self._matrix.shape[1]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity + max(MIN_SPARE_DAYS, capacity // 4))
+        grown = []
+        for buffer, fill in zip(self._buffers, (0.0, np.nan, np.nan, np.nan)):
+            array = np.full((buffer.shape[0], capacity), fill)
+            array[:, :self._n_days] = buffer[:, :self._n_days]
+            grown.append(array)
+        self._matrix, self._baseline, self._scale, self._z = grown
+
+    def _day_totals(self, df_day):
+        """Totals per known series for one day's transactions, adding rows for new series"""
+        series, labels = _series_codes(df_day, self.keys)
+        rows = np.empty(len(labels), dtype=np.int64)
+        new = []
+        for i, row in enumerate(labels.itertuples(index=False)):
+            key = tuple(row)
+            if key not in self._index:
+                self._index[key] = self.n_series + len(new)
+                new.append(key)
+            rows[i] = self._index[key]
+        if new:
+            # Series first seen today have an all-zero history (rare, so rows grow exactly)
+            self._matrix, self._baseline, self._scale, self._z = (
+                np.vstack([buffer, np.full((len(new), buffer.shape[1]), fill)])
+                for buffer, fill in zip(self._buffers, (0.0, np.nan, np.nan, np.nan)))
+            self.labels = pd.concat([self.labels, pd.DataFrame(new, columns=self.keys)], ignore_index=True)
+        totals = np.zeros(self.n_series)
+        np.add.at(totals, rows[series], df_day[self.value].to_numpy(np.float64))
+        return totals
+
+    @timed('anomalies.append_day')
+    def append_day(self, df_day, date=None):
+        """Append one day of transactions and score it; returns that day's anomalies
+
+        Cost is O(series x window): the new column is scored and written into
+        spare capacity. A day without transactions needs its ``date``.
+        """
+        if date is None:
+            if df_day.empty:
+                # Nothing to append; an empty result with the usual columns
+                return self.anomalies(threshold=np.inf)
+            date = df_day['Date'].iloc[0]
+        date = pd.Timestamp(date).normalize()
+        if len(self.dates) and date != self.dates[-1] + pd.Timedelta(days=1):
+            raise ValueError(f"Expected the day after {self.dates[-1].date()}, got {date.date()}")
+        totals = self._day_totals(df_day)
+
+        baseline = np.full(self.n_series, np.nan)
+        scale = np.full(self.n_series, np.nan)
+        if self._n_days >= self.window:
+            baseline, scale = robust_baseline(self.matrix[:, -self.window:], self.min_scale)
+        with np.errstate(invalid='ignore'):
+            z = (totals - baseline) / scale
+
+        self._reserve_days(1)
+        for buffer, column in zip(self._buffers, (totals, baseline, scale, z)):
+            buffer[:, self._n_days] = column
+        self._n_days += 1
+        self.dates = self.dates.append(pd.DatetimeIndex([date]))
+        return self.anomalies(start_date=date, end_date=date, top=None)
+
+    @timed('anomalies.extend')
+    def extend(self, df):
+        """Append every day from the day after the last one through the last date in df
+
+        Days without transactions are appended as zeros. Returns False
+        (leaving the detector unchanged) when df has rows on or before the
+        last scored day, which need a refit.
+        """
+        if df.empty:
+            return True
+        days = pd.to_datetime(df['Date']).dt.normalize()
+        if len(self.dates) and days.min() <= self.dates[-1]:
+            return False
+        start = days.min() if not len(self.dates) else self.dates[-1] + pd.Timedelta(days=1)
+        by_day = {date: rows for date, rows in df.groupby(days, sort=True)}
+        for date in pd.date_range(start, days.max(), freq='D'):
+            self.append_day(by_day.get(date, df.iloc[:0]), date=date)
+        return True
+
+    def _series_mask(self, categories=None, regions=None):
+        mask = np.ones(self.n_series, dtype=bool)
+        for key, values in (('Category', categories), ('Region', regions)):
+            if values and key in self.labels:
+                mask &= self.labels[key].isin(list(values)).to_numpy()
+        return mask
+
+    @timed('anomalies.anomalies')
+    def anomalies(self, start_date=None, end_date=None, categories=None, regions=None,
+                  threshold=None, top=50):
+        """Series-days whose |z| reaches the threshold, strongest first"""
+        threshold = self.threshold if threshold is None else threshold
+        day_mask = np.ones(len(self.dates), dtype=bool)
+        if start_date:
+            day_mask &= self.dates >= pd.to_datetime(start_date)
+        if end_date:
+            day_mask &= self.dates <= pd.to_datetime(end_date)
+        series_mask = self._series_mask(categories, regions)
+
+        z = self.z[np.ix_(series_mask, day_mask)]
+        with np.errstate(invalid='ignore'):
+            rows, cols = np.nonzero(np.abs(z) >= threshold)
+        series = np.flatnonzero(series_mask)[rows]
+        days = np.flatnonzero(day_mask)[cols]
+        strength = np.abs(self.z[series, days])
+        if top is not None and len(strength) > top:
+            # Partial selection of the strongest, then sort only those
+            keep = np.argpartition(-strength, top - 1)[:top]
+            series, days, strength = series[keep], days[keep], strength[keep]
+        order = np.argsort(-strength, kind='stable')
+        series, days = series[order], days[order]
+
+        result = self.labels.iloc[series].reset_index(drop=True)
+        result.insert(0, 'Date', self.dates[days])
+        result['Value'] = self.matrix[series, days]
+        result['Baseline'] = self.baseline[series, days]
+        result['Z_Score'] = self.z[series, days]
+        result['Direction'] = np.where(result['Z_Score'] > 0, 'Spike', 'Drop')
+        return result
+
+    def daily_counts(self, start_date=None, end_date=None, categories=None, regions=None, threshold=None):
+        """Number of anomalous series per day (spikes and drops)"""
+        threshold = self.threshold if threshold is None else threshold
+        z = self.z[self._series_mask(categories, regions)]
+        with np.errstate(invalid='ignore'):
+            counts = pd.DataFrame({
+                'Date': self.dates,
+                'Spikes': (z >= threshold).sum(axis=0),
+                'Drops': (z <= -threshold).sum(axis=0)
+            })
+        if start_date:
+            counts = counts[counts['Date'] >= pd.to_datetime(start_date)]
+        if end_date:
+            counts = counts[counts['Date'] <= pd.to_datetime(end_date)]
+        return counts.reset_index(drop=True)
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from analysis.dates import date_keys
+from analysis.profiling import timed
+
+# RFM segment by recency score (rows) and frequency score (columns), 1-5 each
+SEGMENT_GRID = [
+    # F=1            F=2            F=3                  F=4                  F=5
+    ['Lost',         'Hibernating', 'At Risk',           'At Risk',           "Can't Lose Them"],  # R=1
+    ['Hibernating',  'Hibernating', 'At Risk',           'At Risk',           'At Risk'],          # R=2
+    ['About to Sleep', 'About to Sleep', 'Needs Attention', 'Loyal Customers', 'Loyal Customers'],  # R=3
+    ['Promising',    'Potential Loyalists', 'Potential Loyalists', 'Loyal Customers', 'Loyal Customers'],  # R=4
+    ['New Customers', 'Potential Loyalists', 'Potential Loyalists', 'Champions', 'Champions'],     # R=5
+]
+SEGMENTS = sorted({segment for row in SEGMENT_GRID for segment in row})
+
+
+def _customer_codes(customer_ids):
+    """Integer codes per row and the distinct customer labels"""
+    if isinstance(customer_ids.dtype, pd.CategoricalDtype):
+        codes = customer_ids.cat.codes.to_numpy(np.int64)
+        used = np.bincount(codes[codes >= 0], minlength=len(customer_ids.cat.categories)) > 0
+        # Drop categories with no rows (e.g. after filtering) and re-number the codes
+        remap = np.cumsum(used) - 1
+        codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], -1)
+        return codes, customer_ids.cat.categories[used]
+    codes, labels = pd.factorize(customer_ids, sort=False)
+    return codes.astype(np.int64), labels
+
+
+@timed('customers.aggregates')
+def customer_aggregates(df):
+    """Last purchase date, transaction count and total spend per customer in one pass"""
+    codes, labels = _customer_codes(df['Customer_ID'])
+    valid = codes >= 0
+    codes = codes[valid]
+    n = len(labels)
+
+    keys = date_keys(df['Date'])[valid].astype(np.int64)
+    last_key = np.full(n, np.iinfo(np.int64).min)
+    np.maximum.at(last_key, codes, keys)
+
+    return pd.DataFrame({
+        'Customer_ID': np.asarray(labels),
+        'Last_Purchase': pd.to_datetime(last_key, unit='D'),
+        'Frequency': np.bincount(codes, minlength=n),
+        'Monetary': np.bincount(codes, weights=df['Total_Amount'].to_numpy(np.float64)[valid], minlength=n)
+    })
+
+
+def _quintile_scores(values):
+    """Score 1-5 by quintile, higher value -> higher score (ties share the higher score)
+
+    Cut points come from np.partition, which is O(n), instead of a full sort.
+    """
+    n = len(values)
+    if n == 0:
+        return np.empty(0, dtype=np.int8)
+    positions = [int(np.ceil(k * n / 5)) for k in range(1, 5)]
+    positions = [min(p, n - 1) for p in positions]
+    cuts = np.partition(values, positions)[positions]
+    return (1 + np.searchsorted(cuts, values, side='right')).astype(np.int8)
+
+
+@timed('customers.score_rfm')
+def score_rfm(aggregates, reference_date=None):
+    """Add recency, RFM scores and segment to per-customer aggregates
+
+    Recency is counted in days from ``reference_date`` (default: the day
+    after the latest purchase).
+    """
+    rfm = aggregates.copy()
+    if reference_date is None:
+        reference_date = rfm['Last_Purchase'].max() + pd.Timedelta(days=1)
+    rfm['Recency'] = (pd.Timestamp(reference_date) - rfm['Last_Purchase']).dt.days.astype(np.int64)
+
+    rfm['R_Score'] = _quintile_scores(-rfm['Recency'].to_numpy())
+    rfm['F_Score'] = _quintile_scores(rfm['Frequency'].to_numpy())
+    rfm['M_Score'] = _quintile_scores(rfm['Monetary'].to_numpy())
+    rfm['RFM_Score'] = (rfm['R_Score'].astype(np.int64) * 100 + rfm['F_Score'] * 10 + rfm['M_Score']).astype(np.int16)
+
+    # Look up segment codes in the R x F grid, no per-customer strings are built
+    grid = np.array([[SEGMENTS.index(segment) for segment in row] for row in SEGMENT_GRID])
+    codes = grid[rfm['R_Score'].to_numpy() - 1, rfm['F_Score'].to_numpy() - 1]
+    rfm['Segment'] = pd.Categorical.from_codes(codes, categories=SEGMENTS)
+
+    return rfm[['Customer_ID', 'Recency', 'Frequency', 'Monetary', 'Last_Purchase',
+                'R_Score', 'F_Score', 'M_Score', 'RFM_Score', 'Segment']]
+
+
+def rfm_table(df, reference_date=None):
+    """Recency, frequency, monetary value, scores and segment for every customer"""
+    if df.empty:
+        return score_rfm(pd.DataFrame({
+            'Customer_ID': pd.Series(dtype=object),
+            'Last_Purchase': pd.Series(dtype='datetime64[ns]'),
+            'Frequency': pd.Series(dtype=np.int64),
+            'Monetary': pd.Series(dtype=np.float64)
+        }), reference_date or pd.Timestamp.today().normalize())
+    return score_rfm(customer_aggregates(df), reference_date)
+
+
+def top_customers(rfm, n=10, by='Monetary', ascending=False):
+    """Top N customers by a column using partial selection instead of a full sort"""
+    values = rfm[by].to_numpy()
+    if not ascending:
+        values = -values
+    n = min(n, len(values))
+    if n <= 0:
+        return rfm.iloc[:0]
+    # argpartition is O(rows); only the selected n are sorted
+    candidates = np.argpartition(values, n - 1)[:n]
+    ordered = candidates[np.argsort(values[candidates], kind='stable')]
+    return rfm.iloc[ordered].reset_index(drop=True)
+
+
+def segment_summary(rfm):
+    """Customer count, revenue and average recency per RFM segment"""
+    summary = rfm.groupby('Segment', observed=True).agg(
+        Customers=('Customer_ID', 'count'),
+        Monetary=('Monetary', 'sum'),
+        Avg_Recency=('Recency', 'mean'),
+        Avg_Frequency=('Frequency', 'mean')
+    ).reset_index()
+    summary['Segment'] = summary['Segment'].astype(str)
+    return summary.sort_values('Monetary', ascending=False).reset_index(drop=True)
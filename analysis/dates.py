@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+# Integer date key: days since 1970-01-01
+DATE_KEY = 'Date_Key'
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June',
+               'July', 'August', 'September', 'October', 'November', 'December']
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Time features attached to each transaction by SalesAnalyzer.clean_data
+TRANSACTION_DATE_FEATURES = ['Year', 'Month', 'Month_Name', 'Quarter', 'Day_of_Week', 'Week']
+
+# Calendar features used by SalesForecastModel
+MODEL_DATE_FEATURES = ['Year', 'Month', 'Day', 'DayOfWeek', 'DayOfYear', 'WeekOfYear',
+                       'Quarter', 'IsWeekend', 'IsMonthStart', 'IsMonthEnd']
+
+
+def date_keys(dates):
+    """Convert dates to integer day keys"""
+    values = pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]')
+    return values.astype(np.int64).astype(np.int32)
+
+
+def build_date_dimension(start, end):
+    """Build one row of calendar attributes per day between start and end (inclusive)
+
+    The frame is indexed by a contiguous ``Date_Key`` range, so a lookup is
+    a single array offset rather than a join.
+    """
+    dates = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+    dim = pd.DataFrame({'Date': dates})
+    dim['Year'] = dates.year
+    dim['Month'] = dates.month
+    dim['Month_Name'] = pd.Categorical.from_codes(
+        dates.month - 1, categories=MONTH_NAMES, ordered=True
+    )
+    dim['Quarter'] = dates.quarter
+    dim['Day'] = dates.day
+    dim['DayOfWeek'] = dates.dayofweek
+    dim['Day_of_Week'] = pd.Categorical.from_codes(
+        dates.dayofweek, categories=DAY_NAMES, ordered=True
+    )
+    dim['DayOfYear'] = dates.dayofyear
+    dim['Week'] = dates.isocalendar().week.to_numpy(dtype=np.int64)
+    dim['WeekOfYear'] = dim['Week']
+    dim['IsWeekend'] = (dim['DayOfWeek'] >= 5).astype(int)
+    dim['IsMonthStart'] = dates.is_month_start.astype(int)
+    dim['IsMonthEnd'] = dates.is_month_end.astype(int)
+    dim.index = pd.Index(date_keys(dates), name=DATE_KEY)
+    return dim
+
+
+def date_dimension_for(dates):
+    """Date dimension covering the full range of the given dates"""
+    return build_date_dimension(dates.min(), dates.max())
+
+
+def lookup(dimension, keys, columns, categorical=True):
+    """Gather dimension columns for an array of date keys
+
+    Categorical columns are returned as categoricals unless ``categorical``
+    is False, in which case they come back as plain strings.
+    """
+    positions = np.asarray(keys, dtype=np.int64) - dimension.index[0]
+    if len(positions) and (positions.min() < 0 or positions.max() >= len(dimension)):
+        raise ValueError("Date key outside the range of the date dimension")
+
+    result = {}
+    for col in columns:
+        values = dimension[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            gathered = pd.Categorical.from_codes(values.cat.codes.to_numpy()[positions], dtype=values.dtype)
+            result[col] = gathered if categorical else np.asarray(gathered)
+        else:
+            result[col] = values.to_numpy()[positions]
+    return result
+
+
+def add_date_features(df, columns=TRANSACTION_DATE_FEATURES, dimension=None, categorical=True):
+    """Attach a Date_Key and calendar columns to df via the date dimension
+
+    Calendar attributes are computed once per distinct day, so the cost
+    scales with the number of days instead of the number of rows.
+    Returns the frame and the dimension used.
+    """
+    keys = date_keys(df['Date'])
+    if dimension is None:
+        dimension = date_dimension_for(df['Date'])
+    df[DATE_KEY] = keys
+    for col, values in lookup(dimension, keys, columns, categorical=categorical).items():
+        df[col] = values
+    return df, dimension
+
+
+def date_features(dates, columns=MODEL_DATE_FEATURES):
+    """Calendar features for a sequence of dates as a DataFrame"""
+    dates = pd.DatetimeIndex(dates)
+    dimension = date_dimension_for(dates)
+    return pd.DataFrame(lookup(dimension, date_keys(dates), columns))
@@ -1,117 +1,640 @@
+import re
+import copy
+import threading
+import json
+import hashlib
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder
 import warnings
+from analysis.profiling import timed, timed_block
+from analysis.dates import add_date_features, date_dimension_for, TRANSACTION_DATE_FEATURES, MONTH_NAMES
+from analysis.customers import rfm_table
+from analysis.sketches import CustomerSketch, QuantileSketch, quantile_label
+from analysis.rolling import RollingStats
+from analysis.anomalies import AnomalyDetector
+from analysis.affinity import AffinityCache
+from analysis.snapshot import Snapshot, write_snapshot, source_fingerprint, is_fresh
+from analysis.validation import SALES_SCHEMA, write_quarantine
+from analysis.export import EXPORT_COLUMNS, CHUNK_ROWS
 warnings.filterwarnings('ignore')
 
+# Simplified profit model - assuming 30% average margin
+PROFIT_MARGIN = 0.30
+
+# Aggregations a ParallelAggregator merges from per-partition sums and counts
+PARALLEL_AGGREGATIONS = {'sum', 'mean', 'count'}
+
+# Low-cardinality text columns stored as pandas categoricals in compact mode
+CATEGORICAL_COLUMNS = [
+    'Customer_ID', 'Customer_Segment', 'Product', 'Category', 'Region',
+    'Payment_Method', 'Shipping_Method', 'Month_Name', 'Day_of_Week'
+]
+
+# Numeric columns downcast to the smallest integer type that holds their values
+# (float32 if any value is fractional or missing)
+INTEGER_COLUMNS = ['Quantity', 'Discount_Percent', 'Year', 'Month', 'Quarter', 'Week']
+
+# Declared unique key of a transaction row
+TRANSACTION_KEY = 'Transaction_ID'
+
+# Value columns with per-partition quantile sketches
+DISTRIBUTION_COLUMNS = ['Total_Amount', 'Unit_Price']
+
+
+def widen(series):
+    """Upcast a compact numeric column to 64 bits before aggregating it
+
+    Grouped sums keep the input dtype, so an int8 ``Quantity`` would overflow.
+    """
+    if pd.api.types.is_integer_dtype(series) and series.dtype.itemsize < 8:
+        return series.astype('int64')
+    if pd.api.types.is_float_dtype(series) and series.dtype.itemsize < 8:
+        return series.astype('float64')
+    return series
+
+
+def parse_transaction_ids(ids):
+    """Parse IDs such as 'TXN001000' to int64 (None if they are not prefix + digits)
+
+    Works on the fixed-width byte view of the column instead of per-string
+    regex/int calls, so parsing stays cheaper than hashing the strings.
+    """
+    if pd.api.types.is_integer_dtype(ids):
+        return ids.astype('int64')
+    if len(ids) == 0:
+        return None
+    try:
+        raw = np.asarray(ids.to_numpy(), dtype='S')
+    except (UnicodeEncodeError, ValueError):
+        return None
+    width = raw.dtype.itemsize
+    codes = raw.view(np.uint8).reshape(len(raw), width)
+    
+    # Every ID must share the first ID's prefix, otherwise stripped IDs could collide
+    prefix_len = len(re.match(rb'\D*', raw[0]).group())
+    if width - prefix_len > 18 or (codes[:, :prefix_len] != codes[0, :prefix_len]).any():
+        return None
+    
+    # Shorter IDs are NUL-padded, which fails the digit check as intended
+    digits = codes[:, prefix_len:].astype(np.int64) - ord('0')
+    if width == prefix_len or ((digits < 0) | (digits > 9)).any():
+        return None
+    powers = 10 ** np.arange(width - prefix_len - 1, -1, -1, dtype=np.int64)
+    return pd.Series(digits @ powers, index=ids.index, name=ids.name)
+
+
+def format_transaction_ids(ids, prefix, digits):
+    """Inverse of parse_transaction_ids: integers back to zero-padded IDs with their prefix"""
+    return prefix + pd.Series(ids).astype('int64').astype(str).str.zfill(digits)
+
+
+def _version_id(*parts):
+    """Short id of the data an analyzer holds, from whatever identifies it"""
+    return hashlib.sha1(json.dumps(parts, default=str).encode('utf-8')).hexdigest()[:12]
+
+
+def filters_key(filters):
+    """Hashable, order-independent form of a view's filters (unset filters left out)"""
+    return tuple(sorted(
+        (name, tuple(sorted(map(str, value))) if isinstance(value, (list, tuple, set)) else str(value))
+        for name, value in filters.items() if value
+    ))
+
+
+@timed('eda.deduplicate')
+def deduplicate_transactions(df, key=TRANSACTION_KEY, verify=False):
+    """Drop repeated transactions by declared key instead of hashing whole rows
+
+    With ``verify=True`` rows sharing a key must be identical, otherwise a
+    ValueError is raised. The result is tagged in ``df.attrs`` so downstream
+    consumers can skip deduplication.
+    """
+    if key not in df.columns:
+        # No declared key - fall back to full-row comparison
+        deduped = df.drop_duplicates()
+    else:
+        keys = parse_transaction_ids(df[key])
+        if keys is None:
+            keys = df[key]
+        repeated = keys.duplicated()
+        
+        if verify and repeated.any():
+            shared = df[keys.duplicated(keep=False)]
+            distinct_rows = len(shared.drop_duplicates())
+            distinct_keys = keys[shared.index].nunique()
+            if distinct_rows != distinct_keys:
+                conflicting = shared.drop_duplicates()[key]
+                conflicting = conflicting[conflicting.duplicated()].unique()[:5]
+                raise ValueError(
+                    f"{distinct_rows - distinct_keys} rows share a {key} with different values "
+                    f"(e.g. {', '.join(map(str, conflicting))})"
+                )
+        
+        deduped = df[~repeated.values]
+    
+    deduped.attrs['deduplicated_on'] = key if key in df.columns else 'all_columns'
+    deduped.attrs['duplicates_removed'] = len(df) - len(deduped)
+    return deduped
+
+
+def is_deduplicated(df):
+    """Whether the frame already went through deduplicate_transactions"""
+    return 'deduplicated_on' in df.attrs
+
+
+def validate_transactions(df, schema=SALES_SCHEMA, quarantine_path=None, first_row=0, append=False):
+    """Rows of df that pass the schema (parsed); failing rows go to the quarantine file"""
+    result = schema.validate(df, first_row=first_row)
+    if quarantine_path:
+        write_quarantine(result.quarantined, quarantine_path, append=append)
+    elif result.n_quarantined:
+        print(f"Dropped {result.n_quarantined} invalid rows")
+    valid = result.valid
+    valid.attrs['quarantined_rows'] = result.n_quarantined
+    return valid
+
+
+def load_transactions(data_path, verify_duplicates=False, integer_ids=False, categorical=False,
+                      schema=SALES_SCHEMA, quarantine_path=None):
+    """Read the sales CSV, validate and parse it, and deduplicate once at ingestion
+
+    With ``categorical=True`` the text columns in CATEGORICAL_COLUMNS are
+    parsed straight into categoricals. Rows failing ``schema`` are dropped
+    and, with ``quarantine_path``, written there with their reasons.
+    ``schema=None`` skips validation.
+    """
+    with timed_block('eda.load_csv'):
+        dtypes = {col: 'category' for col in CATEGORICAL_COLUMNS} if categorical else None
+        df = pd.read_csv(data_path, dtype=dtypes)
+    
+    if schema is not None:
+        # Line 1 of the file is the header
+        df = validate_transactions(df, schema, quarantine_path, first_row=2)
+    else:
+        df['Date'] = pd.to_datetime(df['Date'])
+    
+    if integer_ids and TRANSACTION_KEY in df.columns:
+        parsed = parse_transaction_ids(df[TRANSACTION_KEY])
+        if parsed is not None:
+            # Kept so exports can write the IDs as they appeared in the source
+            if not pd.api.types.is_integer_dtype(df[TRANSACTION_KEY]):
+                first = str(df[TRANSACTION_KEY].iloc[0])
+                prefix = re.match(r'\D*', first).group()
+                df.attrs['transaction_id_prefix'] = prefix
+                df.attrs['transaction_id_digits'] = len(first) - len(prefix)
+            df[TRANSACTION_KEY] = parsed
+    
+    return deduplicate_transactions(df, verify=verify_duplicates)
+
+
+def value_quantiles(values, quantiles=(0.5, 0.9, 0.99), groups=None):
+    """Exact count and quantiles of values, overall or per group (lower-rank, like the sketches)"""
+    labels = [quantile_label(q) for q in quantiles]
+    values = values.astype('float64')
+    if groups is None:
+        row = values.quantile(list(quantiles), interpolation='lower').tolist() if len(values) else [np.nan] * len(quantiles)
+        return pd.DataFrame([[len(values)] + row], columns=['Transactions'] + labels)
+    grouped = values.groupby(groups, observed=True)
+    result = grouped.quantile(list(quantiles), interpolation='lower').unstack()
+    result = result.reindex(columns=list(quantiles)).set_axis(labels, axis=1)
+    result.insert(0, 'Transactions', grouped.size())
+    result = result.reset_index()
+    result[groups.name] = result[groups.name].astype(str)
+    return result
+
+
 class SalesAnalyzer:
-    def __init__(self, data_path):
-        """Initialize the analyzer with data"""
-        self.df = pd.read_csv(data_path)
-        self.df['Date'] = pd.to_datetime(self.df['Date'])
+    def __init__(self, data_path, compact=False, verify_duplicates=False, snapshot_path=None,
+                 schema=SALES_SCHEMA, quarantine_path=None, workers=None):
+        """Initialize the analyzer with data
+
+        With ``compact=True`` numeric columns are downcast, text columns become
+        categoricals, transaction IDs are stored as integers and ``Profit`` is
+        computed on demand instead of stored.
+        
+        With ``snapshot_path`` the cleaned columns are served from a
+        memory-mapped snapshot file: an up-to-date snapshot of data_path is
+        opened directly (no CSV parsing or cleaning), otherwise the CSV is
+        cleaned once and the snapshot written for the next process. Without
+        data_path the snapshot is opened as is.
+        
+        Rows failing ``schema`` are left out and, with ``quarantine_path``,
+        written there with the reasons they failed.
+        
+        With ``workers`` above 1 the grouped sums, counts and means behind the
+        breakdowns run on a ParallelAggregator with that many processes;
+        filtered views share it. Call close() to release it; the analyzer
+        and its views then compute serially.
+        """
+        self.data_path = data_path
+        self.compact = compact
+        self.filters = {}
+        self.customer_sketch = None
+        self.distribution_sketches = {}
+        self.anomaly_detector = None
+        self.snapshot = None
+        self.schema = schema
+        self.affinity_cache = AffinityCache()
+        self.workers = workers
+        self.parallel = None
+        self._parallel_lock = threading.Lock()
+        # Rows of the parallel aggregator's frame this view selects (None: all of them)
+        self._parallel_rows = None
+        self._daily_stats = None
+        if snapshot_path and (data_path is None or is_fresh(snapshot_path, data_path, compact)):
+            self.open_snapshot(snapshot_path)
+            return
+        self.df = load_transactions(data_path, verify_duplicates=verify_duplicates,
+                                    integer_ids=compact, categorical=compact, schema=schema,
+                                    quarantine_path=quarantine_path)
         self.clean_data()
+        self.data_version = _version_id(source_fingerprint(data_path), compact, len(self.df))
+        if snapshot_path:
+            self.write_snapshot(snapshot_path)
+            # Serve from the mapping too, so this process shares pages with the others
+            self.open_snapshot(snapshot_path)
+    
+    @classmethod
+    def from_snapshot(cls, snapshot_path):
+        """Analyzer over an existing snapshot, without the source CSV"""
+        return cls(None, snapshot_path=snapshot_path)
+    
+    def write_snapshot(self, path):
+        """Persist the cleaned columns as a memory-mappable snapshot file"""
+        source = source_fingerprint(self.data_path) if self.data_path else None
+        return write_snapshot(self.df, path, source=source, compact=self.compact)
+    
+    @timed('eda.open_snapshot')
+    def open_snapshot(self, path):
+        """Serve the working frame read-only from a snapshot file (zero copy)"""
+        self._release_parallel()
+        self.snapshot = Snapshot(path)
+        self.compact = self.snapshot.compact
+        self.data_version = self.snapshot.version
+        self.df = self.snapshot.to_frame()
+        # Rows are stored sorted by date, so the endpoints bound the dimension
+        self.dates = date_dimension_for(self.df['Date'].iloc[[0, -1]] if len(self.df) else self.df['Date'])
+        self.dedup_info = {
+            'key': self.df.attrs.get('deduplicated_on'),
+            'removed': self.df.attrs.get('duplicates_removed', 0)
+        }
+        return self
         
+    @timed('eda.clean_data')
     def clean_data(self):
         """Clean and preprocess the data"""
-        # Remove duplicates
-        initial_rows = len(self.df)
-        self.df = self.df.drop_duplicates()
-        print(f"Removed {initial_rows - len(self.df)} duplicate rows")
+        # Remove duplicates (once, by transaction key)
+        if not is_deduplicated(self.df):
+            self.df = deduplicate_transactions(self.df)
+        self.dedup_info = {
+            'key': self.df.attrs['deduplicated_on'],
+            'removed': self.df.attrs['duplicates_removed']
+        }
+        print(f"Removed {self.dedup_info['removed']} duplicate rows")
         
         # Handle missing values
+        segments = self.df['Customer_Segment']
+        if isinstance(segments.dtype, pd.CategoricalDtype) and 'Regular' not in segments.cat.categories:
+            self.df['Customer_Segment'] = segments.cat.add_categories('Regular')
         self.df['Customer_Segment'].fillna('Regular', inplace=True)
         
-        # Create additional time features
-        self.df['Year'] = self.df['Date'].dt.year
-        self.df['Month'] = self.df['Date'].dt.month
-        self.df['Month_Name'] = self.df['Date'].dt.strftime('%B')
-        self.df['Quarter'] = self.df['Date'].dt.quarter
-        self.df['Day_of_Week'] = self.df['Date'].dt.day_name()
-        self.df['Week'] = self.df['Date'].dt.isocalendar().week
+        # Create additional time features (computed once per day, joined by Date_Key)
+        self.df, self.dates = add_date_features(
+            self.df, TRANSACTION_DATE_FEATURES, categorical=self.compact
+        )
         
-        # Calculate profit margin (simplified - assuming 30% average margin)
-        self.df['Profit'] = self.df['Total_Amount'] * 0.30
+        # Calculate profit (virtual in compact mode, see get_profit)
+        if not self.compact:
+            self.df['Profit'] = self.df['Total_Amount'] * PROFIT_MARGIN
         
         # Sort by date
         self.df = self.df.sort_values('Date').reset_index(drop=True)
         
-    def get_summary_stats(self):
-        """Get overall summary statistics"""
+        if self.compact:
+            self.compact_schema()
+    
+    def compact_schema(self):
+        """Downcast columns to the smallest types that preserve their values"""
+        for col in INTEGER_COLUMNS:
+            if col in self.df.columns:
+                values = self.df[col]
+                if pd.api.types.is_float_dtype(values) and not (values % 1 == 0).all():
+                    # Truncating would change the values (e.g. a 12.5% discount)
+                    self.df[col] = values.astype('float32')
+                    continue
+                values = values.astype('int64')
+                self.df[col] = pd.to_numeric(
+                    values, downcast='unsigned' if values.min() >= 0 else 'integer'
+                )
+        for col in CATEGORICAL_COLUMNS:
+            if col in self.df.columns:
+                self.df[col] = self.df[col].astype('category')
+        # Derived column, recomputed on demand
+        if 'Profit' in self.df.columns:
+            self.df = self.df.drop(columns='Profit')
+        return self.df
+    
+    @property
+    def quarantined_rows(self):
+        """Rows left out at load (and on appends) because they failed validation"""
+        return self.df.attrs.get('quarantined_rows', 0)
+    
+    @timed('eda.append_transactions')
+    def append_transactions(self, rows, quarantine_path=None):
+        """Validate, clean and append new transactions; returns the number of rows added
+
+        Invalid rows are appended to the quarantine file and transactions
+        already present are skipped. Sketches that were built are rebuilt
+        over the combined data; the rolling daily statistics and the anomaly
+        detector append the new days (they are rebuilt only when rows arrive
+        for days they already hold).
+        """
+        valid = rows if self.schema is None else validate_transactions(
+            rows, self.schema, quarantine_path, append=True)
+        if self.schema is None:
+            valid = valid.assign(Date=pd.to_datetime(valid['Date']))
+        if self.compact and TRANSACTION_KEY in valid.columns:
+            parsed = parse_transaction_ids(valid[TRANSACTION_KEY])
+            if parsed is not None:
+                valid = valid.assign(**{TRANSACTION_KEY: parsed})
+        
+        # Clean the batch the same way as a load, then merge
+        batch = copy.copy(self)
+        batch.df = valid.copy()
+        batch.clean_data()
+        attrs = dict(self.df.attrs)
+        combined = deduplicate_transactions(pd.concat([self.df, batch.df], ignore_index=True))
+        added = len(combined) - len(self.df)
+        # Rows that survived deduplication (the existing rows come first)
+        new_rows = combined.iloc[len(self.df):]
+        
+        # Duplicates within the batch plus batch rows already loaded
+        attrs['duplicates_removed'] = attrs.get('duplicates_removed', 0) + batch.dedup_info['removed'] \
+            + len(batch.df) - added
+        attrs['quarantined_rows'] = self.quarantined_rows + valid.attrs.get('quarantined_rows', 0)
+        self.df = combined.sort_values('Date', kind='stable').reset_index(drop=True)
+        if self.compact:
+            self.compact_schema()
+        self.df.attrs = attrs
+        self.dedup_info['removed'] = attrs['duplicates_removed']
+        self.dates = date_dimension_for(self.df['Date'])
+        self.snapshot = None
+        self._extend_daily_stats(new_rows)
+        self.data_version = _version_id(self.data_version, added, len(self.df))
+        self.affinity_cache.clear()
+        # The aggregator holds the previous rows; it is recreated on next use
+        self._release_parallel()
+        
+        if self.customer_sketch is not None:
+            self.build_customer_sketch(self.customer_sketch.precision)
+        if self.distribution_sketches:
+            accuracy = next(iter(self.distribution_sketches.values())).relative_accuracy
+            self.build_distribution_sketches(list(self.distribution_sketches), accuracy)
+        if self.anomaly_detector is not None and not self.anomaly_detector.extend(new_rows):
+            self.build_anomaly_detector(self.anomaly_detector.window, self.anomaly_detector.threshold)
+        return added
+    
+    def _extend_daily_stats(self, new_rows):
+        """Append the daily totals of new rows to the rolling statistics, if built"""
+        stats = self._daily_stats
+        if stats is None:
+            return
+        daily = widen(new_rows['Total_Amount']).groupby(new_rows['Date']).sum()
+        if len(daily) and len(stats) and daily.index[0] <= stats.dates[-1]:
+            # A day already summed changed; rebuilt on next use
+            self._daily_stats = None
+            return
+        stats.extend(daily.to_numpy(np.float64), daily.index)
+    
+    def get_profit(self):
+        """Profit per transaction, materialized or computed on demand"""
+        if 'Profit' in self.df.columns:
+            return self.df['Profit']
+        return (self.df['Total_Amount'] * PROFIT_MARGIN).rename('Profit')
+    
+    def memory_report(self):
+        """Memory footprint of the working frame, overall and per column"""
+        usage = self.df.memory_usage(index=True, deep=True)
+        rows = max(len(self.df), 1)
+        columns = pd.DataFrame({
+            'Column': usage.index,
+            'Dtype': [str(self.df[c].dtype) if c in self.df.columns else 'index' for c in usage.index],
+            'Bytes': usage.values,
+            'Bytes_per_Row': usage.values / rows
+        })
+        return {
+            'schema': 'compact' if self.compact else 'standard',
+            'mapped_bytes': self.snapshot.nbytes if self.snapshot is not None else 0,
+            'rows': len(self.df),
+            'total_bytes': int(usage.sum()),
+            'bytes_per_row': usage.sum() / rows,
+            'columns': columns
+        }
+    
+    def _parallel_aggregator(self):
+        """ParallelAggregator over the working frame when workers > 1, shared with filtered views
+
+        None if parallel mode is off or the aggregator a view shares was closed.
+        """
+        if not self.workers or self.workers < 2:
+            return None
+        with self._parallel_lock:
+            if self.parallel is None:
+                # Imported here: analysis.parallel imports this module
+                from analysis.parallel import ParallelAggregator
+                self.parallel = ParallelAggregator(self.df, workers=self.workers)
+            return None if self.parallel.closed else self.parallel
+    
+    def _parallel(self, call):
+        """call(aggregator), or None to compute serially (no aggregator, or closed meanwhile)"""
+        aggregator = self._parallel_aggregator()
+        if aggregator is None:
+            return None
+        from analysis.parallel import AggregatorClosed
+        try:
+            return call(aggregator)
+        except AggregatorClosed:
+            return None
+    
+    def _release_parallel(self):
+        """Close the aggregator over the previous rows; a new one is created on next use"""
+        with self._parallel_lock:
+            if self.parallel is not None:
+                self.parallel.close()
+                self.parallel = None
+    
+    def close(self):
+        """Release the parallel aggregator's processes and shared memory and compute serially from now on"""
+        with self._parallel_lock:
+            self.workers = None
+        self._release_parallel()
+    
+    def _aggregate(self, by, spec):
+        """Grouped aggregation that widens compact columns and fills virtual Profit"""
+        by = [by] if isinstance(by, str) else list(by)
+        virtual_profit = 'Profit' in spec and 'Profit' not in self.df.columns
+        values = {col: widen(self.df[col]) for col in spec
+                  if not (col == 'Profit' and virtual_profit)}
+        result = None
+        if len(by) == 1 and set(spec.values()) <= PARALLEL_AGGREGATIONS:
+            result = self._parallel(lambda aggregator: aggregator.aggregate(
+                by[0], {col: spec[col] for col in values}, self._parallel_rows))
+        if result is None:
+            keys = [self.df[col] for col in by]
+            result = pd.DataFrame(values).groupby(keys, observed=True).agg(
+                {col: spec[col] for col in values}
+            ).reset_index()
+        # Filtered views keep every category; drop the ones absent from the result (plotly groups by them)
+        for col in by:
+            if isinstance(result[col].dtype, pd.CategoricalDtype):
+                result[col] = result[col].cat.remove_unused_categories()
+        if virtual_profit:
+            # Profit is linear in Total_Amount, so aggregate first and scale after
+            result['Profit'] = result['Total_Amount'] * PROFIT_MARGIN
+        return result[by + list(spec)]
+        
+    @timed('eda.get_summary_stats')
+    def get_summary_stats(self, approximate=False):
+        """Get overall summary statistics (approximate=True uses the customer sketch)"""
         stats = {
             'total_sales': self.df['Total_Amount'].sum(),
             'total_transactions': len(self.df),
             'avg_order_value': self.df['Total_Amount'].mean(),
             'total_quantity_sold': self.df['Quantity'].sum(),
-            'unique_customers': self.df['Customer_ID'].nunique(),
-            'total_profit': self.df['Profit'].sum(),
+            'unique_customers': self.unique_customers(approximate),
+            'total_profit': self.get_profit().sum(),
             'avg_discount': self.df['Discount_Percent'].mean(),
             'date_range': f"{self.df['Date'].min().strftime('%Y-%m-%d')} to {self.df['Date'].max().strftime('%Y-%m-%d')}"
         }
         return stats
     
+    def build_customer_sketch(self, precision=12):
+        """Build HyperLogLog sketches per day x Category x Region over the current data"""
+        self.customer_sketch = CustomerSketch.build(self.df, precision)
+        return self.customer_sketch
+    
+    def unique_customers(self, approximate=False):
+        """Distinct customers, exact or estimated from the sketch for the active filters"""
+        if approximate and self.customer_sketch is not None:
+            return int(round(self.customer_sketch.estimate(**self.filters)))
+        count = self._parallel(lambda aggregator: aggregator.unique_customers(self._parallel_rows))
+        return self.df['Customer_ID'].nunique() if count is None else count
+    
+    def build_distribution_sketches(self, columns=DISTRIBUTION_COLUMNS, relative_accuracy=0.01):
+        """Build quantile sketches per day x Category x Region x Customer_Segment over the current data"""
+        self.distribution_sketches = {
+            col: QuantileSketch.build(self.df, col, relative_accuracy) for col in columns
+        }
+        return self.distribution_sketches
+    
+    @timed('eda.value_distribution')
+    def value_distribution(self, column='Total_Amount', by=None, quantiles=(0.5, 0.9, 0.99),
+                           approximate=True):
+        """Transaction count and quantiles of a value column, overall or per group
+        
+        Merged from the quantile sketches for the active filters when available,
+        otherwise computed exactly from the rows.
+        """
+        sketch = self.distribution_sketches.get(column)
+        if approximate and sketch is not None:
+            return sketch.quantiles(quantiles, by, **self.filters)
+        return value_quantiles(self.df[column], quantiles, self.df[by] if by else None)
+    
+    @timed('eda.sales_by_time')
     def sales_by_time(self, period='month'):
         """Aggregate sales by time period"""
         if period == 'month':
-            return self.df.groupby(['Year', 'Month', 'Month_Name'])['Total_Amount'].sum().reset_index()
+            return self.df.groupby(['Year', 'Month', 'Month_Name'], observed=True)['Total_Amount'].sum().reset_index()
         elif period == 'quarter':
-            return self.df.groupby(['Year', 'Quarter'])['Total_Amount'].sum().reset_index()
+            return self.df.groupby(['Year', 'Quarter'], observed=True)['Total_Amount'].sum().reset_index()
         elif period == 'week':
-            return self.df.groupby('Week')['Total_Amount'].sum().reset_index()
+            return self.df.groupby('Week', observed=True)['Total_Amount'].sum().reset_index()
         elif period == 'day':
-            return self.df.groupby('Date')['Total_Amount'].sum().reset_index()
+            return self.df.groupby('Date', observed=True)['Total_Amount'].sum().reset_index()
         
+    @timed('eda.sales_by_category')
     def sales_by_category(self):
         """Sales breakdown by product category"""
-        return self.df.groupby('Category').agg({
+        return self._aggregate('Category', {
             'Total_Amount': 'sum',
             'Quantity': 'sum',
             'Transaction_ID': 'count',
             'Profit': 'sum'
-        }).reset_index().sort_values('Total_Amount', ascending=False)
+        }).sort_values('Total_Amount', ascending=False)
     
+    @timed('eda.sales_by_region')
     def sales_by_region(self):
         """Sales breakdown by region"""
-        return self.df.groupby('Region').agg({
+        return self._aggregate('Region', {
             'Total_Amount': 'sum',
             'Quantity': 'sum',
             'Transaction_ID': 'count',
             'Profit': 'sum'
-        }).reset_index().sort_values('Total_Amount', ascending=False)
+        }).sort_values('Total_Amount', ascending=False)
     
+    @timed('eda.top_products')
     def top_products(self, n=10):
         """Get top N products by sales"""
-        return self.df.groupby('Product').agg({
+        return self._aggregate('Product', {
             'Total_Amount': 'sum',
             'Quantity': 'sum',
             'Transaction_ID': 'count'
-        }).reset_index().sort_values('Total_Amount', ascending=False).head(n)
+        }).sort_values('Total_Amount', ascending=False).head(n)
     
+    @timed('eda.customer_segment_analysis')
     def customer_segment_analysis(self):
         """Analyze customer segments"""
-        result = self.df.groupby('Customer_Segment').agg({
+        result = self._aggregate('Customer_Segment', {
             'Total_Amount': 'sum',
             'Profit': 'sum',
             'Discount_Percent': 'mean'
-        }).reset_index()
+        })
         return result
     
+    @timed('eda.payment_method_analysis')
     def payment_method_analysis(self):
         """Analyze payment methods"""
-        return self.df.groupby('Payment_Method').agg({
+        return self._aggregate('Payment_Method', {
             'Total_Amount': 'sum',
             'Transaction_ID': 'count'
-        }).reset_index().sort_values('Total_Amount', ascending=False)
+        }).sort_values('Total_Amount', ascending=False)
+    
+    def build_anomaly_detector(self, window=28, threshold=3.5):
+        """Score every Category x Region x Product daily series of the current data"""
+        self.anomaly_detector = AnomalyDetector(window, threshold).fit(self.df)
+        return self.anomaly_detector
+    
+    def series_anomalies(self, threshold=None, top=50):
+        """Ranked series anomalies for the active filters (detector is built on first use)"""
+        if self.anomaly_detector is None:
+            self.build_anomaly_detector()
+        return self.anomaly_detector.anomalies(threshold=threshold, top=top, **self.filters)
+    
+    @timed('eda.product_affinity')
+    def product_affinity(self):
+        """Co-purchase statistics of the view's customers and products (cached per data version and filters)"""
+        # Imported here: it is the only path that needs scipy.sparse
+        from analysis.affinity import ProductAffinity
+        return self.affinity_cache.get((self.data_version, filters_key(self.filters)),
+                                       lambda: ProductAffinity.from_transactions(self.df))
     
+    def daily_stats(self):
+        """Rolling statistics over daily sales of the current data (built once per view)"""
+        if self._daily_stats is None:
+            self._daily_stats = RollingStats.from_frame(self.sales_by_time('day'), 'Total_Amount')
+        return self._daily_stats
+    
+    @timed('eda.monthly_growth_rate')
     def monthly_growth_rate(self):
         """Calculate month-over-month growth rate"""
-        monthly = self.df.groupby(['Year', 'Month'])['Total_Amount'].sum().reset_index()
-        monthly['Growth_Rate'] = monthly['Total_Amount'].pct_change() * 100
-        return monthly
+        # Month totals are prefix-sum differences over the daily series, not a pass over rows
+        return self.daily_stats().monthly_growth()
     
+    @timed('eda.cohort_analysis')
     def cohort_analysis(self):
         """Simple cohort analysis - customer retention"""
         # First purchase date for each customer
-        first_purchase = self.df.groupby('Customer_ID')['Date'].min().reset_index()
+        first_purchase = self.df.groupby('Customer_ID', observed=True)['Date'].min().reset_index()
         first_purchase.columns = ['Customer_ID', 'First_Purchase_Date']
         
         # Merge with main data
@@ -125,41 +648,48 @@ class SalesAnalyzer:
         )
         
         # Cohort size
-        cohort_size = df_cohort.groupby('Cohort_Month')['Customer_ID'].nunique().reset_index()
+        cohort_size = df_cohort.groupby('Cohort_Month', observed=True)['Customer_ID'].nunique().reset_index()
         cohort_size.columns = ['Cohort_Month', 'Cohort_Size']
         
         return df_cohort, cohort_size
     
+    @timed('eda.customer_rfm')
+    def customer_rfm(self, reference_date=None):
+        """Recency, frequency, monetary value and RFM segment per customer"""
+        return rfm_table(self.df, reference_date)
+    
+    @timed('eda.seasonal_analysis')
     def seasonal_analysis(self):
         """Analyze seasonal patterns"""
-        seasonal = self.df.groupby('Month_Name').agg({
+        seasonal = self._aggregate('Month_Name', {
             'Total_Amount': 'sum',
             'Transaction_ID': 'count'
-        }).reset_index()
+        })
         
         # Reorder by month
-        month_order = ['January', 'February', 'March', 'April', 'May', 'June',
-                      'July', 'August', 'September', 'October', 'November', 'December']
-        seasonal['Month_Name'] = pd.Categorical(seasonal['Month_Name'], categories=month_order, ordered=True)
+        seasonal['Month_Name'] = pd.Categorical(seasonal['Month_Name'].astype(str), categories=MONTH_NAMES, ordered=True)
         seasonal = seasonal.sort_values('Month_Name')
         
         return seasonal
     
+    @timed('eda.discount_impact_analysis')
     def discount_impact_analysis(self):
         """Analyze impact of discounts on sales"""
-        self.df['Discount_Category'] = pd.cut(
+        # Bucketed on the side: the frame may be shared by several sessions
+        discount_category = pd.cut(
             self.df['Discount_Percent'],
             bins=[-1, 0, 10, 20, 100],
             labels=['No Discount', '1-10%', '11-20%', '20%+']
-        )
+        ).rename('Discount_Category')
         
-        result = self.df.groupby('Discount_Category').agg({
+        result = self.df.groupby(discount_category).agg({
             'Total_Amount': 'sum',
-            'Quantity': 'sum',
+            'Quantity': lambda q: widen(q).sum(),
             'Transaction_ID': 'count'
         }).reset_index()
         return result
     
+    @timed('eda.get_filtered_data')
     def get_filtered_data(self, start_date=None, end_date=None, 
                          categories=None, regions=None):
         """Filter data based on parameters"""
@@ -176,6 +706,51 @@ class SalesAnalyzer:
             
         return df_filtered
     
+    def date_bounds(self):
+        """First and last transaction date"""
+        return self.df['Date'].min(), self.df['Date'].max()
+    
+    def row_count(self):
+        """Number of transactions (matching the view's filters)"""
+        return len(self.df)
+    
+    def iter_chunks(self, columns=EXPORT_COLUMNS, chunk_rows=CHUNK_ROWS):
+        """Source columns of the rows in slices of at most chunk_rows (at least one, possibly empty)
+
+        Transaction IDs parsed to integers at load are written back in their
+        original form.
+        """
+        columns = [col for col in columns if col in self.df.columns]
+        prefix = self.df.attrs.get('transaction_id_prefix')
+        for start in range(0, max(len(self.df), 1), chunk_rows):
+            chunk = self.df.iloc[start:start + chunk_rows][columns]
+            if prefix is not None and TRANSACTION_KEY in columns:
+                chunk = chunk.assign(**{TRANSACTION_KEY: format_transaction_ids(
+                    chunk[TRANSACTION_KEY], prefix, self.df.attrs['transaction_id_digits'])})
+            yield chunk
+    
+    def distinct_values(self, column):
+        """Distinct values of a column in order of first appearance"""
+        return self.df[column].unique().tolist()
+    
+    def filtered(self, start_date=None, end_date=None, categories=None, regions=None):
+        """Analyzer view restricted to the given filters"""
+        # Created before the copy, so the view shares it instead of building its own over the view's rows
+        aggregator = self._parallel_aggregator()
+        view = copy.copy(self)
+        view.df = self.get_filtered_data(start_date, end_date, categories, regions)
+        view._daily_stats = None
+        if aggregator is not None:
+            view.parallel = aggregator
+            # The view's rows as a mask over the shared aggregator's frame
+            view._parallel_rows = np.zeros(len(aggregator.df), dtype=bool)
+            view._parallel_rows[aggregator.df.index.get_indexer(view.df.index)] = True
+        # Remember the filters so sketches built on the full data can answer for the view
+        new_filters = {'start_date': start_date, 'end_date': end_date,
+                       'categories': categories, 'regions': regions}
+        view.filters = {**self.filters, **{k: v for k, v in new_filters.items() if v}}
+        return view
+    
     def export_analysis_report(self, output_path):
         """Export comprehensive analysis report"""
         with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
@@ -0,0 +1,159 @@
+import os
+import json
+import hashlib
+import threading
+
+import pandas as pd
+
+from analysis.profiling import timed
+
+# Columns of an export: the source file's schema
+EXPORT_COLUMNS = [
+    'Transaction_ID', 'Date', 'Customer_ID', 'Customer_Segment', 'Product', 'Category',
+    'Quantity', 'Unit_Price', 'Discount_Percent', 'Total_Amount', 'Region',
+    'Payment_Method', 'Shipping_Method'
+]
+
+# Format -> MIME type
+EXPORT_FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+# Rows per chunk; bounds the memory of an export independently of its size
+CHUNK_ROWS = 100_000
+
+
+def export_key(version, filters, fmt, columns=EXPORT_COLUMNS):
+    """Identifier of an export: data version, active filters, format and columns"""
+    normalized = {
+        name: sorted(map(str, value)) if isinstance(value, (list, tuple, set)) else str(value)
+        for name, value in sorted(filters.items()) if value
+    }
+    spec = json.dumps([version, normalized, fmt, list(columns)])
+    return hashlib.sha1(spec.encode('utf-8')).hexdigest()[:16]
+
+
+def write_csv(chunks, path):
+    """Append chunks to a CSV file; only the first writes the header"""
+    with open(path, 'w', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=i == 0, index=False)
+
+
+def write_parquet(chunks, path):
+    """Write each chunk as a Parquet row group, using the first chunk's schema throughout"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, schema=writer.schema if writer else None,
+                                         preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet}
+
+
+@timed('export.write')
+def write_export(chunks, path, fmt):
+    """Stream chunks into path, written under a temporary name and renamed when complete"""
+    tmp_path = f"{path}.tmp{os.getpid()}-{threading.get_ident()}"
+    try:
+        WRITERS[fmt](chunks, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+class ExportCache:
+    """Finished export files on disk, reused for an identical export key
+
+    Concurrent requests for the same key wait for one writer. Files are
+    evicted least recently used first once their total size exceeds
+    ``max_bytes``; lookups and eviction share a lock, so a file is never
+    removed between being found and being opened.
+    """
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, fmt):
+        return os.path.join(self.directory, f"{key}.{fmt}")
+
+    def get(self, key, fmt):
+        """Path of a finished export, or None"""
+        path = self.path(key, fmt)
+        with self._lock:
+            if not os.path.exists(path):
+                return None
+            # Modification time doubles as the recency for eviction
+            os.utime(path)
+            return path
+
+    def open(self, key, fmt):
+        """Finished export opened for reading and its size in bytes, or (None, 0)
+
+        An open file stays readable even if it is evicted afterwards.
+        """
+        path = self.path(key, fmt)
+        with self._lock:
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                return None, 0
+            os.utime(path)
+            return f, os.fstat(f.fileno()).st_size
+
+    def get_or_create(self, key, fmt, chunks):
+        """Path of the export for key, writing it from ``chunks()`` if needed; returns (path, reused)"""
+        with self._lock:
+            key_lock = self._key_locks.setdefault((key, fmt), threading.Lock())
+        with key_lock:
+            path = self.get(key, fmt)
+            if path is not None:
+                self.hits += 1
+                return path, True
+            self.misses += 1
+            write_export(chunks(), self.path(key, fmt), fmt)
+            self._evict(keep=self.path(key, fmt))
+            return self.path(key, fmt), False
+
+    def _evict(self, keep):
+        """Remove least recently used files until the total fits, dropping their key locks"""
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            files = []
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if '.tmp' not in name and os.path.isfile(path):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                path = os.path.join(self.directory, name)
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still open elsewhere (on Windows); retried on the next eviction
+                    continue
+                key, fmt = os.path.splitext(name)
+                self._key_locks.pop((key, fmt[1:]), None)
+                total -= size
@@ -0,0 +1,110 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analysis.profiling import timed
+
+
+def _update(digest, part):
+    """Feed one chart input (frame, series, array or plain value) into a hash"""
+    if isinstance(part, pd.DataFrame):
+        digest.update(json.dumps([list(map(str, part.columns)), list(map(str, part.dtypes))]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+    elif isinstance(part, (pd.Series, pd.Index)):
+        digest.update(json.dumps([str(part.name), str(part.dtype)]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(part, index=isinstance(part, pd.Series)).to_numpy().tobytes())
+    elif isinstance(part, np.ndarray):
+        digest.update(json.dumps([str(part.dtype), part.shape]).encode('utf-8'))
+        digest.update(np.ascontiguousarray(part).tobytes())
+    else:
+        digest.update(json.dumps(part, default=str, sort_keys=True).encode('utf-8'))
+    # Separator so adjacent parts cannot run together
+    digest.update(b'\x00')
+
+
+def figure_key(name, *parts):
+    """Content hash of a chart: its name plus every aggregate and option it is built from"""
+    digest = hashlib.sha1(name.encode('utf-8'))
+    for part in parts:
+        _update(digest, part)
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """Built Plotly figures by content key, least recently used evicted over ``max_bytes``
+
+    A hit returns the figure without running plotly.express again; a miss
+    builds it once. Figures are shared by every session, so callers must
+    not modify them. A figure's size is its serialized JSON length,
+    measured once when it is built.
+    """
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> (figure, estimated bytes), least recently used first
+        self._figures = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._figures)
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._bytes
+
+    def get_or_build(self, key, build):
+        """Figure for key, calling ``build()`` for a Plotly figure on a miss"""
+        with self._lock:
+            entry = self._figures.get(key)
+            if entry is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        figure, size = self._build(build)
+        with self._lock:
+            self.misses += 1
+            if key not in self._figures:
+                self._figures[key] = (figure, size)
+                self._bytes += size
+                self._evict_over_budget(keep=key)
+        return figure
+
+    @timed('figures.build')
+    def _build(self, build):
+        import plotly.io as pio
+        try:
+            # plotly finds its JSON engine through sys.modules, where a second session can see
+            # it half imported; a real import waits for the first one to finish
+            import orjson  # noqa: F401
+        except ImportError:
+            pass
+        figure = build()
+        # Validated while being built; serialized only to size it
+        return figure, len(pio.to_json(figure, validate=False))
+
+    def _evict_over_budget(self, keep):
+        """Drop least recently used figures until the total fits (caller holds the lock)"""
+        if self.max_bytes is None:
+            return
+        for key in list(self._figures):
+            if self._bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self._bytes -= self._figures.pop(key)[1]
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self._bytes = 0
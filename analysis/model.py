@@ -6,21 +6,111 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.preprocessing import LabelEncoder
 import joblib
+import os
 import warnings
+from analysis.profiling import timed
+from analysis.eda import widen, load_transactions
+from analysis.dates import add_date_features, date_features, MODEL_DATE_FEATURES
+from analysis.rolling import RollingStats
+from analysis.trees import FlatForest, trees_path, model_fingerprint
 warnings.filterwarnings('ignore')
 
+# Columns of the daily feature matrix built by prepare_features
+FEATURE_COLUMNS = [
+    'Year', 'Month', 'Day', 'DayOfWeek', 'DayOfYear', 'WeekOfYear', 
+    'Quarter', 'IsWeekend', 'IsMonthStart', 'IsMonthEnd',
+    'Total_Quantity', 'Num_Transactions', 'Avg_Discount',
+    'Sales_Lag_1', 'Sales_Lag_7', 'Sales_Lag_30',
+    'Sales_MA_7', 'Sales_MA_30', 'Trend'
+]
+
+# Hyperparameters used unless tuned ones are given (see analysis/tuning.py)
+DEFAULT_PARAMS = {
+    'random_forest': {'n_estimators': 100, 'max_depth': 15, 'min_samples_split': 5},
+    'gradient_boosting': {'n_estimators': 100, 'max_depth': 5, 'learning_rate': 0.1},
+    'linear_regression': {}
+}
+
+
+def build_model(model_type='random_forest', params=None, n_jobs=-1):
+    """Unfitted regressor of a model family with its default hyperparameters, overridden by params
+
+    Any type other than the two ensembles is a linear regression.
+    """
+    params = {**DEFAULT_PARAMS.get(model_type, {}), **(params or {})}
+    if model_type == 'random_forest':
+        return RandomForestRegressor(**params, random_state=42, n_jobs=n_jobs)
+    if model_type == 'gradient_boosting':
+        return GradientBoostingRegressor(**params, random_state=42)
+    return LinearRegression(**params)
+
+
+# Public per-node arrays of a fitted sklearn Tree
+TREE_ARRAYS = ['children_left', 'children_right', 'feature', 'threshold', 'impurity',
+               'n_node_samples', 'weighted_n_node_samples', 'value']
+
+
+def model_nbytes(model):
+    """Approximate size of a fitted scikit-learn regressor (tree nodes and leaf values, or coefficients)"""
+    if model is None:
+        return 0
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None:
+        return sum(value.nbytes for value in vars(model).values() if isinstance(value, np.ndarray))
+    return sum(_tree_nbytes(est.tree_) for est in np.ravel(estimators))
+
+
+def _tree_nbytes(tree):
+    """Bytes of a fitted tree's node arrays (structure, split, impurity and sample counts) and leaf values"""
+    return sum(getattr(tree, name).nbytes for name in TREE_ARRAYS)
+
+
+class ForecastResult:
+    """What a session keeps of a forecast: predictions, metrics, test-period fit and importances
+
+    A few kilobytes regardless of the data or model size. The fitted model
+    itself is shared in a ModelRegistry under ``model_key``.
+    """
+    
+    def __init__(self, forecast, metrics, test_dates, y_test, test_pred, importance=None,
+                 model_type=None, model_key=None):
+        self.forecast = forecast
+        self.metrics = metrics
+        self.test_dates = np.asarray(test_dates)
+        self.y_test = np.asarray(y_test)
+        self.test_pred = np.asarray(test_pred)
+        self.importance = importance
+        self.model_type = model_type
+        self.model_key = model_key
+    
+    @property
+    def nbytes(self):
+        frames = [self.forecast] + ([self.importance] if self.importance is not None else [])
+        return int(sum(frame.memory_usage(deep=True).sum() for frame in frames)
+                   + self.test_dates.nbytes + self.y_test.nbytes + self.test_pred.nbytes)
+    
+    def feature_importance(self, top_n=10):
+        """Most important features, or None for models without importances"""
+        return None if self.importance is None else self.importance.head(top_n)
+
+
 class SalesForecastModel:
     def __init__(self, df):
         """Initialize forecast model with data"""
         self.df = df.copy()
         self.model = None
+        self.model_type = None
+        self.metrics = None
+        self.engine = None
         self.feature_columns = None
         self.label_encoders = {}
         
+    @timed('model.prepare_features')
     def prepare_features(self):
         """Prepare features for modeling"""
         # Aggregate to daily level
-        daily_sales = self.df.groupby('Date').agg({
+        # Widen compact (int8/uint8) columns so daily sums cannot overflow
+        daily_sales = self.df.assign(Quantity=widen(self.df['Quantity'])).groupby('Date').agg({
             'Total_Amount': 'sum',
             'Quantity': 'sum',
             'Transaction_ID': 'count',
@@ -29,26 +119,18 @@ class SalesForecastModel:
         
         daily_sales.columns = ['Date', 'Total_Sales', 'Total_Quantity', 'Num_Transactions', 'Avg_Discount']
         
-        # Create time-based features
-        daily_sales['Year'] = daily_sales['Date'].dt.year
-        daily_sales['Month'] = daily_sales['Date'].dt.month
-        daily_sales['Day'] = daily_sales['Date'].dt.day
-        daily_sales['DayOfWeek'] = daily_sales['Date'].dt.dayofweek
-        daily_sales['DayOfYear'] = daily_sales['Date'].dt.dayofyear
-        daily_sales['WeekOfYear'] = daily_sales['Date'].dt.isocalendar().week
-        daily_sales['Quarter'] = daily_sales['Date'].dt.quarter
-        daily_sales['IsWeekend'] = (daily_sales['DayOfWeek'] >= 5).astype(int)
-        daily_sales['IsMonthStart'] = daily_sales['Date'].dt.is_month_start.astype(int)
-        daily_sales['IsMonthEnd'] = daily_sales['Date'].dt.is_month_end.astype(int)
+        # Create time-based features from the shared date dimension
+        daily_sales, _ = add_date_features(daily_sales, MODEL_DATE_FEATURES)
         
         # Lag features
         daily_sales['Sales_Lag_1'] = daily_sales['Total_Sales'].shift(1)
         daily_sales['Sales_Lag_7'] = daily_sales['Total_Sales'].shift(7)
         daily_sales['Sales_Lag_30'] = daily_sales['Total_Sales'].shift(30)
         
-        # Rolling averages
-        daily_sales['Sales_MA_7'] = daily_sales['Total_Sales'].rolling(window=7, min_periods=1).mean()
-        daily_sales['Sales_MA_30'] = daily_sales['Total_Sales'].rolling(window=30, min_periods=1).mean()
+        # Rolling averages from prefix sums (kept to roll forward in predict_future)
+        self.sales_stats = RollingStats.from_frame(daily_sales, 'Total_Sales')
+        daily_sales['Sales_MA_7'] = self.sales_stats.rolling_mean(7, min_periods=1)
+        daily_sales['Sales_MA_30'] = self.sales_stats.rolling_mean(30, min_periods=1)
         
         # Trend
         daily_sales['Trend'] = range(len(daily_sales))
@@ -59,48 +141,33 @@ class SalesForecastModel:
         self.daily_sales = daily_sales
         return daily_sales
     
-    def train_model(self, model_type='random_forest', test_size=0.2):
-        """Train forecasting model"""
-        # Prepare features
+    def training_data(self, test_size=0.2):
+        """Daily feature matrix split in time order into (X_train, X_test, y_train, y_test)"""
         df_model = self.prepare_features()
-        
-        # Define features and target
-        self.feature_columns = [
-            'Year', 'Month', 'Day', 'DayOfWeek', 'DayOfYear', 'WeekOfYear', 
-            'Quarter', 'IsWeekend', 'IsMonthStart', 'IsMonthEnd',
-            'Total_Quantity', 'Num_Transactions', 'Avg_Discount',
-            'Sales_Lag_1', 'Sales_Lag_7', 'Sales_Lag_30',
-            'Sales_MA_7', 'Sales_MA_30', 'Trend'
-        ]
+        self.feature_columns = list(FEATURE_COLUMNS)
         
         X = df_model[self.feature_columns]
         y = df_model['Total_Sales']
         
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=test_size, shuffle=False
-        )
+        return train_test_split(X, y, test_size=test_size, shuffle=False)
+    
+    @timed('model.train_model')
+    def train_model(self, model_type='random_forest', test_size=0.2, params=None):
+        """Train forecasting model
+
+        ``params`` override the family's DEFAULT_PARAMS, e.g. with the
+        configuration saved by a tuning run.
+        """
+        # Features and target, split without shuffling (the test period is the most recent)
+        X_train, X_test, y_train, y_test = self.training_data(test_size)
+        df_model = self.daily_sales
         
         # Train model
-        if model_type == 'random_forest':
-            self.model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=15,
-                min_samples_split=5,
-                random_state=42,
-                n_jobs=-1
-            )
-        elif model_type == 'gradient_boosting':
-            self.model = GradientBoostingRegressor(
-                n_estimators=100,
-                max_depth=5,
-                learning_rate=0.1,
-                random_state=42
-            )
-        else:
-            self.model = LinearRegression()
+        self.model = build_model(model_type, params)
         
         self.model.fit(X_train, y_train)
+        # Flat-array copy of tree ensembles for low-overhead per-step predictions
+        self.engine = self._flatten(self.model)
         
         # Evaluate
         train_pred = self.model.predict(X_train)
@@ -120,9 +187,43 @@ class SalesForecastModel:
         self.y_test = y_test
         self.test_pred = test_pred
         self.test_dates = df_model.loc[X_test.index, 'Date']
+        self.model_type = model_type
+        self.metrics = metrics
         
         return metrics
     
+    def release_data(self):
+        """Drop the training transactions and test features; forecasting still works"""
+        self.df = None
+        self.X_test = None
+        return self
+    
+    @property
+    def nbytes(self):
+        """Approximate resident size: fitted model, flat engine and the frames still held"""
+        frames = [self.df, getattr(self, 'daily_sales', None), getattr(self, 'X_test', None)]
+        return int(model_nbytes(self.model) + (self.engine.nbytes if self.engine is not None else 0)
+                   + sum(frame.memory_usage(deep=True).sum() for frame in frames if frame is not None))
+    
+    @staticmethod
+    def _flatten(model, path=None):
+        """Flat-array engine for tree ensembles (read from path when saved for this model), else None"""
+        if not isinstance(model, (RandomForestRegressor, GradientBoostingRegressor)):
+            return None
+        if path is not None and os.path.exists(path):
+            engine = FlatForest.load(path)
+            if engine.fingerprint == model_fingerprint(model):
+                return engine
+            print(f"Ignoring {path}: saved for a different model")
+        return FlatForest.from_model(model)
+    
+    def predict_rows(self, X):
+        """Predict a 2-D array of feature rows (columns in feature_columns order)"""
+        if self.engine is not None:
+            return self.engine.predict(X)
+        return self.model.predict(pd.DataFrame(np.atleast_2d(X), columns=self.feature_columns))
+    
+    @timed('model.predict_future')
     def predict_future(self, days_ahead=30):
         """Predict future sales"""
         if self.model is None:
@@ -139,36 +240,33 @@ class SalesForecastModel:
             freq='D'
         )
         
+        # Calendar features for the whole horizon in one pass
+        calendar = date_features(future_dates, MODEL_DATE_FEATURES).to_dict('records')
+        
         predictions = []
+        # Moving averages advance with each predicted day
+        stats = self.sales_stats.copy()
         
         for i, date in enumerate(future_dates):
             # Create features for future date
             features = {
-                'Year': date.year,
-                'Month': date.month,
-                'Day': date.day,
-                'DayOfWeek': date.dayofweek,
-                'DayOfYear': date.dayofyear,
-                'WeekOfYear': date.isocalendar().week,
-                'Quarter': date.quarter,
-                'IsWeekend': 1 if date.dayofweek >= 5 else 0,
-                'IsMonthStart': 1 if date.is_month_start else 0,
-                'IsMonthEnd': 1 if date.is_month_end else 0,
+                **calendar[i],
                 'Total_Quantity': last_row['Total_Quantity'],
                 'Num_Transactions': last_row['Num_Transactions'],
                 'Avg_Discount': last_row['Avg_Discount'],
                 'Sales_Lag_1': last_row['Total_Sales'] if i == 0 else predictions[-1],
                 'Sales_Lag_7': last_row['Sales_Lag_7'],
                 'Sales_Lag_30': last_row['Sales_Lag_30'],
-                'Sales_MA_7': last_row['Sales_MA_7'],
-                'Sales_MA_30': last_row['Sales_MA_30'],
+                'Sales_MA_7': stats.window_mean(7),
+                'Sales_MA_30': stats.window_mean(30),
                 'Trend': last_row['Trend'] + i + 1
             }
             
             # Predict
-            X_future = pd.DataFrame([features])[self.feature_columns]
-            pred = self.model.predict(X_future)[0]
+            X_future = np.array([[features[col] for col in self.feature_columns]], dtype=np.float64)
+            pred = self.predict_rows(X_future)[0]
             predictions.append(max(0, pred))  # Ensure non-negative
+            stats.append(predictions[-1], date)
         
         # Create forecast dataframe
         forecast_df = pd.DataFrame({
@@ -178,6 +276,19 @@ class SalesForecastModel:
         
         return forecast_df
     
+    def result(self, days_ahead=30, model_key=None):
+        """Forecast the next days_ahead days as a compact ForecastResult"""
+        return ForecastResult(
+            self.predict_future(days_ahead=days_ahead),
+            self.metrics,
+            self.test_dates,
+            self.y_test,
+            self.test_pred,
+            importance=self.get_feature_importance(top_n=None),
+            model_type=self.model_type,
+            model_key=model_key
+        )
+    
     def get_feature_importance(self, top_n=10):
         """Get feature importance from the model"""
         if self.model is None or not hasattr(self.model, 'feature_importances_'):
@@ -186,9 +297,9 @@ class SalesForecastModel:
         importance = pd.DataFrame({
             'Feature': self.feature_columns,
             'Importance': self.model.feature_importances_
-        }).sort_values('Importance', ascending=False).head(top_n)
+        }).sort_values('Importance', ascending=False)
         
-        return importance
+        return importance.head(top_n) if top_n else importance
     
     def save_model(self, path):
         """Save trained model"""
@@ -201,6 +312,8 @@ class SalesForecastModel:
             'label_encoders': self.label_encoders
         }
         joblib.dump(model_data, path)
+        if self.engine is not None:
+            self.engine.save(trees_path(path))
         print(f"Model saved to {path}")
     
     def load_model(self, path):
@@ -209,16 +322,14 @@ class SalesForecastModel:
         self.model = model_data['model']
         self.feature_columns = model_data['feature_columns']
         self.label_encoders = model_data['label_encoders']
+        self.engine = self._flatten(self.model, trees_path(path))
         print(f"Model loaded from {path}")
 
 # Utility function for quick forecasting
 def generate_forecast(data_path, days_ahead=30, model_type='random_forest'):
     """Generate sales forecast"""
-    df = pd.read_csv(data_path)
-    df['Date'] = pd.to_datetime(df['Date'])
-    
-    # Remove duplicates
-    df = df.drop_duplicates()
+    # Load with the shared ingestion path (deduplicated once by transaction key)
+    df = load_transactions(data_path)
     
     # Train model
     forecaster = SalesForecastModel(df)
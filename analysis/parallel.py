@@ -0,0 +1,341 @@
+import os
+import functools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from analysis.eda import PROFIT_MARGIN, PARALLEL_AGGREGATIONS
+from analysis.dates import date_keys
+from analysis.profiling import timed
+
+
+class AggregatorClosed(RuntimeError):
+    """Raised by a ParallelAggregator used after close()"""
+
+
+def _attach(spec):
+    """Map a shared column described by (name, dtype, length) into this process"""
+    name, dtype, length = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray((length,), dtype=dtype, buffer=shm.buf)
+
+
+def _partial_sums(group_spec, value_specs, start, stop, n_groups, mask_spec=None):
+    """Row count and per-column sums per group for rows [start, stop) (selected by the mask, if any)"""
+    handles = []
+    try:
+        shm, groups = _attach(group_spec)
+        handles.append(shm)
+        g = groups[start:stop]
+        selected = slice(None)
+        if mask_spec is not None:
+            shm, mask = _attach(mask_spec)
+            handles.append(shm)
+            selected = mask[start:stop]
+            g = g[selected]
+        partial = [np.bincount(g, minlength=n_groups).astype(np.float64)]
+        for spec in value_specs:
+            shm, values = _attach(spec)
+            handles.append(shm)
+            partial.append(np.bincount(g, weights=values[start:stop][selected], minlength=n_groups))
+        return np.vstack(partial)
+    finally:
+        # Drop array views before closing the mappings
+        g = groups = values = mask = selected = None
+        for shm in handles:
+            shm.close()
+
+
+def _partial_seen(codes_spec, start, stop, n_codes, mask_spec=None):
+    """Bitmap of customer codes present in rows [start, stop) (selected by the mask, if any)"""
+    handles = []
+    try:
+        shm, codes = _attach(codes_spec)
+        handles.append(shm)
+        present = codes[start:stop]
+        if mask_spec is not None:
+            shm, mask = _attach(mask_spec)
+            handles.append(shm)
+            present = present[mask[start:stop]]
+        seen = np.zeros(n_codes, dtype=bool)
+        seen[present] = True
+        return seen
+    finally:
+        codes = mask = present = None
+        for shm in handles:
+            shm.close()
+
+
+def _while_open(method):
+    """Run an aggregation as a call in progress, so close() waits for it"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._in_use():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ParallelAggregator:
+    """Partitioned multi-process execution of the SalesAnalyzer aggregations
+
+    Columns are copied once into shared memory as numeric arrays (text
+    columns as integer codes). Rows are split into month-aligned
+    partitions, each worker computes partial sums with ``np.bincount``
+    and the partials are added together. Distinct customers are merged as
+    per-partition bitmaps over factorized customer codes, which is exact
+    and needs no re-scan per hash bucket.
+
+    Every aggregation takes an optional boolean ``rows`` mask over df, so
+    filtered views reuse the shared columns and only share their mask for
+    the duration of a call.
+
+    Use as a context manager (or call close()) to release the pool and
+    shared memory. close() waits for aggregations in progress; later
+    calls raise AggregatorClosed.
+    """
+
+    def __init__(self, df, workers=None):
+        self.df = df
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        # Guards the shared arrays, which concurrent views may request at once
+        self._lock = threading.RLock()
+        # Tracks calls in progress, so close() never frees memory a worker is reading
+        self._idle = threading.Condition()
+        self._active = 0
+        self.closed = False
+        self._shared = {}
+        self._labels = {}
+        self._order = None
+        self._partitions = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Wait for calls in progress, then shut down the worker pool and free shared memory"""
+        with self._idle:
+            self.closed = True
+            while self._active:
+                self._idle.wait()
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            for shm, _ in self._shared.values():
+                shm.close()
+                shm.unlink()
+            self._shared = {}
+            self._labels = {}
+
+    @property
+    def nbytes(self):
+        """Bytes of the columns currently copied into shared memory"""
+        with self._lock:
+            return sum(shm.size for shm, _ in self._shared.values())
+
+    @contextmanager
+    def _in_use(self):
+        """Mark a call in progress (raises AggregatorClosed once close() has started)"""
+        with self._idle:
+            if self.closed:
+                raise AggregatorClosed("ParallelAggregator is closed")
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _month_index(self):
+        dates = self.df['Date']
+        return (dates.dt.year.to_numpy(np.int64) * 12 + dates.dt.month.to_numpy(np.int64))
+
+    def _row_order(self):
+        """Permutation that makes month partitions contiguous (None if already sorted)"""
+        if self._order is None:
+            months = self._month_index()
+            sorted_rows = len(months) < 2 or bool(np.all(months[1:] >= months[:-1]))
+            self._order = False if sorted_rows else np.argsort(months, kind='stable')
+        return None if self._order is False else self._order
+
+    def _share(self, name, build):
+        """Copy the array returned by build() into shared memory once; returns its descriptor"""
+        with self._lock:
+            if name not in self._shared:
+                array = np.ascontiguousarray(build())
+                order = self._row_order()
+                if order is not None:
+                    array = array[order]
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+                self._shared[name] = (shm, (shm.name, array.dtype.str, len(array)))
+            return self._shared[name][1]
+
+    @contextmanager
+    def _shared_mask(self, rows):
+        """Descriptor of a row mask in shared memory for one call (None selects every row)"""
+        if rows is None:
+            yield None
+            return
+        mask = np.ascontiguousarray(rows, dtype=bool)
+        order = self._row_order()
+        if order is not None:
+            mask = mask[order]
+        shm = shared_memory.SharedMemory(create=True, size=max(mask.nbytes, 1))
+        try:
+            np.ndarray(mask.shape, dtype=bool, buffer=shm.buf)[:] = mask
+            yield (shm.name, mask.dtype.str, len(mask))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _codes(self, column):
+        """Integer codes and labels for a grouping column"""
+        values = self.df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy(np.int64)
+            labels = values.cat.categories
+        else:
+            codes, labels = pd.factorize(values, sort=True)
+            codes = codes.astype(np.int64)
+        # Missing values (code -1) go to a trailing slot that callers drop, like groupby
+        codes[codes < 0] = len(labels)
+        return codes, labels
+
+    def _shared_codes(self, column):
+        """Shared integer codes for a grouping column and its labels"""
+        with self._lock:
+            if column not in self._labels:
+                codes, labels = self._codes(column)
+                self._share(f"codes:{column}", lambda: codes)
+                self._labels[column] = labels
+            return self._shared[f"codes:{column}"][1], self._labels[column]
+
+    def partitions(self):
+        """Month-aligned (start, stop) row ranges, about two per worker"""
+        if self._partitions is None:
+            self._partitions = self._compute_partitions()
+        return self._partitions
+
+    def _compute_partitions(self):
+        months = self._month_index()
+        order = self._row_order()
+        if order is not None:
+            months = months[order]
+        boundaries = np.flatnonzero(np.diff(months)) + 1
+        edges = np.concatenate([[0], boundaries, [len(months)]])
+        target = max(1, len(edges) - 1) / max(1, 2 * self.workers)
+        # Merge consecutive months until each partition holds ~target months
+        picked = edges[::max(1, int(round(target)))]
+        if picked[-1] != len(months):
+            picked = np.append(picked, len(months))
+        return list(zip(picked[:-1], picked[1:]))
+
+    def _group_sums(self, group_spec, n_groups, value_columns, rows=None):
+        value_specs = [self._share(col, lambda col=col: self.df[col].to_numpy(np.float64))
+                       for col in value_columns]
+        with self._shared_mask(rows) as mask_spec:
+            futures = [self.pool.submit(_partial_sums, group_spec, value_specs, start, stop, n_groups, mask_spec)
+                       for start, stop in self.partitions()]
+            totals = np.zeros((len(value_columns) + 1, n_groups))
+            for future in futures:
+                totals += future.result()
+        return totals
+
+    @timed('parallel.aggregate')
+    @_while_open
+    def aggregate(self, column, spec, rows=None):
+        """Parallel ``groupby(column).agg(spec)`` for 'sum', 'mean' and 'count' (rows per group)
+
+        Groups are ordered like groupby's (category order, otherwise sorted)
+        and groups without rows are left out. Sums of integer columns stay
+        integers.
+        """
+        if not set(spec.values()) <= PARALLEL_AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation for parallel execution: {spec}")
+        group_spec, labels = self._shared_codes(column)
+        value_columns = [col for col, func in spec.items() if func != 'count']
+        totals = self._group_sums(group_spec, len(labels) + 1, value_columns, rows)[:, :len(labels)]
+        counts = totals[0]
+        present = counts > 0
+        result = pd.DataFrame({column: np.asarray(labels)[present]})
+        if isinstance(self.df[column].dtype, pd.CategoricalDtype):
+            result[column] = pd.Categorical(result[column], categories=labels)
+        for col, func in spec.items():
+            if func == 'count':
+                result[col] = counts[present].astype(np.int64)
+                continue
+            sums = totals[1 + value_columns.index(col)][present]
+            if func == 'mean':
+                result[col] = sums / counts[present]
+            elif pd.api.types.is_integer_dtype(self.df[col].dtype):
+                result[col] = sums.round().astype(np.int64)
+            else:
+                result[col] = sums
+        return result
+
+    @timed('parallel.breakdown')
+    def breakdown(self, column, rows=None):
+        """Parallel equivalent of sales_by_category / sales_by_region"""
+        result = self.aggregate(column, {
+            'Total_Amount': 'sum',
+            'Quantity': 'sum',
+            'Transaction_ID': 'count'
+        }, rows)
+        result[column] = result[column].astype(object)
+        result['Profit'] = result['Total_Amount'] * PROFIT_MARGIN
+        return result.sort_values('Total_Amount', ascending=False).reset_index(drop=True)
+
+    @timed('parallel.sales_by_time')
+    @_while_open
+    def sales_by_time(self, period='day', rows=None):
+        """Parallel daily or monthly sales totals"""
+        if period not in ('day', 'month'):
+            raise ValueError(f"Unsupported period for parallel aggregation: {period}")
+        with self._lock:
+            if period not in self._labels:
+                keys = date_keys(self.df['Date']).astype(np.int64) if period == 'day' else self._month_index()
+                offset = int(keys.min()) if len(keys) else 0
+                span = int(keys.max()) - offset + 1 if len(keys) else 0
+                self._share(f"time:{period}", lambda: keys - offset)
+                self._labels[period] = (offset, span)
+            offset, span = self._labels[period]
+            spec = self._shared[f"time:{period}"][1]
+        totals = self._group_sums(spec, span, ['Total_Amount'], rows)
+        present = totals[0] > 0
+        slots = np.flatnonzero(present) + offset
+        if period == 'day':
+            result = pd.DataFrame({'Date': pd.to_datetime(slots, unit='D')})
+        else:
+            result = pd.DataFrame({'Year': (slots - 1) // 12, 'Month': (slots - 1) % 12 + 1})
+        result['Total_Amount'] = totals[1][present]
+        return result
+
+    @timed('parallel.unique_customers')
+    @_while_open
+    def unique_customers(self, rows=None):
+        """Exact distinct Customer_ID count merged from per-partition bitmaps"""
+        spec, labels = self._shared_codes('Customer_ID')
+        with self._shared_mask(rows) as mask_spec:
+            futures = [self.pool.submit(_partial_seen, spec, start, stop, len(labels) + 1, mask_spec)
+                       for start, stop in self.partitions()]
+            seen = np.zeros(len(labels) + 1, dtype=bool)
+            for future in futures:
+                seen |= future.result()
+        return int(seen[:len(labels)].sum())
@@ -0,0 +1,172 @@
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from analysis.profiling import timed
+
+
+def estimate_bytes(analyzer):
+    """Approximate resident size of an analyzer: its rows, sketches, detector and shared-memory columns"""
+    total = analyzer.memory_report()['total_bytes']
+    parts = [getattr(analyzer, 'customer_sketch', None), getattr(analyzer, 'anomaly_detector', None),
+             getattr(analyzer, 'parallel', None), *getattr(analyzer, 'distribution_sketches', {}).values()]
+    return int(total + sum(part.nbytes for part in parts if part is not None))
+
+
+def _release(analyzer):
+    """Free what an evicted analyzer holds outside the Python heap (its worker processes and shared memory)"""
+    close = getattr(analyzer, 'close', None)
+    if close is not None:
+        close()
+
+
+class _Load:
+    """A load in progress, shared by every caller waiting for the same dataset"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.analyzer = None
+        self.error = None
+
+
+class AnalyzerPool:
+    """Lazily loaded analyzers, one per dataset, within a memory budget
+
+    ``datasets`` maps a dataset name to its source path and ``loader``
+    turns a path into a ready analyzer. A dataset is loaded on its first
+    get(); concurrent first requests wait on that single load instead of
+    loading again. After each load the least recently used datasets are
+    evicted until the estimated total fits ``budget_bytes`` (the dataset
+    just loaded is always kept, even if it alone exceeds the budget).
+    Loaded datasets are re-estimated before each eviction pass, since
+    sketches and shared-memory columns are built after the load.
+    Evicted analyzers are closed, which frees their worker processes and
+    shared memory; sessions still holding one keep using it serially.
+    """
+
+    def __init__(self, datasets, loader, budget_bytes=None, size_of=estimate_bytes):
+        self.datasets = dict(datasets)
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.size_of = size_of
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # name -> (analyzer, estimated bytes), least recently used first
+        self._loaded = OrderedDict()
+        self._loading = {}
+
+    @property
+    def names(self):
+        return list(self.datasets)
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(size for _, size in self._loaded.values())
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._loaded
+
+    def get(self, name):
+        """Analyzer for a dataset, loading it on first use"""
+        if name not in self.datasets:
+            raise KeyError(f"Unknown dataset {name!r}")
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                self.hits += 1
+                return self._loaded[name][0]
+            load = self._loading.get(name)
+            leader = load is None
+            if leader:
+                load = self._loading[name] = _Load()
+
+        if not leader:
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return load.analyzer
+
+        try:
+            analyzer, size = self._load(name)
+        except BaseException as exc:
+            load.error = exc
+            with self._lock:
+                del self._loading[name]
+            load.done.set()
+            raise
+
+        sizes = self._estimate_loaded()
+        with self._lock:
+            for other, (loaded, size_now) in sizes.items():
+                # Skip datasets evicted (or reloaded) while measuring
+                if other in self._loaded and self._loaded[other][0] is loaded:
+                    self._loaded[other] = (loaded, size_now)
+            self._loaded[name] = (analyzer, size)
+            del self._loading[name]
+            self.loads += 1
+            evicted = self._evict_over_budget(keep=name)
+        load.analyzer = analyzer
+        load.done.set()
+        for other in evicted:
+            _release(other)
+        return analyzer
+
+    @timed('pool.load')
+    def _load(self, name):
+        analyzer = self.loader(self.datasets[name])
+        return analyzer, self.size_of(analyzer)
+
+    def _estimate_loaded(self):
+        """Fresh (analyzer, estimated bytes) of each loaded dataset, measured outside the lock"""
+        if self.budget_bytes is None:
+            return {}
+        with self._lock:
+            loaded = {name: analyzer for name, (analyzer, _) in self._loaded.items()}
+        return {name: (analyzer, self.size_of(analyzer)) for name, analyzer in loaded.items()}
+
+    def _evict_over_budget(self, keep):
+        """Drop least recently used datasets until the total fits (caller holds the lock)
+
+        Returns the evicted analyzers, for the caller to release once the lock is free.
+        """
+        evicted = []
+        if self.budget_bytes is None:
+            return evicted
+        total = sum(size for _, size in self._loaded.values())
+        for name in list(self._loaded):
+            if total <= self.budget_bytes:
+                break
+            if name == keep:
+                continue
+            analyzer, size = self._loaded.pop(name)
+            evicted.append(analyzer)
+            total -= size
+            self.evictions += 1
+            print(f"Evicted dataset {name} ({size / 1_048_576:.1f} MB) to stay within the memory budget")
+        return evicted
+
+    def evict(self, name):
+        """Drop a loaded dataset and release its analyzer; returns whether it was loaded"""
+        with self._lock:
+            entry = self._loaded.pop(name, None)
+        if entry is None:
+            return False
+        _release(entry[0])
+        return True
+
+    def status(self):
+        """One row per dataset: whether it is loaded, its estimated size and recency rank"""
+        with self._lock:
+            recency = {name: rank for rank, name in enumerate(reversed(self._loaded))}
+            sizes = {name: size for name, (_, size) in self._loaded.items()}
+        return pd.DataFrame({
+            'Dataset': self.names,
+            'Loaded': [name in sizes for name in self.names],
+            'MB': [sizes.get(name, 0) / 1_048_576 for name in self.names],
+            'Recency': [recency.get(name) for name in self.names]
+        })
@@ -0,0 +1,228 @@
+import os
+import time
+import json
+import tempfile
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Profiling is opt-in: set SALES_PROFILING=1 or call enable()
+_enabled = os.environ.get('SALES_PROFILING', '').lower() in ('1', 'true', 'yes')
+_records = deque(maxlen=int(os.environ.get('SALES_PROFILING_MAX_RECORDS', 5000)))
+# Running calls and seconds per stage; unlike the bounded record buffer these only grow
+_totals = {}
+_lock = threading.Lock()
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def enable():
+    """Turn on stage instrumentation"""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Turn off stage instrumentation"""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    """Whether instrumentation is currently recording"""
+    return _enabled
+
+
+def reset():
+    """Drop all recorded timings"""
+    with _lock:
+        _records.clear()
+        _totals.clear()
+
+
+def current_rss():
+    """Resident set size of this process in bytes (0 if unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is a peak value (KB on Linux, bytes on macOS) - best effort only
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return 0
+
+
+def _record(stage, elapsed, rows, mem_delta):
+    with _lock:
+        _records.append({
+            'stage': stage,
+            'timestamp': time.time(),
+            'wall_ms': elapsed * 1000.0,
+            'rows': rows,
+            'mem_delta_bytes': mem_delta
+        })
+        totals = _totals.setdefault(stage, [0, 0.0])
+        totals[0] += 1
+        totals[1] += elapsed
+
+
+def _rows_of(obj):
+    """Best-effort row count for a frame, analyzer or sized result"""
+    # Look in the instance dict so lazily materialized ``df`` properties are not triggered
+    df = getattr(obj, '__dict__', {}).get('df')
+    if isinstance(df, pd.DataFrame):
+        return len(df)
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    return None
+
+
+@contextmanager
+def timed_block(stage, rows=None):
+    """Time a block of code under the given stage name"""
+    if not _enabled:
+        yield
+        return
+    mem_before = current_rss()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _record(stage, elapsed, rows, current_rss() - mem_before)
+
+
+def timed(stage):
+    """Decorator recording wall time, rows and memory delta of each call
+
+    Rows are taken from the instance's ``df`` for analyzer/model methods,
+    otherwise from the length of a returned frame.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            mem_before = current_rss()
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            rows = _rows_of(args[0]) if args else None
+            if rows is None:
+                rows = _rows_of(result)
+            _record(stage, elapsed, rows, current_rss() - mem_before)
+            return result
+        return wrapper
+    return decorator
+
+
+def get_records():
+    """Return raw timing records as a DataFrame"""
+    with _lock:
+        records = list(_records)
+    return pd.DataFrame(records, columns=['stage', 'timestamp', 'wall_ms', 'rows', 'mem_delta_bytes'])
+
+
+def totals():
+    """Calls and seconds per stage since start (or the last reset), including records that rolled off"""
+    with _lock:
+        return {stage: (calls, seconds) for stage, (calls, seconds) in _totals.items()}
+
+
+def summary():
+    """Aggregate timings per stage, slowest first"""
+    records = get_records()
+    if records.empty:
+        return pd.DataFrame(columns=['stage', 'calls', 'total_ms', 'mean_ms', 'max_ms',
+                                     'last_ms', 'rows', 'mem_delta_bytes'])
+    result = records.groupby('stage').agg(
+        calls=('wall_ms', 'count'),
+        total_ms=('wall_ms', 'sum'),
+        mean_ms=('wall_ms', 'mean'),
+        max_ms=('wall_ms', 'max'),
+        last_ms=('wall_ms', 'last'),
+        rows=('rows', 'last'),
+        mem_delta_bytes=('mem_delta_bytes', 'sum')
+    ).reset_index()
+    return result.sort_values('total_ms', ascending=False).reset_index(drop=True)
+
+
+def to_prometheus():
+    """Render per-stage metrics in the Prometheus text exposition format
+
+    The counters come from running totals, so they never decrease when old
+    records leave the buffer; the gauges describe the buffered records.
+    """
+    stats = summary()
+    stage_totals = totals()
+    lines = [
+        '# HELP sales_stage_calls_total Number of instrumented calls per stage',
+        '# TYPE sales_stage_calls_total counter',
+    ]
+    lines += [f'sales_stage_calls_total{{stage="{stage}"}} {calls}'
+              for stage, (calls, _) in sorted(stage_totals.items())]
+    lines += [
+        '# HELP sales_stage_seconds_total Wall time spent per stage',
+        '# TYPE sales_stage_seconds_total counter',
+    ]
+    lines += [f'sales_stage_seconds_total{{stage="{stage}"}} {seconds:.6f}'
+              for stage, (_, seconds) in sorted(stage_totals.items())]
+    lines += [
+        '# HELP sales_stage_last_seconds Wall time of the most recent call per stage',
+        '# TYPE sales_stage_last_seconds gauge',
+    ]
+    lines += [f'sales_stage_last_seconds{{stage="{row.stage}"}} {row.last_ms / 1000.0:.6f}'
+              for row in stats.itertuples()]
+    lines += [
+        '# HELP sales_stage_rows Rows processed by the most recent call per stage',
+        '# TYPE sales_stage_rows gauge',
+    ]
+    lines += [f'sales_stage_rows{{stage="{row.stage}"}} {int(row.rows)}'
+              for row in stats.itertuples() if pd.notna(row.rows)]
+    lines += [
+        '# HELP sales_stage_memory_delta_bytes Cumulative RSS change per stage',
+        '# TYPE sales_stage_memory_delta_bytes gauge',
+    ]
+    lines += [f'sales_stage_memory_delta_bytes{{stage="{row.stage}"}} {int(row.mem_delta_bytes)}'
+              for row in stats.itertuples()]
+    return '\n'.join(lines) + '\n'
+
+
+def to_json():
+    """Render per-stage metrics as JSON"""
+    stats = summary()
+    return json.dumps({
+        'enabled': _enabled,
+        'generated_at': time.time(),
+        'stages': json.loads(stats.to_json(orient='records'))
+    }, indent=2)
+
+
+def write_metrics(path):
+    """Write metrics to a file for scraping (.json for JSON, Prometheus text otherwise)
+
+    The file is replaced atomically so a scraper never reads a partial write.
+    """
+    content = to_json() if str(path).endswith('.json') else to_prometheus()
+    # A unique file per write, so sessions writing at the same time never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(str(path)) or '.',
+                                    prefix=f"{os.path.basename(str(path))}.", suffix='.tmp')
+    try:
+        # mkstemp creates the file owner-only; keep it readable by a scraper running as another user
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
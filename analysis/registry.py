@@ -0,0 +1,107 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from analysis.profiling import timed
+
+
+def model_key(data_version, filters, model_type, params=None):
+    """Registry key of a model trained on one dataset version and filter selection with given hyperparameters"""
+    spec = json.dumps([data_version, filters, model_type, params], default=str, sort_keys=True)
+    return hashlib.sha1(spec.encode('utf-8')).hexdigest()[:16]
+
+
+class ModelRegistry:
+    """Fitted forecasters held once per process and referenced by key from sessions
+
+    get_or_train() trains a model only if no other caller has (concurrent
+    callers for the same key wait for the first). Training data is
+    released once a model is registered, and least recently used models
+    are evicted when the estimated total exceeds ``budget_bytes``; a
+    session whose model was evicted keeps its ForecastResult and retrains
+    only if it forecasts again.
+    """
+
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes
+        self.trained = 0
+        self.hits = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        # key -> (forecaster, estimated bytes), least recently used first
+        self._models = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._models)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return sum(size for _, size in self._models.values())
+
+    def get(self, key):
+        """Registered forecaster for key, or None"""
+        with self._lock:
+            if key not in self._models:
+                return None
+            self._models.move_to_end(key)
+            return self._models[key][0]
+
+    def get_or_train(self, key, train):
+        """Forecaster for key, calling ``train()`` if it is not registered; returns (forecaster, trained)"""
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            forecaster = self.get(key)
+            if forecaster is not None:
+                with self._lock:
+                    self.hits += 1
+                return forecaster, False
+            forecaster = self._train(train)
+            self.put(key, forecaster)
+            return forecaster, True
+
+    @timed('registry.train')
+    def _train(self, train):
+        return train().release_data()
+
+    def put(self, key, forecaster):
+        with self._lock:
+            self._models[key] = (forecaster, forecaster.nbytes)
+            self._models.move_to_end(key)
+            self.trained += 1
+            self._evict_over_budget(keep=key)
+
+    def _evict_over_budget(self, keep):
+        """Drop least recently used models until the total fits (caller holds the lock)"""
+        if self.budget_bytes is None:
+            return
+        total = sum(size for _, size in self._models.values())
+        for key in list(self._models):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            _, size = self._models.pop(key)
+            self._key_locks.pop(key, None)
+            total -= size
+            self.evictions += 1
+
+    def status(self):
+        """One row per registered model, most recently used first"""
+        with self._lock:
+            entries = list(reversed(self._models.items()))
+        return pd.DataFrame({
+            'Key': [key for key, _ in entries],
+            'Model': [forecaster.model_type for _, (forecaster, _) in entries],
+            'MB': [size / 1_048_576 for _, (_, size) in entries]
+        })
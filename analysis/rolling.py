@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+
+def growth_rates(totals):
+    """Percent change between consecutive totals (NaN for the first, like pct_change)"""
+    totals = np.asarray(totals, dtype=np.float64)
+    rates = np.full(len(totals), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates[1:] = (totals[1:] / totals[:-1] - 1) * 100
+    return rates
+
+
+class RollingStats:
+    """Cumulative-sum state over a daily series for O(1) windowed statistics
+
+    Windows count observations (like ``Series.rolling(n)``), not calendar
+    days. Any window sum is the difference of two prefix sums, so means,
+    sums and growth for arbitrary windows cost O(1) each and a full rolling
+    column costs O(days). Appending a day extends the prefix sums in
+    amortized O(1), so forecasts can roll the state forward one step at a
+    time.
+    """
+
+    def __init__(self, values=(), dates=None):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        capacity = max(16, 2 * n)
+        self._n = n
+        self._values = np.zeros(capacity)
+        self._values[:n] = values
+        # _cumsum[i] is the sum of the first i values
+        self._cumsum = np.zeros(capacity + 1)
+        self._cumsum[1:n + 1] = np.cumsum(values)
+        self._dates = np.full(capacity, np.datetime64('NaT'), dtype='datetime64[ns]')
+        if dates is not None:
+            self._dates[:n] = pd.to_datetime(np.asarray(dates)).to_numpy('datetime64[ns]')
+
+    @classmethod
+    def from_frame(cls, df, value_column, date_column='Date'):
+        """State over a frame with one row per day"""
+        return cls(df[value_column].to_numpy(np.float64), df[date_column])
+
+    def __len__(self):
+        return self._n
+
+    def copy(self):
+        """Independent copy, e.g. to roll a forecast forward without touching the source"""
+        return RollingStats(self.values, self.dates)
+
+    @property
+    def values(self):
+        return self._values[:self._n]
+
+    @property
+    def dates(self):
+        return self._dates[:self._n]
+
+    def _reserve(self, extra):
+        needed = self._n + extra
+        if needed <= len(self._values):
+            return
+        capacity = max(needed, 2 * len(self._values))
+        self._values = np.concatenate([self._values, np.zeros(capacity - len(self._values))])
+        self._cumsum = np.concatenate([self._cumsum, np.zeros(capacity + 1 - len(self._cumsum))])
+        self._dates = np.concatenate([
+            self._dates, np.full(capacity - len(self._dates), np.datetime64('NaT'), dtype='datetime64[ns]')
+        ])
+
+    def extend(self, values, dates=None):
+        """Append days; existing prefix sums are untouched"""
+        values = np.asarray(values, dtype=np.float64)
+        k = len(values)
+        self._reserve(k)
+        start, stop = self._n, self._n + k
+        self._values[start:stop] = values
+        self._cumsum[start + 1:stop + 1] = self._cumsum[start] + np.cumsum(values)
+        if dates is not None:
+            self._dates[start:stop] = pd.to_datetime(np.asarray(dates)).to_numpy('datetime64[ns]')
+        self._n = stop
+
+    def append(self, value, date=None):
+        """Append one day"""
+        self.extend([value], None if date is None else [date])
+
+    def _window(self, window, end):
+        """Prefix-sum bounds (start, stop) of the window ending at observation ``end``"""
+        if self._n == 0:
+            return 0, 0
+        stop = self._n if end is None else (end % self._n) + 1
+        return max(stop - window, 0), stop
+
+    def window_sum(self, window, end=None):
+        """Sum of the last ``window`` values up to ``end`` (default: the latest day)"""
+        start, stop = self._window(window, end)
+        return self._cumsum[stop] - self._cumsum[start]
+
+    def window_mean(self, window, end=None):
+        """Mean of the last ``window`` values up to ``end`` (shorter at the start of the series)"""
+        start, stop = self._window(window, end)
+        if stop == start:
+            return np.nan
+        return (self._cumsum[stop] - self._cumsum[start]) / (stop - start)
+
+    def growth(self, window, end=None):
+        """Percent change of the window sum versus the window before it"""
+        start, stop = self._window(window, end)
+        if stop - start < window or start < window:
+            return np.nan
+        previous = self._cumsum[start] - self._cumsum[start - window]
+        return growth_rates([previous, self._cumsum[stop] - self._cumsum[start]])[1]
+
+    def rolling_sum(self, window, min_periods=None):
+        """Windowed sum at every observation (Series.rolling(window, min_periods).sum())"""
+        min_periods = window if min_periods is None else min_periods
+        stops = np.arange(1, self._n + 1)
+        starts = np.maximum(stops - window, 0)
+        sums = self._cumsum[stops] - self._cumsum[starts]
+        sums[stops - starts < min_periods] = np.nan
+        return sums
+
+    def rolling_mean(self, window, min_periods=None):
+        """Windowed mean at every observation (Series.rolling(window, min_periods).mean())"""
+        stops = np.arange(1, self._n + 1)
+        return self.rolling_sum(window, min_periods) / (stops - np.maximum(stops - window, 0))
+
+    def period_sums(self, keys):
+        """Totals per run of equal keys (e.g. a month index per day, in date order)"""
+        keys = np.asarray(keys)
+        if len(keys) == 0:
+            return keys, np.zeros(0)
+        starts = np.concatenate([[0], np.flatnonzero(keys[1:] != keys[:-1]) + 1])
+        stops = np.append(starts[1:], len(keys))
+        return keys[starts], self._cumsum[stops] - self._cumsum[starts]
+
+    def monthly_growth(self):
+        """Monthly totals and month-over-month growth rate from the daily state"""
+        dates = pd.DatetimeIndex(self.dates)
+        months, totals = self.period_sums(dates.year.to_numpy(np.int64) * 12 + dates.month.to_numpy(np.int64) - 1)
+        return pd.DataFrame({
+            'Year': months // 12,
+            'Month': months % 12 + 1,
+            'Total_Amount': totals,
+            'Growth_Rate': growth_rates(totals)
+        })
@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+
+from analysis.dates import date_keys
+from analysis.profiling import timed
+
+
+def hash_values(values):
+    """Stable 64-bit hashes of a column (categories are hashed once, then gathered)"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        category_hashes = pd.util.hash_array(values.cat.categories.to_numpy(dtype=object))
+        return category_hashes[values.cat.codes.to_numpy()]
+    return pd.util.hash_array(values.to_numpy(dtype=object))
+
+
+def _bit_length(x):
+    """Vectorized int.bit_length for uint64 arrays"""
+    x = x.copy()
+    length = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (np.uint64(1) << np.uint64(shift))
+        length[high] += shift
+        x[high] >>= np.uint64(shift)
+    length += (x > 0).astype(np.uint8)
+    return length
+
+
+def hll_registers(hashes, precision):
+    """Register index and rank (position of the first 1-bit) for each hash"""
+    suffix_bits = 64 - precision
+    index = (hashes >> np.uint64(suffix_bits)).astype(np.int64)
+    remainder = hashes & np.uint64((1 << suffix_bits) - 1)
+    rank = (suffix_bits + 1 - _bit_length(remainder)).astype(np.uint8)
+    return index, rank
+
+
+def hll_estimate(registers):
+    """Cardinality estimate from a dense register array"""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros:
+        # Small-range correction (linear counting)
+        estimate = m * np.log(m / zeros)
+    return float(estimate)
+
+
+def _encode_cells(df, dimensions):
+    """Composite cell id per row (day offset, then each dimension code) plus dimension labels"""
+    days = date_keys(df['Date']).astype(np.int64)
+    first_day = int(days.min()) if len(days) else 0
+    cell = days - first_day
+    labels = {}
+    for dim in dimensions:
+        dim_codes, dim_labels = pd.factorize(df[dim], sort=True)
+        labels[dim] = list(dim_labels)
+        cell = cell * (len(dim_labels) + 1) + (dim_codes.astype(np.int64) + 1)
+    return first_day, labels, cell
+
+
+def _decode_cells(cell, dimensions, labels):
+    """Split composite cell ids back into day offsets and per-dimension codes"""
+    codes = {}
+    for dim in reversed(dimensions):
+        cell, code = np.divmod(cell, len(labels[dim]) + 1)
+        codes[dim] = (code - 1).astype(np.int16)
+    return cell.astype(np.int32), codes
+
+
+class _CellSketch:
+    """Sparse sketch entries keyed by day x dimension cell"""
+
+    def __init__(self, first_day, dimensions, labels, day, codes):
+        self.first_day = first_day
+        self.dimensions = dimensions
+        self.labels = labels
+        self.day = day
+        self.codes = codes
+
+    @property
+    def nbytes(self):
+        """Memory held by the cell keys"""
+        return self.day.nbytes + sum(c.nbytes for c in self.codes.values())
+
+    def _mask(self, start_date=None, end_date=None, **filters):
+        mask = np.ones(len(self.day), dtype=bool)
+        if start_date:
+            mask &= self.day >= date_keys([start_date])[0] - self.first_day
+        if end_date:
+            mask &= self.day <= date_keys([end_date])[0] - self.first_day
+        for dim, values in filters.items():
+            if values:
+                wanted = [self.labels[dim].index(v) for v in values if v in self.labels[dim]]
+                mask &= np.isin(self.codes[dim], wanted)
+        return mask
+
+
+class CustomerSketch(_CellSketch):
+    """HyperLogLog distinct-customer sketches per day x Category x Region
+
+    Each cell's registers are stored sparsely as (cell, register, rank)
+    entries, so quiet cells cost only the registers they touch. Any date
+    range and Category/Region filter is answered by max-merging the
+    matching entries into one dense register array.
+
+    Error bound: the relative standard error is 1.04 / sqrt(2**precision),
+    i.e. about 1.6% at the default precision of 12 (4096 registers); ~95%
+    of estimates fall within two standard errors (about +-3.3%).
+    """
+
+    def __init__(self, precision, first_day, dimensions, labels, day, codes, register, rank):
+        super().__init__(first_day, dimensions, labels, day, codes)
+        self.precision = precision
+        self.register = register
+        self.rank = rank
+
+    @property
+    def standard_error(self):
+        """Relative standard error of an estimate"""
+        return 1.04 / np.sqrt(2 ** self.precision)
+
+    @property
+    def nbytes(self):
+        """Memory held by the sketch entries"""
+        return super().nbytes + self.register.nbytes + self.rank.nbytes
+
+    @classmethod
+    @timed('sketches.build')
+    def build(cls, df, precision=12, dimensions=('Category', 'Region'), column='Customer_ID'):
+        """Build sketches for every day x dimension cell of df"""
+        m = 1 << precision
+        first_day, labels, cell = _encode_cells(df, dimensions)
+        register, rank = hll_registers(hash_values(df[column]), precision)
+
+        # Keep the max rank per (cell, register): sort by key with rank in the low bits
+        combined = np.unique(((cell * m + register) << 6) | rank.astype(np.int64))
+        keys = combined >> 6
+        last = np.append(np.flatnonzero(np.diff(keys)), len(keys) - 1) if len(keys) else np.array([], dtype=np.int64)
+        keys, rank = keys[last], (combined[last] & 63).astype(np.uint8)
+
+        cell, register = np.divmod(keys, m)
+        day, entry_codes = _decode_cells(cell, dimensions, labels)
+        return cls(precision, first_day, list(dimensions), labels,
+                   day, entry_codes, register.astype(np.uint16), rank)
+
+    def registers(self, start_date=None, end_date=None, categories=None, regions=None):
+        """Dense registers merged over all cells matching the filter"""
+        mask = self._mask(start_date, end_date, Category=categories, Region=regions)
+        dense = np.zeros(1 << self.precision, dtype=np.uint8)
+        np.maximum.at(dense, self.register[mask], self.rank[mask])
+        return dense
+
+    @timed('sketches.estimate')
+    def estimate(self, start_date=None, end_date=None, categories=None, regions=None):
+        """Approximate distinct customers for the filter (same semantics as get_filtered_data)"""
+        return hll_estimate(self.registers(start_date, end_date, categories, regions))
+
+
+def quantile_label(q):
+    """Column label for a quantile, e.g. 0.5 -> 'P50', 0.999 -> 'P99.9'"""
+    return f"P{q * 100:g}"
+
+
+def histogram_quantiles(counts, qs):
+    """Lower-rank bucket index of each quantile for every row of a (groups x buckets) count matrix"""
+    cumulative = np.cumsum(counts, axis=1)
+    totals = cumulative[:, -1:]
+    ranks = np.asarray(qs, dtype=np.float64)[None, :] * np.maximum(totals - 1, 0)
+    # First bucket whose cumulative count exceeds the target rank, per group and quantile
+    index = np.stack([
+        (cumulative <= ranks[:, [j]]).sum(axis=1) for j in range(ranks.shape[1])
+    ], axis=1)
+    # Empty groups run off the end; callers mask them out
+    return np.minimum(index, counts.shape[1] - 1)
+
+
+class QuantileSketch(_CellSketch):
+    """Relative-error quantile sketches per day x Category x Region x Customer_Segment
+
+    Values are counted in logarithmic buckets (the DDSketch scheme): bucket
+    ``k`` holds values in (gamma**(k-1), gamma**k] with
+    gamma = (1 + accuracy) / (1 - accuracy). Counts add, so cells merge
+    exactly and any filter is answered by summing the matching (cell,
+    bucket, count) entries into one histogram. Every reported quantile is
+    within ``relative_accuracy`` of a true sample value of that rank.
+
+    Memory is bounded by cells x buckets regardless of the row count; at the
+    default 1% accuracy, values from 0.01 to 10 million span ~1,000 buckets.
+    Values <= 0 are counted in a dedicated zero bucket.
+    """
+
+    def __init__(self, relative_accuracy, column, first_day, dimensions, labels, day, codes,
+                 min_key, bucket, count):
+        super().__init__(first_day, dimensions, labels, day, codes)
+        self.relative_accuracy = relative_accuracy
+        self.column = column
+        self.min_key = min_key
+        self.bucket = bucket
+        self.count = count
+
+    @property
+    def gamma(self):
+        return (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+
+    @property
+    def n_buckets(self):
+        """Histogram width: zero bucket plus the observed key range"""
+        return int(self.bucket.max()) + 1 if len(self.bucket) else 1
+
+    @property
+    def nbytes(self):
+        """Memory held by the sketch entries"""
+        return super().nbytes + self.bucket.nbytes + self.count.nbytes
+
+    @classmethod
+    @timed('sketches.build_quantiles')
+    def build(cls, df, column, relative_accuracy=0.01,
+              dimensions=('Category', 'Region', 'Customer_Segment')):
+        """Build sketches of df[column] for every day x dimension cell"""
+        values = df[column].to_numpy(np.float64)
+        present = ~np.isnan(values)
+        first_day, labels, cell = _encode_cells(df, dimensions)
+        values, cell = values[present], cell[present]
+
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        positive = values > 0
+        keys = np.zeros(len(values), dtype=np.int64)
+        keys[positive] = np.ceil(np.log(values[positive]) / np.log(gamma)).astype(np.int64)
+        min_key = int(keys[positive].min()) if positive.any() else 0
+        # Bucket 0 is the zero bucket, positive keys start at 1
+        bucket = np.where(positive, keys - min_key + 1, 0)
+
+        n_buckets = int(bucket.max()) + 1 if len(bucket) else 1
+        entries, count = np.unique(cell * n_buckets + bucket, return_counts=True)
+        cell, bucket = np.divmod(entries, n_buckets)
+        day, entry_codes = _decode_cells(cell, dimensions, labels)
+        return cls(relative_accuracy, column, first_day, list(dimensions), labels, day, entry_codes,
+                   min_key, bucket.astype(np.int32), count.astype(np.uint32))
+
+    def bucket_values(self):
+        """Representative value of every bucket (2 * gamma**k / (gamma + 1), 0 for the zero bucket)"""
+        keys = np.arange(self.n_buckets, dtype=np.float64) - 1 + self.min_key
+        values = 2 * np.power(self.gamma, keys) / (self.gamma + 1)
+        values[0] = 0.0
+        return values
+
+    def histograms(self, by=None, start_date=None, end_date=None,
+                   categories=None, regions=None, segments=None):
+        """Merged bucket counts for the filter, one row per value of ``by`` (or a single row)"""
+        mask = self._mask(start_date, end_date, Category=categories, Region=regions,
+                          Customer_Segment=segments)
+        n_buckets = self.n_buckets
+        if by is None:
+            return np.bincount(self.bucket[mask], weights=self.count[mask],
+                               minlength=n_buckets)[None, :]
+        n_groups = len(self.labels[by])
+        slots = self.codes[by][mask].astype(np.int64) * n_buckets + self.bucket[mask]
+        counts = np.bincount(slots, weights=self.count[mask], minlength=n_groups * n_buckets)
+        return counts.reshape(n_groups, n_buckets)
+
+    @timed('sketches.quantiles')
+    def quantiles(self, qs=(0.5, 0.9, 0.99), by=None, **filters):
+        """Count and approximate quantiles for the filter, overall or per value of ``by``"""
+        counts = self.histograms(by, **filters)
+        estimates = self.bucket_values()[histogram_quantiles(counts, qs)]
+        result = pd.DataFrame(estimates, columns=[quantile_label(q) for q in qs])
+        result.insert(0, 'Transactions', counts.sum(axis=1).astype(np.int64))
+        if by is not None:
+            result.insert(0, by, self.labels[by])
+            result = result[result['Transactions'] > 0].reset_index(drop=True)
+        # Empty groups have no quantiles
+        result.loc[result['Transactions'] == 0, [quantile_label(q) for q in qs]] = np.nan
+        return result
@@ -0,0 +1,192 @@
+import os
+import json
+import struct
+import hashlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from analysis.profiling import timed
+
+# Bump when the file layout changes; older snapshots are then rebuilt
+SNAPSHOT_FORMAT = 1
+
+MAGIC = b'SALESNAP'
+_HEADER = struct.Struct('<8sQ')
+
+# Column data starts on cache-line boundaries so every view is aligned
+_ALIGN = 64
+
+
+def _align(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def source_fingerprint(data_path):
+    """Identity of a source file: absolute path, size and modification time"""
+    stat = os.stat(data_path)
+    return {'path': os.path.abspath(data_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _encode_column(values):
+    """Raw array for a column plus the metadata needed to rebuild it"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), {
+            'kind': 'category',
+            'categories': values.cat.categories.tolist(),
+            'ordered': bool(values.cat.ordered)
+        }
+    if values.dtype == object:
+        # Strings are dictionary-encoded; they come back as objects on open
+        codes, uniques = pd.factorize(values)
+        return codes.astype(np.int32), {'kind': 'object', 'categories': uniques.tolist()}
+    if isinstance(values.dtype, np.dtype):
+        return values.to_numpy(), {'kind': 'array'}
+    raise ValueError(f"Column {values.name!r} has unsupported dtype {values.dtype} for a snapshot")
+
+
+@timed('snapshot.write')
+def write_snapshot(df, path, source=None, compact=False):
+    """Write the columns of df to a memory-mappable snapshot file
+
+    Layout: magic, header length, JSON header (row count, source
+    fingerprint, column dtypes/offsets and category dictionaries), then
+    the raw column arrays, each 64-byte aligned. The file is written
+    under a temporary name and renamed into place, so readers never see
+    a partial snapshot. The index is not stored (readers get a RangeIndex).
+    """
+    columns, arrays = [], []
+    offset = 0
+    for name in df.columns:
+        data, meta = _encode_column(df[name])
+        data = np.ascontiguousarray(data)
+        offset = _align(offset)
+        columns.append({'name': name, 'dtype': data.dtype.str, 'offset': offset,
+                        'nbytes': data.nbytes, **meta})
+        arrays.append(data)
+        offset += data.nbytes
+
+    header = {
+        'format': SNAPSHOT_FORMAT,
+        'rows': len(df),
+        'compact': compact,
+        'source': source,
+        'attrs': {k: v for k, v in df.attrs.items() if isinstance(v, (str, int, float, bool))},
+        'columns': columns
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(_HEADER.size + len(header_bytes))
+
+    # A unique file per write, so sessions building the same snapshot never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(str(path)) or '.',
+                                    prefix=f"{os.path.basename(str(path))}.", suffix='.tmp')
+    try:
+        # Other processes map the snapshot too; keep it readable like a normally created file
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            for meta, data in zip(columns, arrays):
+                f.seek(data_start + meta['offset'])
+                f.write(data.view(np.uint8).data)
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    print(f"Snapshot written to {path} ({len(df)} rows, {(data_start + offset) / 1_048_576:.1f} MB)")
+    return path
+
+
+def read_header(path):
+    """Header of a snapshot file and the offset where its column data starts"""
+    with open(path, 'rb') as f:
+        magic, length = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a sales snapshot")
+        header = json.loads(f.read(length))
+    return header, _align(_HEADER.size + length)
+
+
+def is_fresh(path, data_path=None, compact=None):
+    """Whether path holds a current-format snapshot of data_path with the given schema"""
+    try:
+        header, _ = read_header(path)
+    except (OSError, ValueError, struct.error):
+        return False
+    if header.get('format') != SNAPSHOT_FORMAT:
+        return False
+    if compact is not None and header['compact'] != compact:
+        return False
+    if data_path is not None and header['source'] != source_fingerprint(data_path):
+        return False
+    return True
+
+
+class Snapshot:
+    """Read-only memory mapping of a snapshot file
+
+    Column arrays are views into the mapping, so opening costs only the
+    header parse, nothing is copied, and every process that opens the
+    same file shares its pages through the OS page cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header, data_start = read_header(path)
+        if self.header['format'] != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} has snapshot format {self.header['format']}, expected {SNAPSHOT_FORMAT}")
+        self._data = np.memmap(path, mode='r', dtype=np.uint8)[data_start:]
+        self._columns = {meta['name']: meta for meta in self.header['columns']}
+
+    @property
+    def rows(self):
+        return self.header['rows']
+
+    @property
+    def compact(self):
+        return self.header['compact']
+
+    @property
+    def attrs(self):
+        return self.header['attrs']
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def nbytes(self):
+        return len(self._data)
+
+    @property
+    def version(self):
+        """Short id of this snapshot's contents (format, source and schema)"""
+        key = json.dumps([self.header['format'], self.header['source'], self.compact, self.rows])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+    def raw(self, name):
+        """Stored array of a column (codes for dictionary-encoded columns), no copy"""
+        meta = self._columns[name]
+        return self._data[meta['offset']:meta['offset'] + meta['nbytes']].view(np.dtype(meta['dtype']))
+
+    def column(self, name):
+        """Column values; categoricals wrap the mapped codes without copying"""
+        meta = self._columns[name]
+        data = self.raw(name)
+        if meta['kind'] == 'array':
+            return data
+        categorical = pd.Categorical.from_codes(
+            data, categories=pd.Index(meta['categories']),
+            ordered=meta.get('ordered', False), validate=False
+        )
+        return categorical if meta['kind'] == 'category' else np.asarray(categorical, dtype=object)
+
+    @timed('snapshot.to_frame')
+    def to_frame(self, columns=None):
+        """DataFrame over the mapped columns (read-only; assigning a new column is fine)"""
+        columns = self.columns if columns is None else list(columns)
+        df = pd.DataFrame({name: self.column(name) for name in columns}, copy=False)
+        df.attrs.update(self.attrs)
+        return df
@@ -0,0 +1,504 @@
+import os
+import json
+import sqlite3
+import hashlib
+import tempfile
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+from analysis.eda import SalesAnalyzer, PROFIT_MARGIN, value_quantiles, filters_key
+from analysis.dates import MONTH_NAMES
+from analysis.customers import score_rfm
+from analysis.rolling import RollingStats
+from analysis.anomalies import AnomalyDetector
+from analysis.affinity import ProductAffinity, AffinityCache, customer_product_matrix
+from analysis.export import EXPORT_COLUMNS, CHUNK_ROWS
+from analysis.validation import schema_for
+from analysis.profiling import timed
+
+TABLE = 'sales'
+
+# Columns persisted to the database (Profit stays virtual)
+STORED_COLUMNS = [
+    'Transaction_ID', 'Date', 'Customer_ID', 'Customer_Segment', 'Product', 'Category',
+    'Quantity', 'Unit_Price', 'Discount_Percent', 'Total_Amount', 'Region',
+    'Payment_Method', 'Shipping_Method', 'Year', 'Month', 'Month_Name', 'Quarter',
+    'Day_of_Week', 'Week', 'Date_Key'
+]
+
+INDEXED_COLUMNS = ['Date', 'Category', 'Region', 'Customer_ID']
+
+DISCOUNT_LABELS = ['No Discount', '1-10%', '11-20%', '20%+']
+
+
+@timed('sql.build_database')
+def build_database(data_path, db_path, chunksize=100_000):
+    """Load and clean the CSV once, then persist it to SQLite with indexes"""
+    analyzer = SalesAnalyzer(data_path, compact=True, schema=schema_for(data_path))
+    df = analyzer.df[[c for c in STORED_COLUMNS if c in analyzer.df.columns]].copy()
+    # ISO dates sort and compare correctly as text
+    df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(str)
+
+    # A unique file per build, so concurrent rebuilds never write to the same one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(db_path) or '.',
+                                    prefix=f"{os.path.basename(db_path)}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        with closing(sqlite3.connect(tmp_path)) as conn, conn:
+            df.to_sql(TABLE, conn, index=False, chunksize=chunksize)
+            for col in INDEXED_COLUMNS:
+                conn.execute(f'CREATE INDEX idx_{TABLE}_{col.lower()} ON {TABLE} ({col})')
+            conn.execute('ANALYZE')
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    print(f"Database written to {db_path} ({len(df)} rows)")
+    return db_path
+
+
+class SQLiteSalesAnalyzer:
+    """SalesAnalyzer backend that pushes filters and aggregates down to SQLite
+
+    Only aggregate results are held in memory. Each query opens its own
+    read-only connection, so one instance can be shared across threads.
+    """
+
+    def __init__(self, db_path, filters=None):
+        self.db_path = db_path
+        self.compact = True
+        self.filters = filters or {}
+        self.anomaly_detector = None
+        self.affinity_cache = AffinityCache()
+        self._daily_stats = None
+
+    @classmethod
+    def from_csv(cls, data_path, db_path):
+        """Open db_path, (re)building it from the CSV when missing or stale"""
+        if (not os.path.exists(db_path)
+                or os.path.getmtime(db_path) < os.path.getmtime(data_path)):
+            build_database(data_path, db_path)
+        return cls(db_path)
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def _query(self, sql, params=()):
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def _where(self, alias=''):
+        """WHERE clause and parameters for the current filters"""
+        prefix = f"{alias}." if alias else ''
+        clauses, params = [], []
+        if self.filters.get('start_date'):
+            clauses.append(f"{prefix}Date >= ?")
+            params.append(pd.to_datetime(self.filters['start_date']).strftime('%Y-%m-%d'))
+        if self.filters.get('end_date'):
+            clauses.append(f"{prefix}Date <= ?")
+            params.append(pd.to_datetime(self.filters['end_date']).strftime('%Y-%m-%d'))
+        for col, key in (('Category', 'categories'), ('Region', 'regions')):
+            values = self.filters.get(key)
+            if values:
+                clauses.append(f"{prefix}{col} IN ({', '.join('?' * len(values))})")
+                params.extend(str(v) for v in values)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+
+    def _grouped(self, column, select, order_by):
+        where, params = self._where()
+        sql = (f"SELECT {column}, {select} FROM {TABLE} {where} "
+               f"GROUP BY {column} ORDER BY {order_by}")
+        return self._query(sql, params)
+
+    @property
+    def df(self):
+        """Filtered transactions materialized as a DataFrame (expensive)"""
+        return self.get_filtered_data()
+
+    @property
+    def data_version(self):
+        """Short id of the database contents (path, size and modification time)"""
+        stat = os.stat(self.db_path)
+        key = json.dumps([os.path.abspath(self.db_path), stat.st_size, stat.st_mtime_ns])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+    def row_count(self):
+        """Number of transactions matching the current filters"""
+        where, params = self._where()
+        return int(self._query(f"SELECT COUNT(*) AS n FROM {TABLE} {where}", params)['n'].iloc[0])
+
+    def iter_chunks(self, columns=EXPORT_COLUMNS, chunk_rows=CHUNK_ROWS):
+        """Matching rows read from the database in chunks, ordered like the in-memory frame
+
+        Transaction IDs are exported as the integers stored in the database.
+        """
+        where, params = self._where()
+        sql = f"SELECT {', '.join(columns)} FROM {TABLE} {where} ORDER BY Date, rowid"
+        with closing(self._connect()) as conn:
+            empty = True
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=chunk_rows):
+                empty = False
+                chunk['Date'] = pd.to_datetime(chunk['Date'])
+                yield chunk
+            if empty:
+                yield pd.DataFrame(columns=columns)
+
+    def date_bounds(self):
+        """First and last transaction date"""
+        where, params = self._where()
+        bounds = self._query(f"SELECT MIN(Date) AS first, MAX(Date) AS last FROM {TABLE} {where}", params)
+        return pd.to_datetime(bounds['first'].iloc[0]), pd.to_datetime(bounds['last'].iloc[0])
+
+    def distinct_values(self, column):
+        """Distinct values of a column in order of first appearance"""
+        where, params = self._where()
+        sql = f"SELECT {column} FROM {TABLE} {where} GROUP BY {column} ORDER BY MIN(rowid)"
+        return self._query(sql, params)[column].tolist()
+
+    def filtered(self, start_date=None, end_date=None, categories=None, regions=None):
+        """Analyzer view restricted to the given filters, added to this view's (no data is read)"""
+        new_filters = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'categories': list(categories) if categories else None,
+            'regions': list(regions) if regions else None
+        }
+        view = SQLiteSalesAnalyzer(self.db_path, {**self.filters, **{k: v for k, v in new_filters.items() if v}})
+        # Detector scores the full data; views only select from it
+        view.anomaly_detector = self.anomaly_detector
+        view.affinity_cache = self.affinity_cache
+        return view
+
+    def database_bytes(self):
+        """Size of the database pages (page size x page count), which the OS caches as it reads them"""
+        with closing(self._connect()) as conn:
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        return page_size * page_count
+
+    def memory_report(self):
+        """Footprint summary - rows live in database pages, only results are held as frames"""
+        rows = self.row_count()
+        total = self.database_bytes()
+        return {
+            'schema': 'sqlite',
+            'rows': rows,
+            'total_bytes': total,
+            'bytes_per_row': total / max(rows, 1),
+            'database_bytes': total,
+            'columns': pd.DataFrame(columns=['Column', 'Dtype', 'Bytes', 'Bytes_per_Row'])
+        }
+
+    @timed('sql.get_summary_stats')
+    def get_summary_stats(self, approximate=False):
+        """Get overall summary statistics (distinct counts are always exact here)"""
+        where, params = self._where()
+        row = self._query(f"""
+            SELECT SUM(Total_Amount) AS total_sales,
+                   COUNT(*) AS total_transactions,
+                   AVG(Total_Amount) AS avg_order_value,
+                   SUM(Quantity) AS total_quantity_sold,
+                   COUNT(DISTINCT Customer_ID) AS unique_customers,
+                   AVG(Discount_Percent) AS avg_discount,
+                   MIN(Date) AS first_date,
+                   MAX(Date) AS last_date
+            FROM {TABLE} {where}
+        """, params).iloc[0]
+        return {
+            'total_sales': row['total_sales'],
+            'total_transactions': int(row['total_transactions']),
+            'avg_order_value': row['avg_order_value'],
+            'total_quantity_sold': row['total_quantity_sold'],
+            'unique_customers': int(row['unique_customers']),
+            'total_profit': row['total_sales'] * PROFIT_MARGIN,
+            'avg_discount': row['avg_discount'],
+            'date_range': f"{row['first_date']} to {row['last_date']}"
+        }
+
+    @timed('sql.sales_by_time')
+    def sales_by_time(self, period='month'):
+        """Aggregate sales by time period"""
+        keys = {
+            'month': 'Year, Month, Month_Name',
+            'quarter': 'Year, Quarter',
+            'week': 'Week',
+            'day': 'Date'
+        }.get(period)
+        if keys is None:
+            return None
+        result = self._grouped(keys, 'SUM(Total_Amount) AS Total_Amount', keys)
+        if period == 'day':
+            result['Date'] = pd.to_datetime(result['Date'])
+        return result
+
+    def _breakdown(self, column):
+        return self._grouped(column, f"""
+            SUM(Total_Amount) AS Total_Amount,
+            SUM(Quantity) AS Quantity,
+            COUNT(Transaction_ID) AS Transaction_ID,
+            SUM(Total_Amount) * {PROFIT_MARGIN} AS Profit
+        """, 'Total_Amount DESC')
+
+    @timed('sql.sales_by_category')
+    def sales_by_category(self):
+        """Sales breakdown by product category"""
+        return self._breakdown('Category')
+
+    @timed('sql.sales_by_region')
+    def sales_by_region(self):
+        """Sales breakdown by region"""
+        return self._breakdown('Region')
+
+    @timed('sql.top_products')
+    def top_products(self, n=10):
+        """Get top N products by sales"""
+        where, params = self._where()
+        return self._query(f"""
+            SELECT Product,
+                   SUM(Total_Amount) AS Total_Amount,
+                   SUM(Quantity) AS Quantity,
+                   COUNT(Transaction_ID) AS Transaction_ID
+            FROM {TABLE} {where}
+            GROUP BY Product ORDER BY Total_Amount DESC LIMIT ?
+        """, list(params) + [int(n)])
+
+    @timed('sql.customer_segment_analysis')
+    def customer_segment_analysis(self):
+        """Analyze customer segments"""
+        return self._grouped('Customer_Segment', f"""
+            SUM(Total_Amount) AS Total_Amount,
+            SUM(Total_Amount) * {PROFIT_MARGIN} AS Profit,
+            AVG(Discount_Percent) AS Discount_Percent
+        """, 'Customer_Segment')
+
+    @timed('sql.payment_method_analysis')
+    def payment_method_analysis(self):
+        """Analyze payment methods"""
+        return self._grouped('Payment_Method', """
+            SUM(Total_Amount) AS Total_Amount,
+            COUNT(Transaction_ID) AS Transaction_ID
+        """, 'Total_Amount DESC')
+
+    @timed('sql.build_anomaly_detector')
+    def build_anomaly_detector(self, window=28, threshold=3.5):
+        """Score every Category x Region x Product daily series from grouped daily totals"""
+        daily = self._grouped('Category, Region, Product, Date',
+                              'SUM(Total_Amount) AS Total_Amount', 'Category, Region, Product, Date')
+        daily['Date'] = pd.to_datetime(daily['Date'])
+        self.anomaly_detector = AnomalyDetector(window, threshold).fit(daily)
+        return self.anomaly_detector
+
+    def series_anomalies(self, threshold=None, top=50):
+        """Ranked series anomalies for the active filters (detector is built on first use)"""
+        if self.anomaly_detector is None:
+            self.build_anomaly_detector()
+        return self.anomaly_detector.anomalies(threshold=threshold, top=top, **self.filters)
+
+    @timed('sql.product_affinity')
+    def product_affinity(self):
+        """Co-purchase statistics from the distinct customer/product pairs (deduplicated in SQL)"""
+        def build():
+            where, params = self._where()
+            pairs = self._query(f"SELECT Customer_ID, Product FROM {TABLE} {where} "
+                                f"GROUP BY Customer_ID, Product", params)
+            return ProductAffinity(*customer_product_matrix(pairs['Customer_ID'], pairs['Product']))
+        return self.affinity_cache.get((self.data_version, filters_key(self.filters)), build)
+
+    def daily_stats(self):
+        """Rolling statistics over daily sales of the current filters (queried once per view)"""
+        if self._daily_stats is None:
+            self._daily_stats = RollingStats.from_frame(self.sales_by_time('day'), 'Total_Amount')
+        return self._daily_stats
+
+    @timed('sql.monthly_growth_rate')
+    def monthly_growth_rate(self):
+        """Calculate month-over-month growth rate"""
+        return self.daily_stats().monthly_growth()
+
+    @timed('sql.cohort_analysis')
+    def cohort_analysis(self):
+        """Simple cohort analysis - customer retention"""
+        where, params = self._where()
+        df_cohort = self._query(f"""
+            WITH filtered AS (SELECT rowid AS row_id, * FROM {TABLE} {where}),
+                 first_purchase AS (
+                     SELECT Customer_ID, MIN(Date) AS First_Purchase_Date, MIN(row_id) AS first_row
+                     FROM filtered GROUP BY Customer_ID
+                 )
+            SELECT s.*, f.First_Purchase_Date
+            FROM filtered s JOIN first_purchase f ON s.Customer_ID = f.Customer_ID
+            -- Same row order as DataFrame.merge: customers by first appearance
+            ORDER BY f.first_row, s.row_id
+        """, params).drop(columns='row_id')
+        df_cohort['Date'] = pd.to_datetime(df_cohort['Date'])
+        df_cohort['First_Purchase_Date'] = pd.to_datetime(df_cohort['First_Purchase_Date'])
+        df_cohort['Cohort_Month'] = df_cohort['First_Purchase_Date'].dt.to_period('M')
+        df_cohort['Purchase_Month'] = df_cohort['Date'].dt.to_period('M')
+        df_cohort['Months_Since_First'] = (
+            (df_cohort['Date'].dt.year - df_cohort['First_Purchase_Date'].dt.year) * 12
+            + (df_cohort['Date'].dt.month - df_cohort['First_Purchase_Date'].dt.month)
+        )
+
+        cohort_size = self._query(f"""
+            SELECT substr(First_Purchase_Date, 1, 7) AS Cohort_Month, COUNT(*) AS Cohort_Size
+            FROM (SELECT Customer_ID, MIN(Date) AS First_Purchase_Date FROM {TABLE} {where} GROUP BY Customer_ID)
+            GROUP BY Cohort_Month ORDER BY Cohort_Month
+        """, params)
+        cohort_size['Cohort_Month'] = pd.PeriodIndex(cohort_size['Cohort_Month'], freq='M')
+        return df_cohort, cohort_size
+
+    @timed('sql.customer_rfm')
+    def customer_rfm(self, reference_date=None):
+        """Recency, frequency, monetary value and RFM segment per customer"""
+        aggregates = self._grouped('Customer_ID', """
+            MAX(Date) AS Last_Purchase,
+            COUNT(*) AS Frequency,
+            SUM(Total_Amount) AS Monetary
+        """, 'Customer_ID')
+        aggregates['Last_Purchase'] = pd.to_datetime(aggregates['Last_Purchase'])
+        if aggregates.empty and reference_date is None:
+            reference_date = pd.Timestamp.today().normalize()
+        return score_rfm(aggregates, reference_date)
+
+    @timed('sql.seasonal_analysis')
+    def seasonal_analysis(self):
+        """Analyze seasonal patterns"""
+        seasonal = self._grouped('Month_Name', """
+            SUM(Total_Amount) AS Total_Amount,
+            COUNT(Transaction_ID) AS Transaction_ID
+        """, 'Month_Name')
+        seasonal['Month_Name'] = pd.Categorical(seasonal['Month_Name'], categories=MONTH_NAMES, ordered=True)
+        return seasonal.sort_values('Month_Name')
+
+    @timed('sql.discount_impact_analysis')
+    def discount_impact_analysis(self):
+        """Analyze impact of discounts on sales"""
+        where, params = self._where()
+        # Same bins as pd.cut(bins=[-1, 0, 10, 20, 100]) - right-closed, out of range dropped
+        result = self._query(f"""
+            SELECT CASE
+                       WHEN Discount_Percent > -1 AND Discount_Percent <= 0 THEN 'No Discount'
+                       WHEN Discount_Percent > 0 AND Discount_Percent <= 10 THEN '1-10%'
+                       WHEN Discount_Percent > 10 AND Discount_Percent <= 20 THEN '11-20%'
+                       WHEN Discount_Percent > 20 AND Discount_Percent <= 100 THEN '20%+'
+                   END AS Discount_Category,
+                   SUM(Total_Amount) AS Total_Amount,
+                   SUM(Quantity) AS Quantity,
+                   COUNT(Transaction_ID) AS Transaction_ID
+            FROM {TABLE} {where}
+            GROUP BY Discount_Category
+            HAVING Discount_Category IS NOT NULL
+        """, params)
+        result = result.set_index('Discount_Category').reindex(DISCOUNT_LABELS)
+        result = result.fillna({'Total_Amount': 0.0, 'Quantity': 0, 'Transaction_ID': 0})
+        result[['Quantity', 'Transaction_ID']] = result[['Quantity', 'Transaction_ID']].astype(np.int64)
+        result = result.reset_index()
+        result['Discount_Category'] = pd.Categorical(
+            result['Discount_Category'], categories=DISCOUNT_LABELS, ordered=True
+        )
+        return result
+
+    @timed('sql.value_distribution')
+    def value_distribution(self, column='Total_Amount', by=None, quantiles=(0.5, 0.9, 0.99),
+                           approximate=True):
+        """Transaction count and quantiles of a value column (always exact, only the needed columns are read)"""
+        where, params = self._where()
+        selected = f"{by}, {column}" if by else column
+        rows = self._query(f"SELECT {selected} FROM {TABLE} {where}", params)
+        return value_quantiles(rows[column], quantiles, rows[by] if by else None)
+
+    @timed('sql.get_filtered_data')
+    def get_filtered_data(self, start_date=None, end_date=None,
+                          categories=None, regions=None):
+        """Filter data based on parameters"""
+        view = self
+        if any(v for v in (start_date, end_date, categories, regions)):
+            view = self.filtered(
+                start_date or self.filters.get('start_date'),
+                end_date or self.filters.get('end_date'),
+                categories or self.filters.get('categories'),
+                regions or self.filters.get('regions')
+            )
+        where, params = view._where()
+        df = self._query(f"SELECT * FROM {TABLE} {where} ORDER BY rowid", params)
+        df['Date'] = pd.to_datetime(df['Date'])
+        df['Profit'] = df['Total_Amount'] * PROFIT_MARGIN
+        return df
+
+    def export_analysis_report(self, output_path):
+        """Export comprehensive analysis report"""
+        SalesAnalyzer.export_analysis_report(self, output_path)
+
+
+def verify_parity(data_path, db_path, filters=None, rtol=1e-9):
+    """Compare every SQLite aggregate with the pandas path; returns mismatching method names"""
+    pandas_analyzer = SalesAnalyzer(data_path, compact=True, schema=schema_for(data_path))
+    sql_analyzer = SQLiteSalesAnalyzer.from_csv(data_path, db_path)
+    if filters:
+        pandas_analyzer = pandas_analyzer.filtered(**filters)
+        sql_analyzer = sql_analyzer.filtered(**filters)
+
+    def same(expected, actual):
+        if isinstance(expected, dict):
+            return all(
+                np.isclose(expected[k], actual[k], rtol=rtol) if isinstance(expected[k], (int, float, np.number))
+                else expected[k] == actual[k]
+                for k in expected
+            )
+        expected = expected.reset_index(drop=True)
+        actual = actual.reset_index(drop=True)[expected.columns]
+        try:
+            pd.testing.assert_frame_equal(expected, actual, check_dtype=False,
+                                          check_categorical=False, rtol=rtol)
+            return True
+        except AssertionError:
+            return False
+
+    checks = {
+        'get_summary_stats': lambda a: a.get_summary_stats(),
+        'sales_by_category': lambda a: a.sales_by_category(),
+        'sales_by_region': lambda a: a.sales_by_region(),
+        'top_products': lambda a: a.top_products(10),
+        'customer_segment_analysis': lambda a: a.customer_segment_analysis(),
+        'payment_method_analysis': lambda a: a.payment_method_analysis(),
+        'monthly_growth_rate': lambda a: a.monthly_growth_rate(),
+        'seasonal_analysis': lambda a: a.seasonal_analysis(),
+        'discount_impact_analysis': lambda a: a.discount_impact_analysis(),
+        'cohort_size': lambda a: a.cohort_analysis()[1],
+        'cohort_months': lambda a: a.cohort_analysis()[0][['Customer_ID', 'Date', 'Months_Since_First']]
+                                    .astype({'Customer_ID': str}),
+        'customer_rfm': lambda a: a.customer_rfm().astype({'Customer_ID': str, 'Segment': str})
+                                  .sort_values('Customer_ID'),
+        'value_distribution': lambda a: a.value_distribution('Total_Amount', 'Category', approximate=False),
+        'filtered_data': lambda a: a.get_filtered_data()[['Transaction_ID', 'Date', 'Total_Amount']],
+    }
+    for period in ('month', 'quarter', 'week', 'day'):
+        checks[f'sales_by_time_{period}'] = lambda a, p=period: a.sales_by_time(p)
+
+    failures = [name for name, check in checks.items()
+                if not same(check(pandas_analyzer), check(sql_analyzer))]
+    return failures
+
+
+if __name__ == "__main__":
+    import sys
+    data_path = sys.argv[1] if len(sys.argv) > 1 else 'data/sales_data.csv'
+    db_path = sys.argv[2] if len(sys.argv) > 2 else 'data/sales_data.db'
+    scenarios = {
+        'unfiltered': None,
+        'date range': {'start_date': '2023-03-01', 'end_date': '2023-09-30'},
+        'category + region': {'categories': ['Books', 'Electronics'], 'regions': ['Asia']},
+    }
+    failed = False
+    for label, filters in scenarios.items():
+        failures = verify_parity(data_path, db_path, filters)
+        status = "✅ parity" if not failures else f"❌ mismatches: {', '.join(failures)}"
+        print(f"{label}: {status}")
+        failed = failed or bool(failures)
+    sys.exit(1 if failed else 0)
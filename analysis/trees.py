@@ -0,0 +1,170 @@
+import hashlib
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.dummy import DummyRegressor
+
+from analysis.profiling import timed
+
+# scikit-learn compares features as float32 against float64 thresholds
+FEATURE_DTYPE = np.float32
+
+
+def trees_path(model_path):
+    """Path of the flat tree arrays saved next to a model file"""
+    stem = model_path[:-len('.joblib')] if model_path.endswith('.joblib') else model_path
+    return stem + '.trees.npz'
+
+
+def _estimator_trees(model):
+    """Fitted ``tree_`` objects of a random forest or gradient boosting regressor"""
+    if isinstance(model, RandomForestRegressor):
+        return [est.tree_ for est in model.estimators_]
+    if isinstance(model, GradientBoostingRegressor):
+        return [est.tree_ for est in model.estimators_[:, 0]]
+    raise ValueError(f"Cannot flatten {type(model).__name__}; expected a random forest or gradient boosting regressor")
+
+
+def model_fingerprint(model):
+    """Hash of a fitted ensemble's type, features and tree splits and leaves
+
+    Saved with the flat arrays, so arrays left over from another model are
+    recognized instead of silently used.
+    """
+    digest = hashlib.sha1(f"{type(model).__name__}:{model.n_features_in_}".encode('utf-8'))
+    for tree in _estimator_trees(model):
+        for array in (tree.feature, tree.threshold, tree.value, getattr(tree, 'missing_go_to_left', None)):
+            if array is not None:
+                digest.update(np.ascontiguousarray(array).tobytes())
+    if isinstance(model, GradientBoostingRegressor):
+        init = model.init_.constant_ if isinstance(model.init_, DummyRegressor) else 0.0
+        digest.update(np.asarray([model.learning_rate, *np.ravel(init)], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class FlatForest:
+    """Tree ensemble flattened into one set of node arrays for batched inference
+
+    The nodes of every tree are concatenated: ``children[i]`` holds the
+    global indices of node i's left and right child (a leaf points to itself
+    on both sides), ``feature``/``threshold`` its split and ``value`` its
+    leaf output. predict() walks all rows through all trees at once, one
+    tree level per step, and combines the leaves in the same order as
+    scikit-learn so the predictions are identical. ``fingerprint`` is the
+    source model's model_fingerprint (None if built from loose trees).
+    """
+
+    def __init__(self, children, feature, threshold, missing_left, value, roots, max_depth,
+                 kind='mean', scale=1.0, init=0.0, n_features=None, fingerprint=None):
+        self.children = np.asarray(children, dtype=np.int32)
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.kind = str(kind)
+        self.scale = float(scale)
+        self.init = float(init)
+        self.n_features = n_features
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_trees(cls, trees, **params):
+        """Concatenate fitted single-output regression trees (``tree_`` objects)"""
+        children, feature, threshold, missing_left, value, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            left = np.where(leaf, nodes, tree.children_left) + offset
+            right = np.where(leaf, nodes, tree.children_right) + offset
+            children.append(np.column_stack([left, right]))
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, 0.0, tree.threshold))
+            missing_left.append(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count)).astype(bool))
+            value.append(tree.value[:, 0, 0])
+            roots.append(offset)
+            offset += tree.node_count
+        return cls(
+            np.concatenate(children), np.concatenate(feature), np.concatenate(threshold),
+            np.concatenate(missing_left), np.concatenate(value), roots,
+            max(tree.max_depth for tree in trees), **params
+        )
+
+    @classmethod
+    def from_model(cls, model):
+        """Export a fitted RandomForestRegressor or GradientBoostingRegressor"""
+        trees = _estimator_trees(model)
+        fingerprint = model_fingerprint(model)
+        if isinstance(model, RandomForestRegressor):
+            return cls.from_trees(trees, kind='mean', n_features=model.n_features_in_, fingerprint=fingerprint)
+        if model.init_ == 'zero':
+            init = 0.0
+        elif isinstance(model.init_, DummyRegressor):
+            init = model.init_.constant_.ravel()[0]
+        else:
+            raise ValueError("Only constant (default or 'zero') init estimators can be flattened")
+        return cls.from_trees(trees, kind='sum', scale=model.learning_rate, init=init,
+                              n_features=model.n_features_in_, fingerprint=fingerprint)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.value)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.children, self.feature, self.threshold,
+                                      self.missing_left, self.value, self.roots))
+
+    def apply(self, X):
+        """Global leaf index reached by every row in every tree, shape (rows, trees)"""
+        X = np.asarray(X, dtype=FEATURE_DTYPE)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_right = ~((x <= self.threshold[nodes]) | (np.isnan(x) & self.missing_left[nodes]))
+            nodes = self.children[nodes, go_right.view(np.int8)]
+        return nodes
+
+    @timed('trees.predict')
+    def predict(self, X):
+        """Predictions for a 2-D feature array (or one row), identical to the source model"""
+        leaves = self.value[self.apply(X)]
+        # Accumulate tree by tree, like scikit-learn, so rounding matches exactly
+        if self.kind == 'mean':
+            out = np.zeros(len(leaves))
+            for t in range(self.n_trees):
+                out += leaves[:, t]
+            return out / self.n_trees
+        out = np.full(len(leaves), self.init)
+        for t in range(self.n_trees):
+            out += self.scale * leaves[:, t]
+        return out
+
+    def save(self, path):
+        """Write the node arrays to an .npz file"""
+        np.savez(path, children=self.children, feature=self.feature, threshold=self.threshold,
+                 missing_left=self.missing_left, value=self.value, roots=self.roots,
+                 meta=np.array([self.max_depth, self.scale, self.init,
+                                -1 if self.n_features is None else self.n_features]),
+                 kind=np.array(self.kind), fingerprint=np.array(self.fingerprint or ''))
+
+    @classmethod
+    def load(cls, path):
+        """Read node arrays written by save()"""
+        with np.load(path) as data:
+            max_depth, scale, init, n_features = data['meta']
+            # Files saved before fingerprints were stored have none
+            fingerprint = str(data['fingerprint']) if 'fingerprint' in data.files else ''
+            return cls(data['children'], data['feature'], data['threshold'], data['missing_left'],
+                       data['value'], data['roots'], max_depth, kind=str(data['kind']),
+                       scale=scale, init=init, n_features=None if n_features < 0 else int(n_features),
+                       fingerprint=fingerprint or None)
@@ -0,0 +1,262 @@
+import os
+import json
+import random
+import hashlib
+import argparse
+import tempfile
+import itertools
+
+import numpy as np
+
+from analysis.profiling import timed
+
+# scikit-learn and joblib are imported by the search itself, so the dashboard
+# can read a saved configuration without loading them
+
+# Bump when the saved configuration layout changes; older files are ignored
+CONFIG_FORMAT = 1
+
+DEFAULT_CONFIG_PATH = os.path.join('models', 'forecast_config.json')
+DEFAULT_TRIALS_PATH = os.path.join('models', 'tuning_trials.jsonl')
+
+MODEL_TYPES = ['random_forest', 'gradient_boosting', 'linear_regression']
+
+# Candidate values per hyperparameter; n_estimators is the budget that successive halving grows
+SEARCH_SPACES = {
+    'random_forest': {
+        'max_depth': [5, 8, 12, 15, 20, None],
+        'min_samples_split': [2, 5, 10, 20],
+        'min_samples_leaf': [1, 2, 4, 8],
+        'max_features': [1.0, 0.7, 0.5, 'sqrt']
+    },
+    'gradient_boosting': {
+        'max_depth': [2, 3, 4, 5, 6],
+        'learning_rate': [0.02, 0.05, 0.1, 0.2],
+        'subsample': [0.6, 0.8, 1.0],
+        'min_samples_leaf': [1, 5, 10, 20]
+    },
+    # No hyperparameters; scored once as a baseline
+    'linear_regression': {}
+}
+
+
+def sample_candidates(space, n, seed=42):
+    """n distinct configurations drawn from the grid (the whole grid if it is smaller)"""
+    grid = list(itertools.product(*space.values()))
+    picks = random.Random(seed).sample(grid, min(n, len(grid)))
+    return [dict(zip(space, values)) for values in picks]
+
+
+def data_fingerprint(X, y):
+    """Short id of a feature matrix and target, so cached trials only match the same data"""
+    digest = hashlib.sha1(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def trial_key(data_id, model_type, params, n_splits, fold):
+    """Cache key of one trial: a configuration (with its budget) scored on one validation fold"""
+    spec = json.dumps([data_id, model_type, params, n_splits, fold], sort_keys=True)
+    return hashlib.sha1(spec.encode('utf-8')).hexdigest()
+
+
+class TrialCache:
+    """Validation error per trial, appended to a JSON-lines file as each trial finishes
+
+    A search that is repeated, extended or interrupted reuses every trial
+    already scored on the same data instead of fitting it again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.reused = 0
+        self._scores = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partial last line of an interrupted run
+                        continue
+                    self._scores[record['key']] = record['mae']
+
+    def __len__(self):
+        return len(self._scores)
+
+    def get(self, key):
+        score = self._scores.get(key)
+        if score is not None:
+            self.reused += 1
+        return score
+
+    def add(self, key, mae, **info):
+        self._scores[key] = mae
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps({'key': key, 'mae': mae, **info}) + '\n')
+
+
+def _fit_score(model_type, params, X, y, train, test):
+    """Mean absolute error of one configuration trained on train rows and scored on test rows"""
+    from sklearn.metrics import mean_absolute_error
+    from analysis.model import build_model
+
+    # One core per trial; the trials themselves run in parallel
+    model = build_model(model_type, params, n_jobs=1)
+    model.fit(X[train], y[train])
+    return float(mean_absolute_error(y[test], model.predict(X[test])))
+
+
+def _evaluate(model_type, configs, X, y, folds, data_id, cache, n_jobs):
+    """Mean validation error of each configuration over the folds, fitting only uncached trials"""
+    from joblib import Parallel, delayed
+
+    scores = np.full((len(configs), len(folds)), np.nan)
+    jobs = []
+    for i, params in enumerate(configs):
+        for fold in range(len(folds)):
+            key = trial_key(data_id, model_type, params, len(folds), fold)
+            cached = cache.get(key)
+            if cached is None:
+                jobs.append((i, fold, key))
+            else:
+                scores[i, fold] = cached
+
+    results = Parallel(n_jobs=n_jobs, return_as='generator')(
+        delayed(_fit_score)(model_type, configs[i], X, y, *folds[fold]) for i, fold, _ in jobs
+    )
+    # Recorded as each trial finishes, so an interrupted search keeps its progress
+    for (i, fold, key), mae in zip(jobs, results):
+        scores[i, fold] = mae
+        cache.add(key, mae, model_type=model_type, params=configs[i], fold=fold)
+    return scores.mean(axis=1)
+
+
+@timed('tuning.successive_halving')
+def successive_halving(X, y, model_type, n_candidates=27, eta=3, min_estimators=25, max_estimators=400,
+                       n_splits=4, cache=None, n_jobs=-1, seed=42):
+    """Best configuration of a model family by successive halving with time-ordered validation
+
+    Every candidate is first scored with ``min_estimators`` trees; the best
+    1/eta advance and are scored again with eta times as many trees, until
+    one remains or the budget reaches ``max_estimators``. Each score is the
+    mean absolute error over expanding-window folds (train on the past,
+    validate on the following block of days). Returns the winning
+    parameters (including n_estimators), its error and the rungs run.
+    """
+    from sklearn.model_selection import TimeSeriesSplit
+
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    folds = list(TimeSeriesSplit(n_splits=n_splits).split(X))
+    data_id = data_fingerprint(X, y)
+    cache = cache if cache is not None else TrialCache()
+
+    space = SEARCH_SPACES[model_type]
+    if not space:
+        score = _evaluate(model_type, [{}], X, y, folds, data_id, cache, n_jobs)[0]
+        return {'params': {}, 'cv_mae': float(score), 'rungs': []}
+
+    candidates = sample_candidates(space, n_candidates, seed)
+    n_estimators = min_estimators
+    rungs = []
+    while True:
+        configs = [{**params, 'n_estimators': n_estimators} for params in candidates]
+        scores = _evaluate(model_type, configs, X, y, folds, data_id, cache, n_jobs)
+        order = np.argsort(scores, kind='stable')
+        rungs.append({'n_estimators': n_estimators, 'candidates': len(candidates),
+                      'best_mae': float(scores[order[0]])})
+        if len(candidates) == 1 or n_estimators >= max_estimators:
+            break
+        candidates = [candidates[i] for i in order[:max(1, len(candidates) // eta)]]
+        n_estimators = min(n_estimators * eta, max_estimators)
+    return {'params': configs[order[0]], 'cv_mae': float(scores[order[0]]), 'rungs': rungs}
+
+
+@timed('tuning.tune')
+def tune(df, model_types=MODEL_TYPES, test_size=0.2, trials_path=DEFAULT_TRIALS_PATH, **search):
+    """Search every model family on the daily features of df; returns the configuration to save
+
+    The most recent ``test_size`` of days is left out of the search, so
+    the test metrics train_model reports stay out of sample.
+    """
+    from analysis.model import SalesForecastModel
+
+    X_train, _, y_train, _ = SalesForecastModel(df).training_data(test_size)
+    cache = TrialCache(trials_path)
+    models = {}
+    for model_type in model_types:
+        models[model_type] = successive_halving(X_train, y_train, model_type, cache=cache, **search)
+        print(f"{model_type}: CV MAE {models[model_type]['cv_mae']:,.2f} with {models[model_type]['params']}")
+    if trials_path:
+        print(f"{cache.reused} trial(s) reused from {trials_path}")
+    return {
+        'format': CONFIG_FORMAT,
+        'best': min(models, key=lambda m: models[m]['cv_mae']),
+        'rows': len(X_train),
+        'n_splits': search.get('n_splits', 4),
+        'models': models
+    }
+
+
+def save_config(config, path=DEFAULT_CONFIG_PATH):
+    """Write a tuning result for train_model/the dashboard to pick up"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # A unique file per write, so two tuning runs saving at once never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                    prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        # mkstemp creates the file owner-only; keep it readable by the dashboard's user
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(config, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    print(f"Tuned configuration saved to {path}")
+    return path
+
+
+def load_config(path=DEFAULT_CONFIG_PATH):
+    """Saved tuning result, or None if there is none (or it is unreadable or outdated)"""
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return config if config.get('format') == CONFIG_FORMAT else None
+
+
+def tuned_params(config, model_type):
+    """Tuned hyperparameters of a model family, or None to use its defaults"""
+    if not config or model_type not in config.get('models', {}):
+        return None
+    return config['models'][model_type]['params']
+
+
+if __name__ == "__main__":
+    from analysis.eda import load_transactions
+
+    parser = argparse.ArgumentParser(description="Tune forecast hyperparameters by successive halving")
+    parser.add_argument('data', nargs='?', default='data/sales_data.csv', help="Sales CSV")
+    parser.add_argument('--models', nargs='+', choices=MODEL_TYPES, default=MODEL_TYPES)
+    parser.add_argument('--candidates', type=int, default=27, help="Configurations per family in the first rung")
+    parser.add_argument('--eta', type=int, default=3, help="Keep 1/eta of the candidates per rung")
+    parser.add_argument('--min-estimators', type=int, default=25)
+    parser.add_argument('--max-estimators', type=int, default=400)
+    parser.add_argument('--splits', type=int, default=4, help="Time-ordered validation folds")
+    parser.add_argument('--jobs', type=int, default=-1, help="Parallel trials (-1: all cores)")
+    parser.add_argument('--trials', default=DEFAULT_TRIALS_PATH, help="Per-trial cache (JSON lines)")
+    parser.add_argument('--output', default=DEFAULT_CONFIG_PATH, help="Where to save the winning configuration")
+    args = parser.parse_args()
+
+    config = tune(
+        load_transactions(args.data), args.models, trials_path=args.trials,
+        n_candidates=args.candidates, eta=args.eta, min_estimators=args.min_estimators,
+        max_estimators=args.max_estimators, n_splits=args.splits, n_jobs=args.jobs
+    )
+    print(f"Best: {config['best']}")
+    save_config(config, args.output)
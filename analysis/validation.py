@@ -0,0 +1,246 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+from analysis.profiling import timed
+
+# Column added to quarantined rows
+REASONS_COLUMN = 'Reasons'
+SOURCE_ROW_COLUMN = 'Source_Row'
+
+
+class Column:
+    """Declared type and constraints of one column
+
+    ``kind`` is 'text', 'number' or 'date'. Values that do not parse as
+    the kind, nulls (unless ``nullable``), values outside ``min``/``max``,
+    non-whole numbers when ``integer`` and values outside ``allowed``
+    fail. A ``required`` column must be present in the data; optional
+    columns are only checked when present.
+    """
+
+    def __init__(self, name, kind='text', required=False, nullable=False,
+                 min=None, max=None, integer=False, allowed=None):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.nullable = nullable
+        self.min = min
+        self.max = max
+        self.integer = integer
+        self.allowed = None if allowed is None else list(allowed)
+
+    def parse(self, values):
+        """Values converted to the column's kind; unparseable entries become null"""
+        if self.kind == 'date' and not pd.api.types.is_datetime64_any_dtype(values):
+            return pd.to_datetime(values, errors='coerce')
+        if self.kind == 'number' and not pd.api.types.is_numeric_dtype(values):
+            return pd.to_numeric(values, errors='coerce')
+        return values
+
+    def _missing_and_unknown(self, raw, parsed):
+        """Null mask and (with ``allowed``) mask of values outside the allowed set
+
+        One hash lookup per row finds both; nulls are only looked for among
+        the rows that were not found. Categorical columns need no per-row
+        lookups at all.
+        """
+        if isinstance(parsed.dtype, pd.CategoricalDtype):
+            # Decided per category, then gathered by code
+            codes = parsed.cat.codes.to_numpy()
+            missing = codes < 0
+            if self.allowed is None:
+                return missing, None
+            known = parsed.cat.categories.isin(self.allowed)
+            return missing, ~known[codes] & ~missing
+        if self.allowed is None:
+            return raw.isna().to_numpy(), None
+        outside = pd.Index(self.allowed).get_indexer(parsed) < 0
+        missing = np.zeros(len(raw), dtype=bool)
+        rows = np.flatnonzero(outside)
+        missing[rows] = pd.isna(raw.to_numpy()[rows])
+        return missing, outside & ~missing
+
+    def failures(self, raw, parsed):
+        """(reason, mask) pairs for the rows breaking each constraint"""
+        missing, unknown = self._missing_and_unknown(raw, parsed)
+        checks = []
+        if not self.nullable:
+            checks.append((f"{self.name} is missing", missing))
+        if parsed is not raw:
+            checks.append((f"{self.name} is not a valid {self.kind}", parsed.isna().to_numpy() & ~missing))
+        if self.kind == 'number':
+            values = parsed.to_numpy(np.float64)
+            with np.errstate(invalid='ignore'):
+                if self.min is not None:
+                    checks.append((f"{self.name} is below {self.min}", values < self.min))
+                if self.max is not None:
+                    checks.append((f"{self.name} is above {self.max}", values > self.max))
+                if self.integer:
+                    checks.append((f"{self.name} is not a whole number", np.isfinite(values) & (values % 1 != 0)))
+        if unknown is not None:
+            checks.append((f"{self.name} is not a known value", unknown))
+        return checks
+
+
+class RatioCheck:
+    """Row check that ``numerator / product(factors)`` lies within bounds"""
+
+    def __init__(self, numerator, factors, bounds, reason):
+        self.numerator = numerator
+        self.factors = list(factors)
+        self.bounds = bounds
+        self.reason = reason
+
+    @property
+    def columns(self):
+        return [self.numerator] + self.factors
+
+    def failures(self, parsed):
+        denominator = np.ones(len(parsed[self.numerator]))
+        for factor in self.factors:
+            denominator = denominator * parsed[factor].to_numpy(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = parsed[self.numerator].to_numpy(np.float64) / denominator
+        low, high = self.bounds
+        # Rows with unparseable inputs already fail their column checks
+        return [(self.reason, ~np.isnan(ratio) & ((ratio < low) | (ratio > high)))]
+
+
+class ValidationResult:
+    """Rows that passed (parsed to their declared kinds) and quarantined rows with reasons"""
+
+    def __init__(self, valid, quarantined, counts):
+        self.valid = valid
+        self.quarantined = quarantined
+        self.counts = counts
+
+    @property
+    def n_quarantined(self):
+        return len(self.quarantined)
+
+    def summary(self):
+        """Failing rows per reason, most frequent first"""
+        return self.counts.sort_values(ascending=False)
+
+
+class Schema:
+    """Declarative column constraints and row checks, evaluated column-wise with array masks"""
+
+    def __init__(self, columns, checks=()):
+        self.columns = {column.name: column for column in columns}
+        self.checks = list(checks)
+
+    @timed('validation.validate')
+    def validate(self, df, first_row=0):
+        """Split df into valid rows and quarantined rows
+
+        Every constraint yields one boolean mask over all rows; reason text
+        is only assembled for the failing rows. ``first_row`` numbers the
+        quarantined rows by their position in the source (e.g. a file line).
+        """
+        absent = [name for name, column in self.columns.items() if column.required and name not in df.columns]
+        if absent:
+            raise ValueError(f"Missing required column(s): {', '.join(absent)}")
+
+        parsed, converted = {}, {}
+        checks = []
+        for name, column in self.columns.items():
+            if name in df.columns:
+                raw = df[name]
+                parsed[name] = column.parse(raw)
+                if parsed[name] is not raw:
+                    converted[name] = parsed[name]
+                checks.extend(column.failures(raw, parsed[name]))
+        for check in self.checks:
+            if all(col in parsed for col in check.columns):
+                checks.extend(check.failures(parsed))
+
+        failed = np.zeros(len(df), dtype=bool)
+        for _, mask in checks:
+            failed |= mask
+        rows = np.flatnonzero(failed)
+
+        # Reasons only for the failing rows
+        reasons = np.full(len(rows), '', dtype=object)
+        counts = {}
+        for reason, mask in checks:
+            hits = np.flatnonzero(mask[rows])
+            if len(hits):
+                counts[reason] = len(hits)
+                reasons[hits] = np.where(reasons[hits] == '', reason, reasons[hits] + '; ' + reason)
+        quarantined = df.iloc[rows].copy()
+        quarantined.insert(0, SOURCE_ROW_COLUMN, rows + first_row)
+        quarantined[REASONS_COLUMN] = reasons
+
+        valid = df.assign(**converted) if converted else df
+        if len(rows):
+            valid = valid[~failed]
+        return ValidationResult(valid, quarantined, pd.Series(counts, dtype='int64'))
+
+
+def write_quarantine(quarantined, path, append=False):
+    """Write quarantined rows (with reasons) to a CSV file
+
+    When loading (``append=False``) an earlier file is replaced, or removed
+    if nothing failed, so it always reflects the latest load.
+    """
+    if not append and os.path.exists(path):
+        os.remove(path)
+    if len(quarantined) == 0:
+        return None
+    header = not (append and os.path.exists(path))
+    quarantined.to_csv(path, mode='a' if append else 'w', header=header, index=False)
+    print(f"Quarantined {len(quarantined)} invalid rows to {path}")
+    return path
+
+
+def sales_schema(allowed=None, amount_ratio_bounds=None):
+    """Schema of the sales columns: kinds, nullability and bounds that hold for any dataset
+
+    ``allowed`` maps text columns to their known values and
+    ``amount_ratio_bounds`` adds the Total_Amount / (Unit_Price x Quantity)
+    check; both describe a particular dataset and are off by default.
+    """
+    allowed = allowed or {}
+    checks = []
+    if amount_ratio_bounds is not None:
+        checks.append(RatioCheck('Total_Amount', ['Unit_Price', 'Quantity'], tuple(amount_ratio_bounds),
+                                 "Total_Amount is inconsistent with Unit_Price x Quantity"))
+    return Schema(
+        [
+            Column('Transaction_ID'),
+            Column('Date', 'date', required=True),
+            Column('Customer_ID'),
+            Column('Customer_Segment', nullable=True, allowed=allowed.get('Customer_Segment')),
+            Column('Product', allowed=allowed.get('Product')),
+            Column('Category', required=True, allowed=allowed.get('Category')),
+            Column('Quantity', 'number', required=True, min=1, integer=True),
+            Column('Unit_Price', 'number', min=0),
+            Column('Discount_Percent', 'number', min=0, max=100),
+            Column('Total_Amount', 'number', required=True, min=0),
+            Column('Region', required=True, allowed=allowed.get('Region')),
+            Column('Payment_Method', allowed=allowed.get('Payment_Method')),
+            Column('Shipping_Method', allowed=allowed.get('Shipping_Method')),
+        ],
+        checks=checks
+    )
+
+
+def load_schema(path):
+    """Sales schema from a JSON file with optional "allowed" and "amount_ratio_bounds" entries"""
+    with open(path) as f:
+        spec = json.load(f)
+    return sales_schema(spec.get('allowed'), spec.get('amount_ratio_bounds'))
+
+
+def schema_for(data_path):
+    """Schema of a dataset: its ``<name>.schema.json`` next to the CSV if present, else SALES_SCHEMA"""
+    path = os.path.splitext(data_path)[0] + '.schema.json'
+    return load_schema(path) if os.path.exists(path) else SALES_SCHEMA
+
+
+# Constraints every dataset is held to; value lists and consistency bands are per dataset
+SALES_SCHEMA = sales_schema()
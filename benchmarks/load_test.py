@@ -0,0 +1,316 @@
+"""
+Sales Dashboard Concurrent-User Load Test
+Run from the project root:  python benchmarks/load_test.py --sessions 1 2 4 8
+
+Drives dashboard/app.py headlessly with N simulated sessions in one
+process (like one Streamlit server) and reports rerun latency
+percentiles and process memory per concurrency level. Works offline: the
+sample data is generated into a temporary directory unless --data is given.
+
+Tab switches happen in the browser and do not rerun the script (every
+tab is rendered on each rerun), so sessions exercise the widgets inside
+each tab instead.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+
+# Add parent directory to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from analysis.profiling import current_rss
+
+APP_PATH = os.path.join(ROOT, 'dashboard', 'app.py')
+
+# Relative frequency of each user action in a simulated session
+ACTION_WEIGHTS = {
+    'date_range': 0.20,
+    'categories': 0.15,
+    'regions': 0.10,
+    'reset_filters': 0.05,
+    'top_products': 0.15,
+    'top_customers': 0.10,
+    'rank_customers': 0.05,
+    'distribution': 0.10,
+    'approximate': 0.05,
+    'forecast': 0.05,
+}
+
+
+class SessionApp(AppTest):
+    """AppTest session that reruns against the shared process runtime
+
+    AppTest installs and clears a process-global mock runtime around every
+    run, which races when sessions run on several threads; here the
+    runtime is installed once by install_runtime(), as in a real server.
+    """
+
+    def _run(self, widget_state=None, timeout=None):
+        runner = LocalScriptRunner(self._script_path, self.session_state)
+        self._tree = runner.run(widget_state, self.query_params,
+                                self.default_timeout if timeout is None else timeout)
+        self._tree._runner = self
+        return self
+
+
+def install_runtime():
+    """Process-wide mock runtime with in-memory caches shared by all sessions"""
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    return runtime
+
+
+def generate_dataset(directory):
+    """Generate the sample sales CSV into directory with data/generate_data.py"""
+    path = os.path.join(directory, 'sales_data.csv')
+    subprocess.run([sys.executable, os.path.join(ROOT, 'data', 'generate_data.py'), path],
+                   check=True, capture_output=True)
+    return path
+
+
+def _by_label(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise LookupError(f"No widget labelled {label!r}")
+
+
+def _subset(rng, options):
+    return rng.sample(list(options), rng.randint(1, len(options)))
+
+
+def _date_range(app, rng, bounds):
+    first, last = bounds
+    # At least a month of data so every panel has something to show
+    span = max((last - first).days - 30, 0)
+    start = first + timedelta(days=rng.randint(0, span))
+    end = min(start + timedelta(days=rng.randint(30, 365)), last)
+    app.date_input[0].set_value((start, end))
+
+
+def _reset_filters(app, rng, bounds):
+    app.date_input[0].set_value(bounds)
+    for label in ("Select Categories", "Select Regions"):
+        widget = _by_label(app.multiselect, label)
+        widget.set_value(widget.options)
+
+
+def _forecast(app, rng, bounds):
+    _by_label(app.slider, "Forecast Period (days)").set_value(rng.choice([7, 14, 30, 60, 90]))
+    _by_label(app.selectbox, "Select Model").set_value(
+        rng.choice(["Random Forest", "Gradient Boosting", "Linear Regression"]))
+    _by_label(app.button, "🚀 Generate Forecast").click()
+
+
+ACTIONS = {
+    'date_range': _date_range,
+    'categories': lambda app, rng, bounds: _by_label(app.multiselect, "Select Categories").set_value(
+        _subset(rng, _by_label(app.multiselect, "Select Categories").options)),
+    'regions': lambda app, rng, bounds: _by_label(app.multiselect, "Select Regions").set_value(
+        _subset(rng, _by_label(app.multiselect, "Select Regions").options)),
+    'reset_filters': _reset_filters,
+    'top_products': lambda app, rng, bounds: _by_label(
+        app.slider, "Number of top products to display").set_value(rng.randint(5, 20)),
+    'top_customers': lambda app, rng, bounds: app.slider(key='top_customers').set_value(rng.randint(5, 50)),
+    'rank_customers': lambda app, rng, bounds: _by_label(app.selectbox, "Rank by").set_value(
+        rng.choice(['Monetary', 'Frequency', 'RFM_Score'])),
+    'distribution': lambda app, rng, bounds: _by_label(app.selectbox, "Break down by").set_value(
+        rng.choice(['Category', 'Region', 'Customer Segment'])),
+    'approximate': lambda app, rng, bounds: app.sidebar.toggle[0].set_value(not app.sidebar.toggle[0].value),
+    'forecast': _forecast,
+}
+
+
+def session_script(rng, n_actions, weights=ACTION_WEIGHTS):
+    """Random sequence of user actions drawn by weight"""
+    return rng.choices(list(weights), weights=list(weights.values()), k=n_actions)
+
+
+def _timed_run(app, session, action, records, timeout):
+    start = time.perf_counter()
+    try:
+        app.run(timeout=timeout)
+        error = str(app.exception[0].message) if app.exception else None
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+    records.append({
+        'session': session,
+        'action': action,
+        'latency_ms': (time.perf_counter() - start) * 1000.0,
+        'error': error,
+    })
+
+
+def run_session(session, n_actions, seed, records, barrier, timeout):
+    """One simulated user: open the dashboard, then replay random actions"""
+    rng = random.Random(seed)
+    app = SessionApp(APP_PATH, default_timeout=timeout)
+    barrier.wait()
+    _timed_run(app, session, 'open', records, timeout)
+    if app.exception:
+        return app
+    bounds = app.date_input[0].value
+    for action in session_script(rng, n_actions):
+        try:
+            ACTIONS[action](app, rng, bounds)
+        except LookupError as exc:
+            records.append({'session': session, 'action': action, 'latency_ms': np.nan, 'error': str(exc)})
+            continue
+        _timed_run(app, session, action, records, timeout)
+    return app
+
+
+class MemorySampler:
+    """Background thread tracking peak resident memory of this process"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies, dtype=np.float64)
+    latencies = latencies[~np.isnan(latencies)]
+    if len(latencies) == 0:
+        return {'p50_ms': np.nan, 'p95_ms': np.nan, 'p99_ms': np.nan, 'max_ms': np.nan}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'max_ms': latencies.max()}
+
+
+def run_level(n_sessions, n_actions, seed, timeout):
+    """Run n_sessions concurrent sessions; returns (summary row, per-rerun records)"""
+    records = []
+    barrier = threading.Barrier(n_sessions)
+    apps = [None] * n_sessions
+
+    def target(i):
+        apps[i] = run_session(i, n_actions, seed * 1000 + i, records, barrier, timeout)
+
+    gc.collect()
+    rss_start = current_rss()
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n_sessions)]
+    start = time.perf_counter()
+    with MemorySampler() as sampler:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    # Memory still held while every session (and its session state) is alive
+    rss_end = current_rss()
+    del apps
+    gc.collect()
+
+    records = pd.DataFrame(records, columns=['session', 'action', 'latency_ms', 'error'])
+    records.insert(0, 'sessions', n_sessions)
+    summary = {
+        'sessions': n_sessions,
+        'reruns': int(records['latency_ms'].notna().sum()),
+        'errors': int(records['error'].notna().sum()),
+        **percentiles(records['latency_ms']),
+        'reruns_per_s': records['latency_ms'].notna().sum() / elapsed,
+        'rss_start_mb': rss_start / 2**20,
+        'rss_peak_mb': sampler.peak / 2**20,
+        'rss_end_mb': rss_end / 2**20,
+        'mb_per_session': (rss_end - rss_start) / 2**20 / n_sessions,
+    }
+    return summary, records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for the dashboard")
+    parser.add_argument('--sessions', type=int, nargs='*', default=[1, 2, 4, 8],
+                        help="Concurrency levels to run")
+    parser.add_argument('--actions', type=int, default=15, help="Actions per session after opening")
+    parser.add_argument('--data', help="Sales CSV to serve (default: generate one offline)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the session scripts")
+    parser.add_argument('--timeout', type=float, default=300, help="Seconds before a rerun counts as failed")
+    parser.add_argument('--json', help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = args.data or generate_dataset(tmp)
+        os.environ['SALES_DATA_PATH'] = os.path.abspath(data_path)
+        install_runtime()
+
+        # One warm-up session loads and caches the data, as the first visitor would
+        warm_records = []
+        start = time.perf_counter()
+        _timed_run(SessionApp(APP_PATH, default_timeout=args.timeout), 0, 'open', warm_records, args.timeout)
+        print(f"🔥 Cold start (data load + first render): {time.perf_counter() - start:.2f}s")
+        if warm_records[0]['error']:
+            raise SystemExit(f"Dashboard failed to render: {warm_records[0]['error']}")
+
+        summaries, all_records = [], []
+        for n in args.sessions:
+            summary, records = run_level(n, args.actions, args.seed, args.timeout)
+            summaries.append(summary)
+            all_records.append(records)
+            print(f"👥 {n} session(s): p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms, "
+                  f"peak RSS {summary['rss_peak_mb']:.0f} MB, {summary['errors']} error(s)")
+
+    summaries = pd.DataFrame(summaries)
+    records = pd.concat(all_records, ignore_index=True)
+    by_action = records.groupby('action')['latency_ms'].apply(
+        lambda s: pd.Series({'reruns': s.notna().sum(), **percentiles(s)})
+    ).unstack().reset_index().sort_values('p95_ms', ascending=False)
+
+    print("\n⏱️  Rerun latency and memory by concurrency")
+    print(summaries.to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    print("\n🖱️  Latency by action (all levels)")
+    print(by_action.to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    errors = records[records['error'].notna()]
+    if not errors.empty:
+        print(f"\n⚠️  {len(errors)} failed rerun(s), first: {errors['error'].iloc[0]}")
+
+    if args.json:
+        report = {
+            'cores': os.cpu_count(),
+            'actions_per_session': args.actions,
+            'levels': summaries.to_dict('records'),
+            'by_action': by_action.to_dict('records'),
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, default=float)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Sales Dashboard Benchmark Harness
+Run from the project root:  python benchmarks/run_benchmarks.py --scale 20
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+import pandas as pd
+
+# Add parent directory to path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from analysis.eda import SalesAnalyzer
+from analysis.parallel import ParallelAggregator
+
+# Modules the dashboard imports only when a feature first needs them
+DEFERRED_IMPORTS = ['analysis.model', 'analysis.sql_backend']
+
+# Marker written to stderr between the dashboard start-up and a deferred import
+_IMPORT_MARKER = '-- deferred --'
+
+
+def best_of(func, repeat=3):
+    """Best wall time in seconds over a few runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def load_scaled(data_path, scale):
+    """Analyzer over the sample data replicated `scale` times"""
+    analyzer = SalesAnalyzer(data_path, compact=True)
+    if scale > 1:
+        analyzer.df = pd.concat([analyzer.df] * scale, ignore_index=True)
+        analyzer.df = analyzer.df.sort_values('Date', kind='stable').reset_index(drop=True)
+    return analyzer
+
+
+def serial_workload(analyzer):
+    analyzer.sales_by_category()
+    analyzer.sales_by_region()
+    analyzer.sales_by_time('day')
+    analyzer.df['Customer_ID'].nunique()
+
+
+def parallel_workload(aggregator):
+    aggregator.breakdown('Category')
+    aggregator.breakdown('Region')
+    aggregator.sales_by_time('day')
+    aggregator.unique_customers()
+
+
+def benchmark_parallel(analyzer, worker_counts, repeat=3):
+    """Serial pandas baseline versus ParallelAggregator at each worker count"""
+    serial = best_of(lambda: serial_workload(analyzer), repeat)
+    results = []
+    for workers in worker_counts:
+        with ParallelAggregator(analyzer.df, workers=workers) as aggregator:
+            # First run pays for pool start-up and the shared-memory copy
+            cold = best_of(lambda: parallel_workload(aggregator), 1)
+            warm = best_of(lambda: parallel_workload(aggregator), repeat)
+        results.append({
+            'workers': workers,
+            'cold_s': cold,
+            'warm_s': warm,
+            'speedup_vs_serial': serial / warm,
+        })
+    results = pd.DataFrame(results)
+    # Scaling against cores: speedup over the single-worker run and per-core efficiency
+    baseline = results['warm_s'].iloc[0] * results['workers'].iloc[0]
+    results['speedup_vs_1_worker'] = baseline / results['warm_s']
+    results['efficiency'] = results['speedup_vs_1_worker'] / results['workers']
+    return serial, results
+
+
+def parse_importtime(stderr):
+    """Parse ``python -X importtime`` output into (module, depth, self_ms, cumulative_ms) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        name = fields[2].rstrip()
+        rows.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': int(fields[0]) / 1000.0,
+            'cumulative_ms': int(fields[1]) / 1000.0,
+        })
+    return pd.DataFrame(rows, columns=['module', 'depth', 'self_ms', 'cumulative_ms'])
+
+
+def profile_imports(deferred=DEFERRED_IMPORTS):
+    """Cold import cost of the dashboard start-up and of each deferred feature module
+
+    Each measurement runs in a fresh interpreter. The dashboard script is
+    executed outside Streamlit (bare mode) so its module-level imports run
+    exactly as on a server cold start; deferred modules are then imported
+    and only the modules they add are counted.
+    """
+    app = os.path.join(ROOT, 'dashboard', 'app.py')
+    startup = None
+    incremental = {}
+    for module in deferred:
+        code = (f"import runpy, sys; runpy.run_path({app!r}, run_name='dashboard'); "
+                f"sys.stderr.write({_IMPORT_MARKER!r} + '\\n'); import {module}")
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              cwd=ROOT, capture_output=True, text=True)
+        if _IMPORT_MARKER not in proc.stderr:
+            raise RuntimeError(f"Import profile failed:\n{proc.stderr[-2000:]}")
+        before, after = proc.stderr.split(_IMPORT_MARKER, 1)
+        if startup is None:
+            startup = parse_importtime(before)
+        incremental[module] = parse_importtime(after)
+    return startup, incremental
+
+
+def default_worker_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sales analysis hot paths")
+    parser.add_argument('--data', default='data/sales_data.csv', help="Sales CSV to load")
+    parser.add_argument('--scale', type=int, default=10, help="Replicate the data this many times")
+    parser.add_argument('--workers', type=int, nargs='*', help="Worker counts to measure")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement (best is kept)")
+    parser.add_argument('--json', help="Also write results to this JSON file")
+    parser.add_argument('--imports-only', action='store_true', help="Only run the import-time profile")
+    args = parser.parse_args()
+
+    print("📦 Import time (fresh interpreter)")
+    startup, deferred = profile_imports()
+    print(f"Dashboard start-up: {startup['self_ms'].sum():.0f} ms")
+    heaviest = startup[startup['depth'] == 0].nlargest(10, 'cumulative_ms')
+    print(heaviest[['module', 'cumulative_ms']].to_string(index=False, float_format=lambda v: f"{v:.1f}"))
+    for module, profile in deferred.items():
+        print(f"Deferred {module}: +{profile['self_ms'].sum():.0f} ms on first use")
+    imports = {
+        'startup_ms': startup['self_ms'].sum(),
+        'startup_heaviest': heaviest[['module', 'cumulative_ms']].to_dict('records'),
+        'deferred_ms': {module: profile['self_ms'].sum() for module, profile in deferred.items()}
+    }
+    if args.imports_only:
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'imports': imports}, f, indent=2)
+        return
+
+    analyzer = load_scaled(args.data, args.scale)
+    print(f"\n📊 {len(analyzer.df):,} rows, {os.cpu_count()} cores")
+
+    print("\n⚙️  Partitioned aggregation (category, region, daily sales, unique customers)")
+    serial, parallel = benchmark_parallel(analyzer, args.workers or default_worker_counts(), args.repeat)
+    print(f"Serial pandas: {serial:.3f}s")
+    print(parallel.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    if args.json:
+        report = {
+            'rows': len(analyzer.df),
+            'cores': os.cpu_count(),
+            'imports': imports,
+            'parallel': {'serial_s': serial, 'runs': parallel.to_dict('records')}
+        }
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,24 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import sys
 import os
+import tempfile
 from datetime import datetime, timedelta
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from analysis.eda import SalesAnalyzer
-from analysis.model import SalesForecastModel
+# Forecasting (scikit-learn, joblib) and the SQLite backend are imported on first use
+from analysis.eda import SalesAnalyzer, filters_key
+from analysis.validation import schema_for
+from analysis.customers import segment_summary, top_customers
+from analysis.pool import AnalyzerPool
+from analysis.export import ExportCache, EXPORT_FORMATS, export_key
+from analysis.registry import ModelRegistry, model_key
+from analysis.figures import FigureCache, figure_key
+from analysis.tuning import DEFAULT_CONFIG_PATH, load_config, tuned_params
+from analysis import profiling
 
 # Page configuration
 st.set_page_config(
@@ -42,12 +50,118 @@ COLORS = {
                      '#6C5CE7', '#00B894', '#FDCB6E', '#E17055', '#0984E3']
 }
 
-@st.cache_data
-def load_data():
-    """Load and cache data"""
-    analyzer = SalesAnalyzer('data/sales_data.csv')
+# Above this many products the lift heatmap is replaced by a table of the strongest pairs
+MAX_LIFT_HEATMAP_PRODUCTS = 50
+
+# Largest export offered for download; the download button keeps the file in memory per session
+MAX_DOWNLOAD_BYTES = float(os.environ.get('SALES_EXPORT_DOWNLOAD_MB', '200')) * 1_048_576
+
+# Sales CSV to serve (override for generated or load-test datasets)
+DATA_PATH = os.environ.get('SALES_DATA_PATH', 'data/sales_data.csv')
+
+def dataset_paths():
+    """Dataset name -> sales CSV
+
+    SALES_DATASETS lists several datasets as ``name=path`` pairs separated
+    by semicolons (e.g. one per business unit); otherwise DATA_PATH is the
+    only dataset.
+    """
+    datasets = {}
+    for item in os.environ.get('SALES_DATASETS', '').split(';'):
+        if '=' in item:
+            name, path = item.split('=', 1)
+            datasets[name.strip()] = path.strip()
+    return datasets or {os.path.splitext(os.path.basename(DATA_PATH))[0]: DATA_PATH}
+
+def quarantine_path(data_path):
+    """CSV of rows that failed validation, next to the dataset"""
+    return os.path.splitext(data_path)[0] + '.quarantine.csv'
+
+def load_analyzer(data_path):
+    """Load one dataset and build its sketches"""
+    # SQLite backend keeps rows on disk and only pulls aggregates into memory
+    if os.environ.get('SALES_BACKEND', 'pandas').lower() == 'sqlite':
+        from analysis.sql_backend import SQLiteSalesAnalyzer
+        db_path = os.path.splitext(data_path)[0] + '.db'
+        if data_path == DATA_PATH:
+            db_path = os.environ.get('SALES_DB_PATH', db_path)
+        analyzer = SQLiteSalesAnalyzer.from_csv(data_path, db_path)
+        analyzer.build_anomaly_detector()
+        return analyzer
+    
+    # Compact schema roughly halves (or better) the resident size per row
+    compact = os.environ.get('SALES_COMPACT_SCHEMA', '1').lower() not in ('0', 'false', 'no')
+    # Cleaned columns are memory-mapped from a snapshot shared by all worker processes
+    snapshot_path = os.path.splitext(data_path)[0] + '.snapshot'
+    if data_path == DATA_PATH:
+        snapshot_path = os.environ.get('SALES_SNAPSHOT_PATH', snapshot_path)
+    # Rows failing the dataset's schema (<name>.schema.json, else SALES_SCHEMA) are left out
+    # and listed with reasons next to the CSV
+    # SALES_WORKERS > 1 runs the grouped breakdowns and exact distinct counts in a process pool
+    workers = int(os.environ.get('SALES_WORKERS', '0')) or None
+    analyzer = SalesAnalyzer(data_path, compact=compact, snapshot_path=snapshot_path or None,
+                             schema=schema_for(data_path), quarantine_path=quarantine_path(data_path),
+                             workers=workers)
+    # Distinct-customer sketches make the Unique Customers KPI O(filter) instead of O(rows)
+    analyzer.build_customer_sketch()
+    # Quantile sketches answer the order value distribution panel for any filter
+    analyzer.build_distribution_sketches()
+    # Anomaly scores for every Category x Region x Product series, filtered per view
+    analyzer.build_anomaly_detector()
     return analyzer
 
+@st.cache_resource
+def get_pool():
+    """Process-wide pool of loaded datasets, shared by every session"""
+    budget_mb = float(os.environ.get('SALES_POOL_BUDGET_MB', '2048'))
+    return AnalyzerPool(dataset_paths(), load_analyzer, budget_bytes=budget_mb * 1_048_576)
+
+@st.cache_resource
+def get_export_cache():
+    """Finished export files, shared by every session and reused for identical exports"""
+    directory = os.environ.get('SALES_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'sales_exports'))
+    max_mb = float(os.environ.get('SALES_EXPORT_CACHE_MB', '1024'))
+    return ExportCache(directory, max_bytes=max_mb * 1_048_576)
+
+@st.cache_resource
+def get_model_registry():
+    """Process-wide fitted forecasting models; sessions keep only a key and the compact result"""
+    budget_mb = float(os.environ.get('SALES_MODEL_REGISTRY_MB', '512'))
+    return ModelRegistry(budget_bytes=budget_mb * 1_048_576)
+
+@st.cache_resource
+def get_figure_cache():
+    """Serialized chart figures shared by every session, keyed by the content they show"""
+    max_mb = float(os.environ.get('SALES_FIGURE_CACHE_MB', '64'))
+    return FigureCache(max_bytes=max_mb * 1_048_576)
+
+def tuned_config():
+    """Saved hyperparameter search result (python -m analysis.tuning), or None; re-read so a new search applies without a restart"""
+    return load_config(os.environ.get('SALES_TUNED_CONFIG', DEFAULT_CONFIG_PATH))
+
+def plot_chart(name, build, *inputs):
+    """Show a Plotly chart through the shared figure cache
+
+    ``inputs`` are every aggregate and option the figure is built from;
+    ``build()`` only runs when no session has drawn this chart from the
+    same inputs, otherwise the cached figure is shown without running
+    plotly.express again.
+    """
+    figure = get_figure_cache().get_or_build(figure_key(name, *inputs), build)
+    st.plotly_chart(figure, use_container_width=True)
+
+def session_state_bytes():
+    """Approximate memory held by this session's state"""
+    total = 0
+    for value in st.session_state.values():
+        if isinstance(value, pd.DataFrame):
+            total += value.memory_usage(deep=True).sum()
+        elif hasattr(value, 'nbytes'):
+            total += value.nbytes
+        else:
+            total += sys.getsizeof(value)
+    return int(total)
+
 def create_metric_card(label, value, delta=None, delta_color="normal"):
     """Create a custom metric card"""
     delta_html = ""
@@ -77,7 +191,124 @@ def format_number(value):
         return f"{value/1_000:.2f}K"
     return f"{value:.0f}"
 
+def render_performance_panel(analyzer, pool=None, registry=None):
+    """Collapsible panel with per-stage timings from the profiler"""
+    with st.expander("⏱️ Performance", expanded=False):
+        memory = analyzer.memory_report()
+        st.caption(
+            f"Working set: {format_number(memory['rows'])} rows, "
+            f"{memory['total_bytes'] / 1_048_576:.1f} MB, "
+            f"{memory['bytes_per_row']:.0f} bytes/row "
+            f"({memory['schema']} schema"
+            + (f", {memory['mapped_bytes'] / 1_048_576:.1f} MB memory-mapped from the snapshot)"
+               if memory.get('mapped_bytes') else ")")
+        )
+        
+        if pool is not None and len(pool.names) > 1:
+            loaded = pool.status()
+            loaded = loaded[loaded['Loaded']]
+            budget = f" of {pool.budget_bytes / 1_048_576:.0f} MB" if pool.budget_bytes else ""
+            st.caption(
+                f"Dataset pool: {len(loaded)}/{len(pool.names)} loaded "
+                f"({', '.join(loaded['Dataset'])}), ~{pool.total_bytes / 1_048_576:.1f} MB{budget}, "
+                f"{pool.loads} load(s), {pool.evictions} eviction(s)"
+            )
+        
+        forecast = st.session_state.get('forecast')
+        st.caption(
+            f"This session: {session_state_bytes() / 1024:.1f} KB of session state"
+            + (f" (forecast result {forecast.nbytes / 1024:.1f} KB)" if forecast is not None else "")
+            + (f"; model registry: {len(registry)} shared model(s), {registry.total_bytes / 1_048_576:.1f} MB, "
+               f"{registry.trained} trained, {registry.hits} reused, {registry.evictions} evicted"
+               if registry is not None else "")
+        )
+        
+        figures = get_figure_cache()
+        st.caption(
+            f"Figure cache: {len(figures)} chart(s), {figures.total_bytes / 1_048_576:.1f} MB, "
+            f"{figures.hits} hit(s), {figures.misses} built, {figures.evictions} evicted"
+        )
+        
+        stats = profiling.summary()
+        if stats.empty:
+            st.info("No timings recorded yet - rerun the page to collect them")
+            return
+        
+        display = stats.copy()
+        display['mem_delta_mb'] = display['mem_delta_bytes'] / 1_048_576
+        st.dataframe(
+            display[['stage', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'last_ms', 'rows', 'mem_delta_mb']].round(2),
+            use_container_width=True,
+            hide_index=True
+        )
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button("Download Prometheus metrics", profiling.to_prometheus(),
+                               file_name="sales_metrics.prom", mime="text/plain")
+        with col2:
+            st.download_button("Download JSON metrics", profiling.to_json(),
+                               file_name="sales_metrics.json", mime="application/json")
+        with col3:
+            if st.button("Reset timings"):
+                profiling.reset()
+    
+    # Optional scrape target for a Prometheus textfile collector
+    metrics_file = os.environ.get('SALES_METRICS_FILE')
+    if metrics_file:
+        profiling.write_metrics(metrics_file)
+
+def render_export_panel(analyzer, dataset):
+    """Sidebar download of the filtered transactions as CSV or Parquet
+
+    The file is written to disk in chunks when requested and reused by
+    any session asking for the same data, filters and format. Its bytes
+    are only handed to the download button after "Prepare download", so
+    ordinary reruns never read it. The download button holds the whole
+    file in server memory for the session, so files above
+    MAX_DOWNLOAD_BYTES are not offered.
+    """
+    st.sidebar.markdown("## 📥 Export")
+    rows = analyzer.row_count()
+    st.sidebar.caption(f"{format_number(rows)} transactions match the current filters")
+    fmt = st.sidebar.selectbox("Format", ['CSV', 'Parquet'], key='export_format').lower()
+    
+    cache = get_export_cache()
+    key = export_key(analyzer.data_version, analyzer.filters, fmt)
+    if st.sidebar.button("Prepare download", disabled=rows == 0):
+        with st.spinner(f"Writing {format_number(rows)} rows..."):
+            cache.get_or_create(key, fmt, analyzer.iter_chunks)
+        st.session_state['export_ready'] = key
+    
+    if st.session_state.get('export_ready') != key:
+        return
+    # None if the file was evicted since it was prepared
+    f, size = cache.open(key, fmt)
+    if f is None:
+        return
+    with f:
+        st.sidebar.caption(f"{size / 1_048_576:.1f} MB")
+        if size > MAX_DOWNLOAD_BYTES:
+            st.sidebar.warning(
+                f"The export is larger than the {MAX_DOWNLOAD_BYTES / 1_048_576:g} MB download limit "
+                "(SALES_EXPORT_DOWNLOAD_MB); narrow the filters or choose Parquet."
+            )
+            return
+        st.sidebar.download_button(
+            "⬇️ Download",
+            f,
+            file_name=f"{dataset}_transactions.{fmt}",
+            mime=EXPORT_FORMATS[fmt],
+            on_click=lambda: st.session_state.pop('export_ready', None)
+        )
+
 def main():
+    # Profiling toggle is read before any work so the whole rerun is covered
+    if st.session_state.get('perf_profiling', profiling.is_enabled()):
+        profiling.enable()
+    else:
+        profiling.disable()
+    
     # Header
     st.markdown("""
         <h1 style='text-align: center; color: white; padding: 20px; 
@@ -87,16 +318,31 @@ def main():
         </h1>
     """, unsafe_allow_html=True)
     
+    # Dataset selection (loaded on first use, least recently used evicted over budget)
+    pool = get_pool()
+    dataset = pool.names[0]
+    if len(pool.names) > 1:
+        st.sidebar.markdown("## 🗂️ Dataset")
+        dataset = st.sidebar.selectbox("Select Dataset", pool.names, key='dataset')
+    
     # Load data
-    with st.spinner("Loading data..."):
-        analyzer = load_data()
+    with st.spinner(f"Loading {dataset}..."):
+        analyzer = pool.get(dataset)
+    
+    quarantined = getattr(analyzer, 'quarantined_rows', 0)
+    if quarantined:
+        st.sidebar.warning(
+            f"⚠️ {format_number(quarantined)} invalid rows were left out; "
+            f"see {os.path.basename(quarantine_path(pool.datasets[dataset]))} for the reasons"
+        )
     
     # Sidebar filters
     st.sidebar.markdown("## 🎯 Filters")
     
     # Date range filter
-    min_date = analyzer.df['Date'].min().date()
-    max_date = analyzer.df['Date'].max().date()
+    first_date, last_date = analyzer.date_bounds()
+    min_date = first_date.date()
+    max_date = last_date.date()
     
     date_range = st.sidebar.date_input(
         "Select Date Range",
@@ -108,34 +354,47 @@ def main():
     # Category filter
     categories = st.sidebar.multiselect(
         "Select Categories",
-        options=analyzer.df['Category'].unique(),
-        default=analyzer.df['Category'].unique()
+        options=analyzer.distinct_values('Category'),
+        default=analyzer.distinct_values('Category')
     )
     
     # Region filter
     regions = st.sidebar.multiselect(
         "Select Regions",
-        options=analyzer.df['Region'].unique(),
-        default=analyzer.df['Region'].unique()
+        options=analyzer.distinct_values('Region'),
+        default=analyzer.distinct_values('Region')
     )
     
-    # Apply filters
+    # Exact or sketch-based distinct customer count
+    approximate_customers = st.sidebar.toggle(
+        "Approximate unique customers",
+        value=os.environ.get('SALES_DISTINCT_MODE', 'exact') == 'approximate',
+        help="Estimate from HyperLogLog sketches (typical error ±1.6%, ~95% within ±3.3%)"
+    )
+    
+    # Performance instrumentation (process-wide, shared by all sessions)
+    st.sidebar.markdown("---")
+    st.sidebar.checkbox(
+        "⏱️ Performance profiling",
+        value=profiling.is_enabled(),
+        key='perf_profiling',
+        help="Record wall time, rows and memory per stage (applies to every session on this server)"
+    )
+    
+    # Apply filters (analyzer view restricted to the selection)
     if len(date_range) == 2:
         start_date, end_date = date_range
-        filtered_df = analyzer.get_filtered_data(
+        analyzer = analyzer.filtered(
             start_date=start_date,
             end_date=end_date,
             categories=categories,
             regions=regions
         )
-    else:
-        filtered_df = analyzer.df
     
-    # Update analyzer with filtered data
-    analyzer.df = filtered_df
+    render_export_panel(analyzer, dataset)
     
     # Get summary stats
-    stats = analyzer.get_summary_stats()
+    stats = analyzer.get_summary_stats(approximate=approximate_customers)
     
     # KPI Section
     st.markdown("## 📈 Key Performance Indicators")
@@ -166,19 +425,19 @@ def main():
     with col4:
         st.metric(
             label="👥 Unique Customers",
-            value=format_number(stats['unique_customers']),
+            value=("≈" if approximate_customers else "") + format_number(stats['unique_customers']),
             delta=f"Profit: {format_currency(stats['total_profit'])}"
         )
     
     st.markdown("---")
     
     # Main content tabs
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         "📊 Overview", "📈 Trends", "🎯 Products & Categories", 
-        "🌍 Regional Analysis", "🔮 Forecasting"
+        "🌍 Regional Analysis", "👥 Customers", "🔮 Forecasting"
     ])
     
-    with tab1:
+    with tab1, profiling.timed_block('dashboard.tab_overview'):
         st.markdown("### Sales Overview")
         
         col1, col2 = st.columns(2)
@@ -186,7 +445,7 @@ def main():
         with col1:
             # Monthly sales trend
             monthly_sales = analyzer.sales_by_time('month')
-            fig_monthly = px.line(
+            plot_chart('monthly_sales', lambda: px.line(
                 monthly_sales,
                 x='Month_Name',
                 y='Total_Amount',
@@ -194,35 +453,31 @@ def main():
                 title='Monthly Sales Trend',
                 labels={'Total_Amount': 'Sales ($)', 'Month_Name': 'Month'},
                 color_discrete_sequence=COLORS['chart_colors']
-            )
-            fig_monthly.update_layout(
+            ).update_layout(
                 height=400,
                 hovermode='x unified',
                 plot_bgcolor='rgba(0,0,0,0)',
                 paper_bgcolor='rgba(0,0,0,0)'
-            )
-            st.plotly_chart(fig_monthly, use_container_width=True)
+            ), monthly_sales)
         
         with col2:
             # Sales by category
             category_sales = analyzer.sales_by_category()
-            fig_category = px.pie(
+            plot_chart('category_sales', lambda: px.pie(
                 category_sales,
                 values='Total_Amount',
                 names='Category',
                 title='Sales Distribution by Category',
                 color_discrete_sequence=COLORS['chart_colors']
-            )
-            fig_category.update_traces(textposition='inside', textinfo='percent+label')
-            fig_category.update_layout(height=400)
-            st.plotly_chart(fig_category, use_container_width=True)
+            ).update_traces(textposition='inside', textinfo='percent+label').update_layout(height=400),
+                category_sales)
         
         col3, col4 = st.columns(2)
         
         with col3:
             # Customer segment analysis
             segment_analysis = analyzer.customer_segment_analysis()
-            fig_segment = px.bar(
+            plot_chart('segment_sales', lambda: px.bar(
                 segment_analysis,
                 x='Customer_Segment',
                 y='Total_Amount',
@@ -230,14 +485,12 @@ def main():
                 labels={'Customer_Segment': 'Segment', 'Total_Amount': 'Total Sales ($)'},
                 color='Customer_Segment',
                 color_discrete_sequence=COLORS['chart_colors']
-            )
-            fig_segment.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig_segment, use_container_width=True)
+            ).update_layout(height=400, showlegend=False), segment_analysis)
         
         with col4:
             # Payment method distribution
             payment_analysis = analyzer.payment_method_analysis()
-            fig_payment = px.bar(
+            plot_chart('payment_sales', lambda: px.bar(
                 payment_analysis,
                 x='Payment_Method',
                 y='Total_Amount',
@@ -245,53 +498,83 @@ def main():
                 labels={'Payment_Method': 'Payment Method', 'Total_Amount': 'Sales ($)'},
                 color='Payment_Method',
                 color_discrete_sequence=COLORS['chart_colors']
-            )
-            fig_payment.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig_payment, use_container_width=True)
+            ).update_layout(height=400, showlegend=False), payment_analysis)
+        
+        # Order value distribution (merged from per-partition quantile sketches)
+        st.markdown("### 📦 Order Value Distribution")
+        
+        value_columns = {'Order Value': 'Total_Amount', 'Unit Price': 'Unit_Price'}
+        group_columns = {'Category': 'Category', 'Region': 'Region', 'Customer Segment': 'Customer_Segment'}
+        col5, col6 = st.columns(2)
+        with col5:
+            value_label = st.selectbox("Value", list(value_columns))
+        with col6:
+            group_label = st.selectbox("Break down by", list(group_columns))
+        value_column, group_column = value_columns[value_label], group_columns[group_label]
+        
+        overall = analyzer.value_distribution(value_column).iloc[0]
+        col7, col8, col9 = st.columns(3)
+        col7.metric("Median", format_currency(overall['P50']) if pd.notna(overall['P50']) else "–")
+        col8.metric("90th Percentile", format_currency(overall['P90']) if pd.notna(overall['P90']) else "–")
+        col9.metric("99th Percentile", format_currency(overall['P99']) if pd.notna(overall['P99']) else "–")
+        
+        distribution = analyzer.value_distribution(value_column, by=group_column)
+        plot_chart('value_distribution', lambda: px.bar(
+            distribution.melt(id_vars=[group_column], value_vars=['P50', 'P90', 'P99'],
+                              var_name='Quantile', value_name='Value'),
+            x=group_column,
+            y='Value',
+            color='Quantile',
+            barmode='group',
+            title=f"{value_label} Quantiles by {group_label}",
+            labels={'Value': f'{value_label} ($)', group_column: group_label},
+            color_discrete_sequence=COLORS['chart_colors']
+        ).update_layout(height=400), distribution, value_label, group_label)
+        if getattr(analyzer, 'distribution_sketches', None):
+            st.caption("Quantiles are merged from per-partition sketches and are within 1% of the exact value.")
     
-    with tab2:
+    with tab2, profiling.timed_block('dashboard.tab_trends'):
         st.markdown("### Trend Analysis")
         
         # Daily sales trend with moving average
-        daily_sales = analyzer.sales_by_time('day')
-        daily_sales['MA_7'] = daily_sales['Total_Amount'].rolling(window=7).mean()
-        daily_sales['MA_30'] = daily_sales['Total_Amount'].rolling(window=30).mean()
+        daily_stats = analyzer.daily_stats()
+        daily_sales = pd.DataFrame({
+            'Date': daily_stats.dates,
+            'Total_Amount': daily_stats.values,
+            'MA_7': daily_stats.rolling_mean(7),
+            'MA_30': daily_stats.rolling_mean(30)
+        })
         
-        fig_daily = go.Figure()
-        fig_daily.add_trace(go.Scatter(
+        plot_chart('daily_sales', lambda: go.Figure().add_trace(go.Scatter(
             x=daily_sales['Date'],
             y=daily_sales['Total_Amount'],
             name='Daily Sales',
             line=dict(color='lightgray', width=1),
             opacity=0.5
-        ))
-        fig_daily.add_trace(go.Scatter(
+        )).add_trace(go.Scatter(
             x=daily_sales['Date'],
             y=daily_sales['MA_7'],
             name='7-Day MA',
             line=dict(color=COLORS['primary'], width=2)
-        ))
-        fig_daily.add_trace(go.Scatter(
+        )).add_trace(go.Scatter(
             x=daily_sales['Date'],
             y=daily_sales['MA_30'],
             name='30-Day MA',
             line=dict(color=COLORS['secondary'], width=2)
-        ))
-        fig_daily.update_layout(
+        )).update_layout(
             title='Daily Sales with Moving Averages',
             xaxis_title='Date',
             yaxis_title='Sales ($)',
             height=500,
             hovermode='x unified'
-        )
-        st.plotly_chart(fig_daily, use_container_width=True)
+        ), daily_sales)
         
         col1, col2 = st.columns(2)
         
         with col1:
             # Seasonal analysis
             seasonal = analyzer.seasonal_analysis()
-            fig_seasonal = px.bar(
+            plot_chart('seasonal_sales', lambda: px.bar(
                 seasonal,
                 x='Month_Name',
                 y='Total_Amount',
@@ -299,27 +582,54 @@ def main():
                 labels={'Month_Name': 'Month', 'Total_Amount': 'Total Sales ($)'},
                 color='Total_Amount',
                 color_continuous_scale='Blues'
-            )
-            fig_seasonal.update_layout(height=400)
-            st.plotly_chart(fig_seasonal, use_container_width=True)
+            ).update_layout(height=400), seasonal)
         
         with col2:
             # Growth rate
             growth = analyzer.monthly_growth_rate()
             growth['Period'] = growth['Year'].astype(str) + '-' + growth['Month'].astype(str).str.zfill(2)
-            fig_growth = px.line(
+            plot_chart('growth_rate', lambda: px.line(
                 growth,
                 x='Period',
                 y='Growth_Rate',
                 title='Month-over-Month Growth Rate',
                 labels={'Period': 'Period', 'Growth_Rate': 'Growth Rate (%)'},
                 markers=True
+            ).add_hline(y=0, line_dash="dash", line_color="red").update_layout(height=400), growth)
+        
+        # Category x Region x Product daily series scored against robust rolling baselines
+        st.markdown("#### 🚨 Series Anomalies")
+        col3, col4 = st.columns([1, 3])
+        with col3:
+            anomaly_threshold = st.slider(
+                "Z-score threshold", 3.0, 20.0, 5.0, 0.5,
+                help="Robust z-score of a day's sales against the series' trailing 28-day median"
             )
-            fig_growth.add_hline(y=0, line_dash="dash", line_color="red")
-            fig_growth.update_layout(height=400)
-            st.plotly_chart(fig_growth, use_container_width=True)
+            max_anomalies = st.slider("Anomalies to list", 10, 100, 20, key='max_anomalies')
+        anomalies = analyzer.series_anomalies(threshold=anomaly_threshold, top=max_anomalies)
+        with col4:
+            anomaly_counts = analyzer.anomaly_detector.daily_counts(threshold=anomaly_threshold, **analyzer.filters)
+            plot_chart('anomaly_counts', lambda: px.bar(
+                anomaly_counts.melt(id_vars='Date', value_vars=['Spikes', 'Drops'],
+                                    var_name='Type', value_name='Series'),
+                x='Date',
+                y='Series',
+                color='Type',
+                title='Anomalous Series per Day',
+                color_discrete_map={'Spikes': COLORS['accent'], 'Drops': COLORS['danger']}
+            ).update_layout(height=300, bargap=0), anomaly_counts)
+        
+        anomalies_display = anomalies.copy()
+        anomalies_display['Date'] = anomalies_display['Date'].dt.strftime('%Y-%m-%d')
+        anomalies_display['Value'] = anomalies_display['Value'].apply(format_currency)
+        anomalies_display['Baseline'] = anomalies_display['Baseline'].apply(format_currency)
+        anomalies_display['Z_Score'] = anomalies_display['Z_Score'].round(1)
+        anomalies_display = anomalies_display.rename(columns={
+            'Value': 'Sales', 'Baseline': '28-Day Median', 'Z_Score': 'Z-Score'
+        })
+        st.dataframe(anomalies_display, use_container_width=True, hide_index=True)
     
-    with tab3:
+    with tab3, profiling.timed_block('dashboard.tab_products'):
         st.markdown("### Products & Categories Analysis")
         
         col1, col2 = st.columns([2, 1])
@@ -329,7 +639,7 @@ def main():
             top_n = st.slider("Number of top products to display", 5, 20, 10)
             top_products = analyzer.top_products(n=top_n)
             
-            fig_top = px.bar(
+            plot_chart('top_products', lambda: px.bar(
                 top_products,
                 x='Total_Amount',
                 y='Product',
@@ -338,9 +648,7 @@ def main():
                 labels={'Total_Amount': 'Total Sales ($)', 'Product': ''},
                 color='Total_Amount',
                 color_continuous_scale='Viridis'
-            )
-            fig_top.update_layout(height=600)
-            st.plotly_chart(fig_top, use_container_width=True)
+            ).update_layout(height=600), top_products, top_n)
         
         with col2:
             # Category statistics
@@ -358,7 +666,7 @@ def main():
         st.markdown("#### 💸 Discount Impact Analysis")
         discount_impact = analyzer.discount_impact_analysis()
         
-        fig_discount = px.bar(
+        plot_chart('discount_impact', lambda: px.bar(
             discount_impact,
             x='Discount_Category',
             y='Total_Amount',
@@ -366,11 +674,44 @@ def main():
             labels={'Discount_Category': 'Discount Category', 'Total_Amount': 'Total Sales ($)'},
             color='Discount_Category',
             color_discrete_sequence=COLORS['chart_colors']
-        )
-        fig_discount.update_layout(height=400, showlegend=False)
-        st.plotly_chart(fig_discount, use_container_width=True)
-    
-    with tab4:
+        ).update_layout(height=400, showlegend=False), discount_impact)
+
+        # Co-purchase affinity (customers who bought X also bought Y)
+        st.markdown("#### 🔗 Product Affinity")
+        affinity = analyzer.product_affinity()
+        pairs = affinity.pairs(min_customers=2)
+
+        if len(pairs) == 0:
+            st.info("No products were bought by the same customers in this selection")
+        else:
+            col1, col2 = st.columns(2)
+
+            with col1:
+                if len(affinity.products) <= MAX_LIFT_HEATMAP_PRODUCTS:
+                    lift = affinity.lift_matrix()
+                    plot_chart('product_lift', lambda: px.imshow(
+                        lift,
+                        color_continuous_scale='RdBu_r',
+                        color_continuous_midpoint=1.0,
+                        title='Co-purchase Lift (>1: bought together more often than chance)',
+                        labels={'x': '', 'y': '', 'color': 'Lift'},
+                        aspect='auto'
+                    ).update_layout(height=500), lift)
+                else:
+                    st.markdown("**Strongest product pairs**")
+                    st.dataframe(pairs.head(20), use_container_width=True, hide_index=True)
+
+            with col2:
+                product = st.selectbox("Customers who bought", list(affinity.products), key='affinity_product')
+                also_bought = affinity.also_bought(product, top=10)
+                st.markdown("**...also bought**")
+                st.dataframe(
+                    also_bought.style.format({'Confidence': '{:.1%}', 'Lift': '{:.2f}'}),
+                    use_container_width=True,
+                    hide_index=True
+                )
+
+    with tab4, profiling.timed_block('dashboard.tab_regional'):
         st.markdown("### Regional Analysis")
         
         # Regional sales
@@ -379,7 +720,7 @@ def main():
         col1, col2 = st.columns(2)
         
         with col1:
-            fig_region = px.bar(
+            plot_chart('region_sales', lambda: px.bar(
                 region_sales,
                 x='Region',
                 y='Total_Amount',
@@ -387,13 +728,11 @@ def main():
                 labels={'Region': '', 'Total_Amount': 'Total Sales ($)'},
                 color='Total_Amount',
                 color_continuous_scale='RdYlGn'
-            )
-            fig_region.update_layout(height=400)
-            st.plotly_chart(fig_region, use_container_width=True)
+            ).update_layout(height=400), region_sales)
         
         with col2:
             # Regional profit comparison
-            fig_region_profit = px.scatter(
+            plot_chart('region_profit', lambda: px.scatter(
                 region_sales,
                 x='Total_Amount',
                 y='Profit',
@@ -402,9 +741,7 @@ def main():
                 title='Regional Sales vs Profit',
                 labels={'Total_Amount': 'Total Sales ($)', 'Profit': 'Profit ($)'},
                 color_discrete_sequence=COLORS['chart_colors']
-            )
-            fig_region_profit.update_layout(height=400)
-            st.plotly_chart(fig_region_profit, use_container_width=True)
+            ).update_layout(height=400), region_sales)
         
         # Regional details table
         st.markdown("#### Regional Performance Details")
@@ -418,7 +755,63 @@ def main():
         })
         st.dataframe(region_display, use_container_width=True, hide_index=True)
     
-    with tab5:
+    with tab5, profiling.timed_block('dashboard.tab_customers'):
+        st.markdown("### Customer Analytics (RFM)")
+        
+        rfm = analyzer.customer_rfm()
+        segments = segment_summary(rfm)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Customers", format_number(len(rfm)))
+        with col2:
+            st.metric("Avg Customer Value", format_currency(rfm['Monetary'].mean() if len(rfm) else 0))
+        with col3:
+            st.metric("Avg Days Since Purchase", f"{rfm['Recency'].mean() if len(rfm) else 0:.0f}")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            plot_chart('rfm_segments', lambda: px.bar(
+                segments,
+                x='Customers',
+                y='Segment',
+                orientation='h',
+                title='Customers by RFM Segment',
+                labels={'Customers': 'Customers', 'Segment': ''},
+                color='Segment',
+                color_discrete_sequence=COLORS['chart_colors']
+            ).update_layout(height=450, showlegend=False), segments)
+        
+        with col2:
+            plot_chart('rfm_revenue', lambda: px.treemap(
+                segments,
+                path=['Segment'],
+                values='Monetary',
+                title='Revenue by RFM Segment',
+                color='Avg_Recency',
+                color_continuous_scale='RdYlGn_r'
+            ).update_layout(height=450), segments)
+        
+        # Top customers
+        st.markdown("#### 🏆 Top Customers")
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            top_n_customers = st.slider("Number of customers", 5, 50, 10, key='top_customers')
+            rank_by = st.selectbox("Rank by", ['Monetary', 'Frequency', 'RFM_Score'])
+        with col2:
+            top = top_customers(rfm, n=top_n_customers, by=rank_by)
+            top_display = top[['Customer_ID', 'Segment', 'Recency', 'Frequency', 'Monetary', 'RFM_Score']].copy()
+            top_display['Monetary'] = top_display['Monetary'].apply(format_currency)
+            top_display = top_display.rename(columns={
+                'Recency': 'Days Since Purchase',
+                'Frequency': 'Orders',
+                'Monetary': 'Total Spend',
+                'RFM_Score': 'RFM'
+            })
+            st.dataframe(top_display, use_container_width=True, hide_index=True)
+    
+    with tab6, profiling.timed_block('dashboard.tab_forecasting'):
         st.markdown("### Sales Forecasting")
         
         st.info("🔮 Using Machine Learning to predict future sales trends")
@@ -427,98 +820,113 @@ def main():
         
         with col2:
             forecast_days = st.slider("Forecast Period (days)", 7, 90, 30)
+            model_type_map = {
+                "Random Forest": "random_forest",
+                "Gradient Boosting": "gradient_boosting",
+                "Linear Regression": "linear_regression"
+            }
+            # Default to the family that won the last hyperparameter search
+            tuned = tuned_config()
+            model_types = list(model_type_map.values())
+            best = tuned['best'] if tuned else None
             model_type = st.selectbox(
                 "Select Model",
-                ["Random Forest", "Gradient Boosting", "Linear Regression"]
+                list(model_type_map),
+                index=model_types.index(best) if best in model_types else 0
             )
+            model_name = model_type_map[model_type]
+            params = tuned_params(tuned, model_name)
+            if params is not None:
+                st.caption(f"⚙️ Tuned hyperparameters (validation MAE {format_currency(tuned['models'][model_name]['cv_mae'])})")
             
             if st.button("🚀 Generate Forecast", type="primary"):
                 with st.spinner("Training model and generating forecast..."):
                     # Train model
-                    model_type_map = {
-                        "Random Forest": "random_forest",
-                        "Gradient Boosting": "gradient_boosting",
-                        "Linear Regression": "linear_regression"
-                    }
+                    from analysis.model import SalesForecastModel
                     
-                    forecaster = SalesForecastModel(analyzer.df)
-                    metrics = forecaster.train_model(model_type=model_type_map[model_type])
-                    forecast_df = forecaster.predict_future(days_ahead=forecast_days)
+                    def train():
+                        forecaster = SalesForecastModel(analyzer.df)
+                        forecaster.train_model(model_type=model_name, params=params)
+                        return forecaster
                     
-                    # Store in session state
-                    st.session_state['forecast'] = forecast_df
-                    st.session_state['metrics'] = metrics
-                    st.session_state['forecaster'] = forecaster
+                    # Fitted model is shared by every session with the same data, filters, model type and parameters
+                    key = model_key(analyzer.data_version, filters_key(analyzer.filters), model_name, params)
+                    forecaster, _ = get_model_registry().get_or_train(key, train)
+                    
+                    # Session keeps only the compact result, not the model or its training data
+                    st.session_state['forecast'] = forecaster.result(days_ahead=forecast_days, model_key=key)
                     
                     st.success("✅ Forecast generated successfully!")
         
         with col1:
             if 'forecast' in st.session_state:
-                forecast_df = st.session_state['forecast']
+                result = st.session_state['forecast']
+                forecast_df = result.forecast
                 
                 # Plot forecast
-                historical = analyzer.sales_by_time('day')
-                
-                fig_forecast = go.Figure()
+                historical = analyzer.daily_stats()
                 
-                # Historical data
-                fig_forecast.add_trace(go.Scatter(
-                    x=historical['Date'],
-                    y=historical['Total_Amount'],
-                    name='Historical Sales',
-                    line=dict(color=COLORS['primary'], width=2)
-                ))
-                
-                # Forecast
-                fig_forecast.add_trace(go.Scatter(
-                    x=forecast_df['Date'],
-                    y=forecast_df['Predicted_Sales'],
-                    name='Forecasted Sales',
-                    line=dict(color=COLORS['accent'], width=2, dash='dash')
-                ))
-                
-                fig_forecast.update_layout(
-                    title=f'{forecast_days}-Day Sales Forecast',
-                    xaxis_title='Date',
-                    yaxis_title='Sales ($)',
-                    height=500,
-                    hovermode='x unified'
-                )
+                def build_forecast_chart():
+                    fig_forecast = go.Figure()
+                    
+                    # Historical data
+                    fig_forecast.add_trace(go.Scatter(
+                        x=historical.dates,
+                        y=historical.values,
+                        name='Historical Sales',
+                        line=dict(color=COLORS['primary'], width=2)
+                    ))
+                    
+                    # Forecast
+                    fig_forecast.add_trace(go.Scatter(
+                        x=forecast_df['Date'],
+                        y=forecast_df['Predicted_Sales'],
+                        name='Forecasted Sales',
+                        line=dict(color=COLORS['accent'], width=2, dash='dash')
+                    ))
+                    
+                    return fig_forecast.update_layout(
+                        title=f'{forecast_days}-Day Sales Forecast',
+                        xaxis_title='Date',
+                        yaxis_title='Sales ($)',
+                        height=500,
+                        hovermode='x unified'
+                    )
                 
-                st.plotly_chart(fig_forecast, use_container_width=True)
+                plot_chart('forecast', build_forecast_chart,
+                           historical.dates, historical.values, forecast_df, forecast_days)
                 
                 # Model metrics
-                if 'metrics' in st.session_state:
-                    st.markdown("#### Model Performance Metrics")
-                    metrics = st.session_state['metrics']
-                    
-                    metric_col1, metric_col2, metric_col3 = st.columns(3)
-                    with metric_col1:
-                        st.metric("Test R² Score", f"{metrics['test_r2']:.4f}")
-                    with metric_col2:
-                        st.metric("Test MAE", format_currency(metrics['test_mae']))
-                    with metric_col3:
-                        st.metric("Test RMSE", format_currency(metrics['test_rmse']))
+                st.markdown("#### Model Performance Metrics")
+                metrics = result.metrics
+                
+                metric_col1, metric_col2, metric_col3 = st.columns(3)
+                with metric_col1:
+                    st.metric("Test R² Score", f"{metrics['test_r2']:.4f}")
+                with metric_col2:
+                    st.metric("Test MAE", format_currency(metrics['test_mae']))
+                with metric_col3:
+                    st.metric("Test RMSE", format_currency(metrics['test_rmse']))
                 
                 # Feature importance
-                if 'forecaster' in st.session_state:
-                    importance = st.session_state['forecaster'].get_feature_importance(top_n=10)
-                    if importance is not None:
-                        st.markdown("#### Top Feature Importance")
-                        fig_importance = px.bar(
-                            importance,
-                            x='Importance',
-                            y='Feature',
-                            orientation='h',
-                            title='Top 10 Most Important Features',
-                            color='Importance',
-                            color_continuous_scale='Viridis'
-                        )
-                        fig_importance.update_layout(height=400)
-                        st.plotly_chart(fig_importance, use_container_width=True)
+                importance = result.feature_importance(top_n=10)
+                if importance is not None:
+                    st.markdown("#### Top Feature Importance")
+                    plot_chart('feature_importance', lambda: px.bar(
+                        importance,
+                        x='Importance',
+                        y='Feature',
+                        orientation='h',
+                        title='Top 10 Most Important Features',
+                        color='Importance',
+                        color_continuous_scale='Viridis'
+                    ).update_layout(height=400), importance)
             else:
                 st.info("👈 Click 'Generate Forecast' to see predictions")
     
+    if profiling.is_enabled():
+        render_performance_panel(analyzer, pool, get_model_registry())
+    
     # Footer
     st.markdown("---")
     st.markdown("""
@@ -529,4 +937,5 @@ def main():
     """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
+    with profiling.timed_block('dashboard.rerun'):
+        main()
@@ -1,7 +1,10 @@
 import pandas as pd
 import numpy as np
+import json
 from datetime import datetime, timedelta
 import random
+import os
+import sys
 
 # Set random seed for reproducibility
 np.random.seed(42)
@@ -33,6 +36,10 @@ regions = {
 # Customer segments
 customer_segments = ['Premium', 'Regular', 'Budget']
 
+# Payment and shipping options
+payment_methods = ['Credit Card', 'PayPal', 'Debit Card', 'Bank Transfer']
+shipping_methods = ['Standard', 'Express', 'Premium']
+
 # Generate sales data
 records = []
 transaction_id = 1000
@@ -96,10 +103,10 @@ for date in date_range:
         total_price *= region_data['base_multiplier'] * seasonality_factor
         
         # Payment method
-        payment_method = random.choice(['Credit Card', 'PayPal', 'Debit Card', 'Bank Transfer'])
+        payment_method = random.choice(payment_methods)
         
         # Shipping method
-        shipping_method = random.choice(['Standard', 'Express', 'Premium'])
+        shipping_method = random.choice(shipping_methods)
         
         # Customer ID (returning customers)
         customer_id = f"CUST{random.randint(1, 5000):05d}"
@@ -134,8 +141,25 @@ df.loc[missing_indices, 'Customer_Segment'] = np.nan
 duplicate_rows = df.sample(n=50)
 df = pd.concat([df, duplicate_rows], ignore_index=True)
 
-# Save to CSV
-df.to_csv('/home/claude/Sales-Dashboard/data/sales_data.csv', index=False)
+# Save to CSV (next to this script unless a path is given)
+output_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sales_data.csv')
+df.to_csv(output_path, index=False)
+
+# Validation schema for this data (see analysis/validation.py): the values generated above, and
+# Total_Amount / (Unit_Price x Quantity) within the regional and seasonal multiplier (about 0.6-1.5)
+schema_path = os.path.splitext(output_path)[0] + '.schema.json'
+with open(schema_path, 'w') as f:
+    json.dump({
+        'allowed': {
+            'Customer_Segment': customer_segments,
+            'Category': list(products),
+            'Product': [product for names in products.values() for product in names],
+            'Region': list(regions),
+            'Payment_Method': payment_methods,
+            'Shipping_Method': shipping_methods
+        },
+        'amount_ratio_bounds': [0.5, 2.0]
+    }, f, indent=2)
 
 print(f"Generated {len(df)} sales records")
 print(f"\nDataset shape: {df.shape}")
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Make the analysis package importable when pytest runs from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['Electronics', 'Clothing', 'Books', 'Sports']
+REGIONS = ['North America', 'Europe', 'Asia']
+
+
+def sales_frame(n=3000, seed=7, first_id=1000, start='2023-01-01', end='2023-12-31'):
+    """Generated transactions in the sample dataset's layout"""
+    rng = np.random.default_rng(seed)
+    quantity = rng.integers(1, 5, n)
+    unit_price = rng.uniform(10, 500, n).round(2)
+    return pd.DataFrame({
+        'Transaction_ID': [f"TXN{i:06d}" for i in range(first_id, first_id + n)],
+        'Date': np.sort(rng.choice(pd.date_range(start, end), n)),
+        'Customer_ID': [f"CUST{c:05d}" for c in rng.integers(1, 400, n)],
+        'Customer_Segment': rng.choice(['Premium', 'Regular', 'Budget'], n),
+        'Product': rng.choice(['Laptop', 'Jeans', 'Cookbook', 'Yoga Mat', 'Tablet'], n),
+        'Category': rng.choice(CATEGORIES, n),
+        'Quantity': quantity,
+        'Unit_Price': unit_price,
+        'Discount_Percent': rng.choice([0, 0, 0, 10, 20], n),
+        'Total_Amount': (unit_price * quantity).round(2),
+        'Region': rng.choice(REGIONS, n),
+        'Payment_Method': rng.choice(['Credit Card', 'PayPal'], n),
+        'Shipping_Method': rng.choice(['Standard', 'Express'], n)
+    })
+
+
+@pytest.fixture(scope='session')
+def sales_csv(tmp_path_factory):
+    """A small generated sales CSV with a missing segment and a duplicate row"""
+    df = sales_frame()
+    df.loc[5, 'Customer_Segment'] = np.nan
+    df = pd.concat([df, df.iloc[[10]]], ignore_index=True)
+    path = tmp_path_factory.mktemp('data') / 'sales.csv'
+    df.to_csv(path, index=False)
+    return path
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+from itertools import combinations
+
+import pytest
+
+from analysis.affinity import ProductAffinity
+from analysis.eda import SalesAnalyzer
+
+
+@pytest.fixture(scope='module')
+def analyzer(sales_csv):
+    return SalesAnalyzer(str(sales_csv), compact=True)
+
+
+def brute_force_pairs(df):
+    """Customers per unordered product pair by a self-join over customer baskets"""
+    baskets = df.groupby('Customer_ID', observed=True)['Product'].apply(lambda p: sorted(set(map(str, p))))
+    counts = {}
+    for basket in baskets:
+        for pair in combinations(basket, 2):
+            counts[pair] = counts.get(pair, 0) + 1
+    return counts
+
+
+def test_pairs_match_brute_force(analyzer):
+    df = analyzer.filtered(regions=['Asia']).df
+    affinity = ProductAffinity.from_transactions(df)
+    pairs = affinity.pairs(min_customers=1)
+    result = {tuple(sorted([str(a), str(b)])): n
+              for a, b, n in zip(pairs['Product_A'], pairs['Product_B'], pairs['Customers'])}
+    assert result == brute_force_pairs(df)
+
+    n_customers = df['Customer_ID'].nunique()
+    support = df.groupby('Product', observed=True)['Customer_ID'].nunique()
+    row = pairs.iloc[0]
+    expected_lift = row['Customers'] * n_customers / (support[row['Product_A']] * support[row['Product_B']])
+    assert row['Lift'] == pytest.approx(expected_lift)
+    assert row['Confidence'] == pytest.approx(row['Customers'] / support[row['Product_A']])
+
+
+def test_also_bought_and_unknown_product(analyzer):
+    affinity = analyzer.product_affinity()
+    also = affinity.also_bought('Laptop')
+    assert 'Laptop' not in set(also['Product'])
+    pairs = affinity.pairs(min_customers=1)
+    with_laptop = pairs[(pairs['Product_A'] == 'Laptop') | (pairs['Product_B'] == 'Laptop')]
+    assert also['Customers'].sum() == with_laptop['Customers'].sum()
+    assert affinity.also_bought('Unknown').empty
+
+
+def test_results_are_cached_per_filters(analyzer):
+    view = analyzer.filtered(categories=['Books'])
+    assert view.product_affinity() is analyzer.filtered(categories=['Books']).product_affinity()
+    assert view.product_affinity() is not analyzer.product_affinity()
+
+
+def test_loading_an_analyzer_does_not_import_scipy(sales_csv):
+    code = (f"from analysis.eda import SalesAnalyzer; import sys; "
+            f"a = SalesAnalyzer({str(sales_csv)!r}, compact=True); a.sales_by_category(); "
+            f"print('scipy' in sys.modules)")
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=repo).stdout
+    assert output.strip().endswith('False')
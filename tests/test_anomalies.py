@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.anomalies import AnomalyDetector, robust_baseline, rolling_scores, series_matrix
+from conftest import sales_frame
+
+
+@pytest.fixture(scope='module')
+def df():
+    return sales_frame(3000, seed=5)
+
+
+def test_series_matrix_sums_each_series_day(df):
+    matrix, labels, dates = series_matrix(df)
+    expected = df.groupby(['Category', 'Region', 'Product', pd.to_datetime(df['Date']).dt.normalize()])['Total_Amount'].sum()
+    assert matrix.sum() == pytest.approx(df['Total_Amount'].sum())
+    assert len(dates) == (dates[-1] - dates[0]).days + 1
+    for (category, region, product, date), total in expected.iloc[::97].items():
+        row = labels.index[(labels['Category'] == category) & (labels['Region'] == region)
+                           & (labels['Product'] == product)][0]
+        assert matrix[row, dates.get_loc(date)] == pytest.approx(total)
+
+
+def test_rolling_scores_match_a_day_by_day_loop():
+    rng = np.random.default_rng(0)
+    # Mostly empty series exercise the mean-deviation fallback
+    matrix = rng.poisson(2, (5, 60)) * rng.uniform(0, 100, (5, 60)) * (rng.random((5, 60)) < 0.4)
+    baseline, scale, z = rolling_scores(matrix, window=7)
+    assert np.isnan(z[:, :7]).all()
+    for day in range(7, 60):
+        median, expected_scale = robust_baseline(matrix[:, day - 7:day])
+        np.testing.assert_allclose(baseline[:, day], median)
+        np.testing.assert_allclose(scale[:, day], expected_scale)
+    np.testing.assert_allclose(z[:, 7:], (matrix[:, 7:] - baseline[:, 7:]) / scale[:, 7:])
+    assert (scale[:, 7:] >= 1.0).all()
+
+
+def test_injected_spike_is_ranked_first(df):
+    spiked = df.copy()
+    spiked.loc[spiked.index[1500], 'Total_Amount'] = 1e7
+    result = AnomalyDetector(window=14).fit(spiked).anomalies(top=5)
+    row = spiked.iloc[1500]
+    assert result.iloc[0]['Date'] == pd.Timestamp(row['Date']).normalize()
+    assert result.iloc[0]['Product'] == row['Product'] and result.iloc[0]['Direction'] == 'Spike'
+
+
+def test_extend_equals_refit(df):
+    dates = pd.to_datetime(df['Date'])
+    cut = pd.Timestamp('2023-09-30')
+    later = df[dates > cut]
+    # A gap with no sales is appended as zero days
+    later = later[~pd.to_datetime(later['Date']).between('2023-10-10', '2023-10-12')]
+    detector = AnomalyDetector(window=14).fit(df[dates <= cut])
+    assert detector.extend(later)
+    refit = AnomalyDetector(window=14).fit(pd.concat([df[dates <= cut], later]))
+    # Series first seen after the cut are appended at the end; compare by label
+    order = [detector._index[tuple(row)] for row in refit.labels.itertuples(index=False)]
+    np.testing.assert_array_equal(detector.dates, refit.dates)
+    np.testing.assert_allclose(detector.matrix[order], refit.matrix)
+    np.testing.assert_allclose(detector.z[order], refit.z, equal_nan=True)
+    assert len(detector.anomalies(top=None)) == len(refit.anomalies(top=None))
+
+
+def test_late_rows_need_a_refit(df):
+    detector = AnomalyDetector(window=14).fit(df)
+    z = detector.z.copy()
+    assert not detector.extend(df.iloc[:10])
+    np.testing.assert_array_equal(detector.z, z)
+    assert detector.extend(df.iloc[:0])
+
+
+def test_append_day_checks_dates(df):
+    detector = AnomalyDetector(window=14).fit(df)
+    last, n_days = detector.dates[-1], len(detector.dates)
+    # Without a date an empty day cannot be placed, so nothing is appended
+    assert detector.append_day(df.iloc[:0]).empty
+    assert len(detector.dates) == n_days
+    with pytest.raises(ValueError):
+        detector.append_day(df.iloc[:0], date=last + pd.Timedelta(days=2))
+    detector.append_day(df.iloc[:0], date=last + pd.Timedelta(days=1))
+    assert detector.dates[-1] == last + pd.Timedelta(days=1)
+    assert (detector.matrix[:, -1] == 0).all()
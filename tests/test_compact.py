@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.eda import SalesAnalyzer
+from conftest import sales_frame
+
+
+@pytest.fixture(scope='module')
+def analyzers(sales_csv):
+    return SalesAnalyzer(str(sales_csv)), SalesAnalyzer(str(sales_csv), compact=True)
+
+
+def test_compact_frame_is_smaller_with_the_same_values(analyzers):
+    standard, compact = analyzers
+    assert compact.memory_report()['total_bytes'] < standard.memory_report()['total_bytes'] / 2
+    assert compact.df['Quantity'].dtype == np.uint8
+    assert isinstance(compact.df['Category'].dtype, pd.CategoricalDtype)
+    for col in ['Quantity', 'Discount_Percent', 'Total_Amount', 'Year', 'Month', 'Week']:
+        np.testing.assert_array_equal(compact.df[col].to_numpy(np.float64), standard.df[col].to_numpy(np.float64))
+
+
+def test_virtual_profit_matches_stored_profit(analyzers):
+    standard, compact = analyzers
+    assert 'Profit' not in compact.df.columns
+    np.testing.assert_allclose(compact.get_profit(), standard.df['Profit'])
+    np.testing.assert_allclose(compact.sales_by_category()['Profit'], standard.sales_by_category()['Profit'])
+    assert compact.get_summary_stats() == pytest.approx(standard.get_summary_stats())
+
+
+def test_fractional_discounts_are_not_truncated(tmp_path):
+    df = sales_frame(200)
+    df['Discount_Percent'] = np.where(np.arange(200) % 4 == 0, 12.5, df['Discount_Percent'])
+    df.to_csv(tmp_path / 'sales.csv', index=False)
+    compact = SalesAnalyzer(str(tmp_path / 'sales.csv'), compact=True)
+    standard = SalesAnalyzer(str(tmp_path / 'sales.csv'))
+    assert compact.df['Discount_Percent'].dtype == np.float32
+    np.testing.assert_array_equal(compact.df['Discount_Percent'], standard.df['Discount_Percent'])
+    assert compact.customer_segment_analysis()['Discount_Percent'].tolist() == pytest.approx(
+        standard.customer_segment_analysis()['Discount_Percent'].tolist())
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.customers import SEGMENT_GRID, _quintile_scores, rfm_table, segment_summary, top_customers
+from analysis.eda import SalesAnalyzer
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['standard', 'compact'])
+def analyzer(request, sales_csv):
+    return SalesAnalyzer(str(sales_csv), compact=request.param)
+
+
+def test_aggregates_match_groupby(analyzer):
+    df = analyzer.filtered(regions=['Asia']).df
+    rfm = analyzer.filtered(regions=['Asia']).customer_rfm().set_index('Customer_ID')
+    rfm.index = rfm.index.astype(str)
+    grouped = df.groupby(df['Customer_ID'].astype(str)).agg(
+        Last_Purchase=('Date', 'max'), Frequency=('Transaction_ID', 'count'), Monetary=('Total_Amount', 'sum'))
+    assert set(rfm.index) == set(grouped.index)
+    grouped = grouped.loc[rfm.index]
+    assert (rfm['Last_Purchase'] == grouped['Last_Purchase']).all()
+    assert (rfm['Frequency'] == grouped['Frequency']).all()
+    np.testing.assert_allclose(rfm['Monetary'], grouped['Monetary'])
+    assert (rfm['Recency'] == (df['Date'].max() + pd.Timedelta(days=1) - grouped['Last_Purchase']).dt.days).all()
+
+
+def test_scores_and_segments(analyzer):
+    rfm = analyzer.customer_rfm(reference_date='2024-01-01')
+    for col in ['R_Score', 'F_Score', 'M_Score']:
+        assert rfm[col].between(1, 5).all()
+    scores = rfm[['R_Score', 'F_Score', 'M_Score']].astype(int)
+    assert (rfm['RFM_Score'] == scores['R_Score'] * 100 + scores['F_Score'] * 10 + scores['M_Score']).all()
+    expected = [SEGMENT_GRID[r - 1][f - 1] for r, f in zip(rfm['R_Score'], rfm['F_Score'])]
+    assert rfm['Segment'].astype(str).tolist() == expected
+    # Most recent buyers score highest on recency
+    assert rfm.loc[rfm['Recency'].idxmin(), 'R_Score'] == 5
+    summary = segment_summary(rfm)
+    assert summary['Customers'].sum() == len(rfm)
+
+
+def test_quintile_scores_are_balanced():
+    scores = _quintile_scores(np.arange(1000.0))
+    assert np.bincount(scores)[1:].tolist() == [200] * 5
+    assert _quintile_scores(np.full(10, 3.0)).tolist() == [5] * 10
+
+
+def test_top_customers_match_sort(analyzer):
+    rfm = analyzer.customer_rfm()
+    expected = rfm.sort_values('Monetary', ascending=False, kind='stable').head(10)
+    assert top_customers(rfm, 10)['Monetary'].tolist() == expected['Monetary'].tolist()
+    assert top_customers(rfm, 5, by='Recency', ascending=True)['Recency'].tolist() == \
+        sorted(rfm['Recency'])[:5]
+
+
+def test_empty_view():
+    empty = pd.DataFrame({'Customer_ID': pd.Series(dtype=object), 'Date': pd.Series(dtype='datetime64[ns]'),
+                          'Total_Amount': pd.Series(dtype=float)})
+    assert rfm_table(empty).empty
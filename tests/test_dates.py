@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.dates import add_date_features, build_date_dimension, date_features, date_keys, lookup
+
+
+@pytest.fixture
+def dates():
+    rng = np.random.default_rng(1)
+    return pd.Series(rng.choice(pd.date_range('2023-12-20', '2025-01-10'), 500))
+
+
+def test_features_match_pandas_accessors(dates):
+    df, dimension = add_date_features(pd.DataFrame({'Date': dates}), categorical=False)
+    assert (df['Year'] == dates.dt.year).all()
+    assert (df['Month'] == dates.dt.month).all()
+    assert (df['Quarter'] == dates.dt.quarter).all()
+    assert (df['Week'] == dates.dt.isocalendar().week.astype(int)).all()
+    assert (df['Month_Name'] == dates.dt.month_name()).all()
+    assert (df['Day_of_Week'] == dates.dt.day_name()).all()
+    assert len(dimension) == (dates.max() - dates.min()).days + 1
+
+
+def test_categorical_features_keep_calendar_order(dates):
+    df, _ = add_date_features(pd.DataFrame({'Date': dates}))
+    assert list(df['Month_Name'].cat.categories[:2]) == ['January', 'February']
+    assert df['Day_of_Week'].cat.ordered
+
+
+def test_model_features_match_pandas():
+    future = pd.date_range('2024-02-27', periods=10)
+    features = date_features(future)
+    assert features['IsMonthEnd'].tolist() == future.is_month_end.astype(int).tolist()
+    assert features['IsWeekend'].tolist() == (future.dayofweek >= 5).astype(int).tolist()
+    assert features['DayOfYear'].tolist() == future.dayofyear.tolist()
+
+
+def test_keys_outside_the_dimension_are_rejected():
+    dimension = build_date_dimension('2024-01-01', '2024-01-31')
+    with pytest.raises(ValueError):
+        lookup(dimension, date_keys(['2024-02-01']), ['Year'])
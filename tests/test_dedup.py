@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from analysis.eda import (SalesAnalyzer, deduplicate_transactions, format_transaction_ids, is_deduplicated,
+                          load_transactions, parse_transaction_ids)
+from conftest import sales_frame
+
+
+def test_parse_and_format_round_trip():
+    ids = pd.Series(['TXN001000', 'TXN001001', 'TXN999999'])
+    parsed = parse_transaction_ids(ids)
+    assert parsed.tolist() == [1000, 1001, 999999]
+    assert format_transaction_ids(parsed, 'TXN', 6).tolist() == ids.tolist()
+
+
+@pytest.mark.parametrize('ids', [
+    ['TXN001', 'ORD002'],
+    ['TXN001', 'TXN01'],
+    ['TXN00A', 'TXN001'],
+    ['TXN', 'TXN'],
+], ids=['mixed prefixes', 'mixed widths', 'non-digit', 'no digits'])
+def test_ids_that_cannot_be_parsed(ids):
+    assert parse_transaction_ids(pd.Series(ids)) is None
+
+
+def test_repeated_keys_are_dropped_once():
+    df = sales_frame(50)
+    df = pd.concat([df, df.iloc[[3, 7, 7]]], ignore_index=True)
+    deduped = deduplicate_transactions(df)
+    assert len(deduped) == 50
+    assert deduped['Transaction_ID'].is_unique
+    assert is_deduplicated(deduped)
+    assert deduped.attrs == {'deduplicated_on': 'Transaction_ID', 'duplicates_removed': 3}
+
+
+def test_verify_rejects_conflicting_rows():
+    df = sales_frame(20)
+    conflict = df.iloc[[4]].assign(Total_Amount=1.0)
+    with pytest.raises(ValueError, match='TXN001004'):
+        deduplicate_transactions(pd.concat([df, conflict], ignore_index=True), verify=True)
+    # Exact repeats pass verification
+    assert len(deduplicate_transactions(pd.concat([df, df.iloc[[4]]]), verify=True)) == 20
+
+
+def test_without_a_key_whole_rows_are_compared():
+    df = sales_frame(20).drop(columns='Transaction_ID')
+    deduped = deduplicate_transactions(pd.concat([df, df.iloc[[0]]], ignore_index=True))
+    assert len(deduped) == 20 and deduped.attrs['deduplicated_on'] == 'all_columns'
+
+
+def test_analyzer_deduplicates_at_ingestion_only(sales_csv):
+    df = load_transactions(str(sales_csv))
+    assert df.attrs['duplicates_removed'] == 1
+    analyzer = SalesAnalyzer(str(sales_csv), compact=True)
+    assert analyzer.dedup_info == {'key': 'Transaction_ID', 'removed': 1}
+    assert analyzer.df['Transaction_ID'].is_unique
+    exported = pd.concat(analyzer.iter_chunks(['Transaction_ID']))
+    assert exported['Transaction_ID'].iloc[0] == 'TXN001000'
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from analysis.eda import SalesAnalyzer
+from analysis.export import EXPORT_COLUMNS, ExportCache, export_key, write_export
+
+
+@pytest.fixture(scope='module')
+def analyzer(sales_csv):
+    return SalesAnalyzer(str(sales_csv), compact=True)
+
+
+def test_export_key_ignores_filter_order_and_empty_filters():
+    key = export_key('v1', {'categories': ['Books', 'Sports'], 'regions': None}, 'csv')
+    assert key == export_key('v1', {'categories': ('Sports', 'Books')}, 'csv')
+    assert key != export_key('v2', {'categories': ['Books', 'Sports']}, 'csv')
+    assert key != export_key('v1', {'categories': ['Books', 'Sports']}, 'parquet')
+    assert key != export_key('v1', {'categories': ['Books']}, 'csv')
+
+
+def test_chunked_csv_matches_the_source_rows(analyzer, sales_csv, tmp_path):
+    view = analyzer.filtered(categories=['Books'])
+    path = write_export(view.iter_chunks(chunk_rows=100), str(tmp_path / 'books.csv'), 'csv')
+    # Rows of one day are not kept in file order, so compare by transaction
+    exported = pd.read_csv(path)
+    source = pd.read_csv(sales_csv).drop_duplicates()
+    expected = source[source['Category'] == 'Books']
+    assert list(exported.columns) == EXPORT_COLUMNS
+    # Transaction IDs are written back in their original form
+    pd.testing.assert_frame_equal(exported.sort_values('Transaction_ID', ignore_index=True),
+                                  expected.sort_values('Transaction_ID', ignore_index=True))
+    assert os.listdir(tmp_path) == ['books.csv']
+
+
+def test_parquet_export(analyzer, tmp_path):
+    pytest.importorskip('pyarrow')
+    path = write_export(analyzer.iter_chunks(chunk_rows=700), str(tmp_path / 'all.parquet'), 'parquet')
+    exported = pd.read_parquet(path)
+    assert len(exported) == len(analyzer.df)
+    assert exported['Total_Amount'].sum() == pytest.approx(analyzer.df['Total_Amount'].sum())
+
+
+def test_identical_exports_are_written_once(analyzer, tmp_path):
+    cache = ExportCache(str(tmp_path))
+    key = export_key(analyzer.data_version, analyzer.filters, 'csv')
+    calls = []
+
+    def chunks():
+        calls.append(1)
+        time.sleep(0.05)
+        return analyzer.iter_chunks()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_create(key, 'csv', chunks)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(reused for _, reused in results) == [False, True, True, True]
+    assert cache.hits == 3 and cache.misses == 1
+    f, size = cache.open(key, 'csv')
+    with f:
+        assert size == os.path.getsize(cache.path(key, 'csv')) and f.read(14) == b'Transaction_ID'
+    assert cache.open('missing', 'csv') == (None, 0)
+
+
+def test_least_recently_used_exports_are_evicted_over_the_cap(analyzer, tmp_path):
+    views = [analyzer.filtered(categories=[category]) for category in ['Books', 'Sports', 'Clothing']]
+    keys = [export_key(view.data_version, view.filters, 'csv') for view in views]
+    size = max(len(pd.concat(view.iter_chunks()).to_csv(index=False)) for view in views)
+    cache = ExportCache(str(tmp_path), max_bytes=int(2.5 * size))
+    for i, (key, view) in enumerate(zip(keys[:2], views)):
+        cache.get_or_create(key, 'csv', view.iter_chunks)
+        os.utime(cache.path(key, 'csv'), (i, i))
+    # Reading the first export makes the second the least recently used
+    f, _ = cache.open(keys[0], 'csv')
+    cache.get_or_create(keys[2], 'csv', views[2].iter_chunks)
+    assert cache.get(keys[1], 'csv') is None
+    assert cache.get(keys[0], 'csv') is not None and cache.get(keys[2], 'csv') is not None
+    # A new export is kept even when it alone exceeds the cap
+    tiny = ExportCache(str(tmp_path / 'tiny'), max_bytes=1)
+    path, _ = tiny.get_or_create(keys[0], 'csv', views[0].iter_chunks)
+    assert os.path.exists(path)
+    with f:
+        assert f.read(14) == b'Transaction_ID'
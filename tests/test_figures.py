@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from analysis.figures import FigureCache, figure_key
+
+
+def bar(frame):
+    return lambda: px.bar(frame, x='Category', y='Total_Amount')
+
+
+def test_figure_key_follows_content_not_identity():
+    frame = pd.DataFrame({'Category': ['Books', 'Sports'], 'Total_Amount': [10.0, 20.0]})
+    key = figure_key('by_category', frame, {'log': False})
+    assert key == figure_key('by_category', frame.copy(), {'log': False})
+    assert key != figure_key('by_region', frame, {'log': False})
+    assert key != figure_key('by_category', frame, {'log': True})
+    assert key != figure_key('by_category', frame.assign(Total_Amount=[10.0, 21.0]), {'log': False})
+    assert key != figure_key('by_category', frame.astype({'Total_Amount': 'float32'}), {'log': False})
+    assert key != figure_key('by_category', frame.set_axis([5, 6]), {'log': False})
+    # Parts are separated, so moving a value between them changes the key
+    assert figure_key('x', 'ab', 'c') != figure_key('x', 'a', 'bc')
+    assert figure_key('x', np.arange(3)) != figure_key('x', pd.Series(np.arange(3)))
+
+
+def test_hits_return_the_built_figure():
+    cache = FigureCache()
+    frame = pd.DataFrame({'Category': ['Books', 'Sports'], 'Total_Amount': [10.0, 20.0]})
+    key = figure_key('by_category', frame)
+    figure = cache.get_or_build(key, bar(frame))
+    assert cache.get_or_build(key, lambda: 1 / 0) is figure
+    assert cache.hits == 1 and cache.misses == 1
+    assert cache.total_bytes == len(figure.to_json()) and len(cache) == 1
+
+
+def test_least_recently_used_figures_are_evicted():
+    frames = [pd.DataFrame({'Category': ['Books', 'Sports'], 'Total_Amount': [float(i), 20.0]}) for i in range(3)]
+    keys = [figure_key('by_category', frame) for frame in frames]
+    size = len(bar(frames[0])().to_json())
+    cache = FigureCache(max_bytes=int(2.5 * size))
+    cache.get_or_build(keys[0], bar(frames[0]))
+    cache.get_or_build(keys[1], bar(frames[1]))
+    cache.get_or_build(keys[0], bar(frames[0]))
+    cache.get_or_build(keys[2], bar(frames[2]))
+    assert cache.evictions == 1 and len(cache) == 2
+    assert cache.total_bytes <= cache.max_bytes
+    cache.get_or_build(keys[0], bar(frames[0]))
+    assert cache.hits == 2
+    cache.clear()
+    assert len(cache) == 0 and cache.total_bytes == 0
+
+
+def test_first_builds_from_several_threads():
+    cache = FigureCache()
+    frame = pd.DataFrame({'Category': ['Books', 'Sports'], 'Total_Amount': [10.0, 20.0]})
+    results, errors = [], []
+
+    def build(i):
+        try:
+            results.append(cache.get_or_build(figure_key('by_category', frame, i % 2), bar(frame)))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=build, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors and len(results) == 6
+    assert len(cache) == 2
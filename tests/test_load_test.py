@@ -0,0 +1,42 @@
+import random
+import shutil
+
+import numpy as np
+import pytest
+from streamlit.runtime import Runtime
+
+from benchmarks.load_test import ACTIONS, ACTION_WEIGHTS, install_runtime, percentiles, run_level, session_script
+
+
+def test_every_weighted_action_has_a_handler():
+    assert set(ACTION_WEIGHTS) == set(ACTIONS)
+    assert sum(ACTION_WEIGHTS.values()) == pytest.approx(1.0)
+
+
+def test_session_scripts_are_reproducible():
+    first = session_script(random.Random(3), 50)
+    assert first == session_script(random.Random(3), 50)
+    assert set(first) <= set(ACTION_WEIGHTS)
+
+
+def test_percentiles_skip_failed_reruns():
+    result = percentiles([10.0, np.nan, 30.0, 20.0])
+    assert result['p50_ms'] == 20.0 and result['max_ms'] == 30.0
+    assert np.isnan(percentiles([np.nan])['p95_ms'])
+
+
+@pytest.fixture
+def runtime(sales_csv, tmp_path, monkeypatch):
+    data_path = tmp_path / 'sales.csv'
+    shutil.copy(sales_csv, data_path)
+    monkeypatch.setenv('SALES_DATA_PATH', str(data_path))
+    monkeypatch.setenv('SALES_EXPORT_DIR', str(tmp_path / 'exports'))
+    yield install_runtime()
+    Runtime._instance = None
+
+
+def test_concurrent_sessions_rerun_without_errors(runtime):
+    summary, records = run_level(2, 3, seed=1, timeout=120)
+    assert summary['errors'] == 0, records['error'].dropna().tolist()
+    assert summary['reruns'] == len(records) == 2 * 4
+    assert set(records['action']) >= {'open'}
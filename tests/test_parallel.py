@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+from analysis.eda import SalesAnalyzer
+
+BREAKDOWNS = ['sales_by_category', 'sales_by_region', 'top_products',
+              'customer_segment_analysis', 'payment_method_analysis', 'seasonal_analysis']
+
+FILTERS = [
+    {},
+    {'categories': ['Books'], 'regions': ['Asia']},
+    {'start_date': '2023-03-01', 'end_date': '2023-09-30', 'categories': ['Books', 'Sports']},
+]
+
+
+def assert_same_results(parallel, serial):
+    for method in BREAKDOWNS:
+        expected = getattr(serial, method)().reset_index(drop=True)
+        result = getattr(parallel, method)().reset_index(drop=True)
+        for col in expected.columns:
+            if isinstance(expected[col].dtype, pd.CategoricalDtype):
+                expected[col] = expected[col].astype(str)
+                result[col] = result[col].astype(str)
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False, obj=method)
+    assert parallel.unique_customers() == serial.unique_customers()
+
+
+@pytest.fixture(params=[False, True], ids=['standard', 'compact'])
+def analyzers(request, sales_csv):
+    serial = SalesAnalyzer(str(sales_csv), compact=request.param)
+    parallel = SalesAnalyzer(str(sales_csv), compact=request.param, workers=2)
+    yield parallel, serial
+    parallel.close()
+
+
+@pytest.mark.parametrize('filters', FILTERS, ids=['unfiltered', 'category + region', 'dates + categories'])
+def test_filtered_view_of_cold_analyzer_matches_serial(analyzers, filters):
+    parallel, serial = analyzers
+    # No aggregation has run on the parallel analyzer before the view is taken
+    view = parallel.filtered(**filters)
+    assert view.parallel is parallel.parallel
+    assert_same_results(view, serial.filtered(**filters))
+
+
+def test_chained_views_share_one_aggregator(analyzers):
+    parallel, serial = analyzers
+    assert_same_results(parallel, serial)
+    view = parallel.filtered(categories=['Books', 'Sports']).filtered(regions=['Asia'])
+    assert view.parallel is parallel.parallel
+    assert_same_results(view, serial.filtered(categories=['Books', 'Sports']).filtered(regions=['Asia']))
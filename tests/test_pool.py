@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from analysis.eda import SalesAnalyzer
+from analysis.pool import AnalyzerPool, estimate_bytes
+
+
+class FakeAnalyzer:
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_concurrent_first_gets_share_one_load():
+    calls = []
+
+    def loader(path):
+        calls.append(path)
+        time.sleep(0.2)
+        return FakeAnalyzer(path)
+
+    pool = AnalyzerPool({'a': 'a.csv'}, loader, size_of=lambda analyzer: 0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get('a'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ['a.csv']
+    assert len(results) == 8 and all(result is results[0] for result in results)
+    assert pool.get('a') is results[0]
+    assert (pool.loads, pool.hits) == (1, 1)
+
+
+def test_failed_load_is_retried():
+    attempts = []
+
+    def loader(path):
+        attempts.append(path)
+        if len(attempts) == 1:
+            raise OSError("unreadable")
+        return FakeAnalyzer(path)
+
+    pool = AnalyzerPool({'a': 'a.csv'}, loader, size_of=lambda analyzer: 0)
+    with pytest.raises(OSError):
+        pool.get('a')
+    assert not pool.is_loaded('a')
+    assert pool.get('a').path == 'a.csv'
+
+
+def test_least_recently_used_dataset_is_evicted_and_closed():
+    datasets = {name: f"{name}.csv" for name in 'abc'}
+    pool = AnalyzerPool(datasets, FakeAnalyzer, budget_bytes=250, size_of=lambda analyzer: 100)
+    a, b = pool.get('a'), pool.get('b')
+    pool.get('a')
+    c = pool.get('c')
+    assert [pool.is_loaded(name) for name in 'abc'] == [True, False, True]
+    assert b.closed and not a.closed and not c.closed
+    assert pool.evictions == 1 and pool.total_bytes == 200
+
+    assert pool.evict('a') and a.closed
+    assert not pool.evict('a')
+
+
+def test_oversized_dataset_is_kept_alone():
+    pool = AnalyzerPool({'a': 'a', 'b': 'b'}, FakeAnalyzer, budget_bytes=50, size_of=lambda analyzer: 100)
+    a = pool.get('a')
+    pool.get('b')
+    assert a.closed and pool.is_loaded('b') and not pool.is_loaded('a')
+
+
+def test_sizes_are_re_estimated_before_eviction():
+    sizes = {'a': 100, 'b': 100}
+    pool = AnalyzerPool({'a': 'a', 'b': 'b'}, FakeAnalyzer, budget_bytes=250,
+                        size_of=lambda analyzer: sizes[analyzer.path])
+    a = pool.get('a')
+    # Grown since it was loaded, e.g. by sketches or shared-memory columns
+    sizes['a'] = 200
+    pool.get('b')
+    assert a.closed and not pool.is_loaded('a')
+
+
+def test_eviction_releases_parallel_aggregator(sales_csv):
+    pool = AnalyzerPool({'a': str(sales_csv), 'b': str(sales_csv)},
+                        lambda path: SalesAnalyzer(path, compact=True, workers=2), budget_bytes=1)
+    analyzer = pool.get('a')
+    expected = analyzer.sales_by_category()
+    view = analyzer.filtered(categories=['Books'])
+    expected_view = view.sales_by_category()
+    aggregator = analyzer.parallel
+    before = estimate_bytes(analyzer)
+    assert aggregator.nbytes > 0
+    assert before - aggregator.nbytes == estimate_bytes(SalesAnalyzer(str(sales_csv), compact=True))
+
+    pool.get('b')
+    assert aggregator.closed and aggregator.nbytes == 0 and analyzer.parallel is None
+    # A session still holding the evicted analyzer keeps getting answers, computed serially
+    pd.testing.assert_frame_equal(analyzer.sales_by_category(), expected, check_dtype=False)
+    assert analyzer.parallel is None
+    pd.testing.assert_frame_equal(view.sales_by_category(), expected_view, check_dtype=False)
+    assert view.unique_customers() == view.df['Customer_ID'].nunique()
+    assert aggregator.nbytes == 0
+    pool.get('b').close()
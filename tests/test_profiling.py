@@ -0,0 +1,77 @@
+import os
+import re
+import threading
+from collections import deque
+
+import pandas as pd
+import pytest
+
+from analysis import profiling
+
+
+@pytest.fixture(autouse=True)
+def recording():
+    profiling.reset()
+    profiling.enable()
+    yield
+    profiling.disable()
+    profiling.reset()
+
+
+@profiling.timed('test.frame')
+def make_frame(n):
+    return pd.DataFrame({'x': range(n)})
+
+
+def counter(text, name, stage):
+    return float(re.search(rf'^{name}{{stage="{stage}"}} (\S+)$', text, re.M).group(1))
+
+
+def test_timed_records_calls_and_rows():
+    make_frame(3)
+    with profiling.timed_block('test.block', rows=7):
+        pass
+    records = profiling.get_records()
+    assert list(records['stage']) == ['test.frame', 'test.block']
+    assert list(records['rows']) == [3, 7]
+    stats = profiling.summary().set_index('stage')
+    assert stats.loc['test.frame', 'calls'] == 1
+
+
+def test_disabled_records_nothing():
+    profiling.disable()
+    make_frame(3)
+    assert profiling.get_records().empty and profiling.totals() == {}
+
+
+def test_counters_keep_growing_after_records_roll_off(monkeypatch):
+    monkeypatch.setattr(profiling, '_records', deque(maxlen=3))
+    for _ in range(10):
+        make_frame(1)
+    assert len(profiling.get_records()) == 3
+    text = profiling.to_prometheus()
+    assert counter(text, 'sales_stage_calls_total', 'test.frame') == 10
+    assert counter(text, 'sales_stage_seconds_total', 'test.frame') >= profiling.get_records()['wall_ms'].sum() / 1000
+
+
+def test_concurrent_writes_leave_one_complete_file(tmp_path):
+    make_frame(1)
+    path = str(tmp_path / 'metrics.prom')
+    errors = []
+
+    def write():
+        try:
+            for _ in range(50):
+                profiling.write_metrics(path)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ['metrics.prom']
+    with open(path) as f:
+        assert f.read() == profiling.to_prometheus()
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from analysis.eda import SalesAnalyzer
+from analysis.model import SalesForecastModel
+from analysis.registry import ModelRegistry, model_key
+
+
+class FakeForecaster:
+    def __init__(self, model_type='random_forest', nbytes=100):
+        self.model_type = model_type
+        self.nbytes = nbytes
+        self.released = False
+
+    def release_data(self):
+        self.released = True
+        return self
+
+
+def test_model_key_covers_data_filters_type_and_params():
+    key = model_key('v1', {'regions': ['Asia']}, 'random_forest', {'max_depth': 5, 'n_estimators': 50})
+    assert key == model_key('v1', {'regions': ['Asia']}, 'random_forest', {'n_estimators': 50, 'max_depth': 5})
+    assert len({
+        key,
+        model_key('v2', {'regions': ['Asia']}, 'random_forest', {'max_depth': 5, 'n_estimators': 50}),
+        model_key('v1', {}, 'random_forest', {'max_depth': 5, 'n_estimators': 50}),
+        model_key('v1', {'regions': ['Asia']}, 'gradient_boosting', {'max_depth': 5, 'n_estimators': 50}),
+        model_key('v1', {'regions': ['Asia']}, 'random_forest', {'max_depth': 6, 'n_estimators': 50}),
+        model_key('v1', {'regions': ['Asia']}, 'random_forest'),
+    }) == 6
+
+
+def test_concurrent_requests_train_once():
+    registry = ModelRegistry()
+    calls = []
+
+    def train():
+        calls.append(1)
+        time.sleep(0.05)
+        return FakeForecaster()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_or_train('k', train)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    forecasters = {id(forecaster) for forecaster, _ in results}
+    assert len(forecasters) == 1 and results[0][0].released
+    assert sorted(trained for _, trained in results) == [False, False, False, True]
+    assert registry.trained == 1 and registry.hits == 3
+
+
+def test_least_recently_used_models_are_evicted():
+    registry = ModelRegistry(budget_bytes=250)
+    for key in ['a', 'b']:
+        registry.get_or_train(key, FakeForecaster)
+    registry.get('a')
+    registry.get_or_train('c', lambda: FakeForecaster('gradient_boosting'))
+    assert 'b' not in registry and 'a' in registry and 'c' in registry
+    assert registry.evictions == 1 and registry.total_bytes == 200
+    assert registry.status()['Key'].tolist() == ['c', 'a']
+    assert registry.status()['Model'].tolist() == ['gradient_boosting', 'random_forest']
+    # An evicted key trains again; a model over the budget on its own is still kept
+    _, trained = registry.get_or_train('b', lambda: FakeForecaster(nbytes=1000))
+    assert trained and len(registry) == 1 and 'b' in registry
+
+
+def test_failed_training_registers_nothing():
+    registry = ModelRegistry()
+
+    def fail():
+        raise RuntimeError('no data')
+
+    with pytest.raises(RuntimeError):
+        registry.get_or_train('k', fail)
+    assert 'k' not in registry
+    forecaster, trained = registry.get_or_train('k', FakeForecaster)
+    assert trained and registry.get('k') is forecaster
+
+
+def test_registered_forecaster_drops_its_training_data(sales_csv):
+    analyzer = SalesAnalyzer(str(sales_csv))
+
+    def train():
+        forecaster = SalesForecastModel(analyzer.df)
+        forecaster.train_model(params={'n_estimators': 10})
+        return forecaster
+
+    registry = ModelRegistry()
+    forecaster, _ = registry.get_or_train(model_key(analyzer.data_version, {}, 'random_forest'), train)
+    assert forecaster.df is None and forecaster.X_test is None
+    assert registry.total_bytes == forecaster.nbytes > 0
+    assert len(forecaster.result(days_ahead=7).forecast) == 7
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.eda import SalesAnalyzer
+from analysis.rolling import RollingStats
+from conftest import sales_frame
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(3)
+    return pd.Series(rng.uniform(0, 1000, 200), index=pd.date_range('2023-01-01', periods=200))
+
+
+@pytest.mark.parametrize('window', [1, 7, 30])
+@pytest.mark.parametrize('min_periods', [None, 1])
+def test_rolling_matches_pandas(series, window, min_periods):
+    stats = RollingStats(series.to_numpy(), series.index)
+    expected = series.rolling(window, min_periods=min_periods)
+    np.testing.assert_allclose(stats.rolling_sum(window, min_periods), expected.sum(), equal_nan=True)
+    np.testing.assert_allclose(stats.rolling_mean(window, min_periods), expected.mean(), equal_nan=True)
+
+
+def test_windows_and_growth(series):
+    stats = RollingStats(series.to_numpy(), series.index)
+    assert stats.window_sum(7) == pytest.approx(series.iloc[-7:].sum())
+    assert stats.window_mean(7, end=9) == pytest.approx(series.iloc[3:10].mean())
+    assert stats.window_mean(30, end=4) == pytest.approx(series.iloc[:5].mean())
+    assert stats.growth(7) == pytest.approx((series.iloc[-7:].sum() / series.iloc[-14:-7].sum() - 1) * 100)
+    assert np.isnan(stats.growth(150))
+    assert np.isnan(RollingStats().window_mean(7))
+
+
+def test_monthly_growth_matches_resample(series):
+    monthly = series.resample('MS').sum()
+    result = RollingStats(series.to_numpy(), series.index).monthly_growth()
+    np.testing.assert_allclose(result['Total_Amount'], monthly)
+    np.testing.assert_allclose(result['Growth_Rate'], monthly.pct_change() * 100, equal_nan=True)
+    assert list(result['Month']) == list(monthly.index.month)
+
+
+def test_extend_equals_building_at_once(series):
+    stats = RollingStats(series.iloc[:10].to_numpy(), series.index[:10])
+    for day in range(10, 200, 7):
+        stats.extend(series.iloc[day:day + 7].to_numpy(), series.index[day:day + 7])
+    full = RollingStats(series.to_numpy(), series.index)
+    np.testing.assert_allclose(stats.rolling_mean(14), full.rolling_mean(14), equal_nan=True)
+    np.testing.assert_array_equal(stats.dates, full.dates)
+    copy = stats.copy()
+    copy.append(1.0)
+    assert len(copy) == len(stats) + 1
+
+
+def later_rows(start, end, first_id):
+    return sales_frame(300, seed=11, first_id=first_id, start=start, end=end)
+
+
+def test_appended_days_extend_the_analyzer_stats(sales_csv):
+    analyzer = SalesAnalyzer(str(sales_csv), compact=True)
+    stats = analyzer.daily_stats()
+    analyzer.append_transactions(later_rows('2024-01-01', '2024-02-15', 900_000))
+    # Extended in place, not rebuilt
+    assert analyzer.daily_stats() is stats
+    rebuilt = RollingStats.from_frame(analyzer.sales_by_time('day'), 'Total_Amount')
+    np.testing.assert_allclose(stats.values, rebuilt.values)
+    np.testing.assert_array_equal(stats.dates, rebuilt.dates)
+    pd.testing.assert_frame_equal(analyzer.monthly_growth_rate(), rebuilt.monthly_growth())
+
+
+def test_rows_for_summed_days_rebuild_the_stats(sales_csv):
+    analyzer = SalesAnalyzer(str(sales_csv), compact=True)
+    stats = analyzer.daily_stats()
+    analyzer.append_transactions(later_rows('2023-12-01', '2024-01-15', 900_000))
+    assert analyzer.daily_stats() is not stats
+    np.testing.assert_allclose(analyzer.daily_stats().values, analyzer.sales_by_time('day')['Total_Amount'])
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.eda import SalesAnalyzer, value_quantiles
+from analysis.sketches import CustomerSketch, QuantileSketch, hll_estimate
+
+FILTERS = [
+    {},
+    {'categories': ['Books']},
+    {'start_date': '2023-02-01', 'end_date': '2023-05-31', 'regions': ['Asia', 'Europe']},
+]
+
+
+@pytest.fixture(scope='module')
+def transactions():
+    """60,000 rows over 40,000 possible customers (far above the register count) with log-normal amounts"""
+    rng = np.random.default_rng(9)
+    n = 60_000
+    return pd.DataFrame({
+        'Date': np.sort(rng.choice(pd.date_range('2023-01-01', '2023-06-30'), n)),
+        'Customer_ID': pd.Categorical([f"C{c}" for c in rng.integers(0, 40_000, n)]),
+        'Category': rng.choice(['Books', 'Sports', 'Clothing'], n),
+        'Region': rng.choice(['Asia', 'Europe', 'Africa'], n),
+        'Customer_Segment': rng.choice(['Premium', 'Regular'], n),
+        'Total_Amount': rng.lognormal(4, 1.2, n).round(2)
+    })
+
+
+def select(df, start_date=None, end_date=None, categories=None, regions=None):
+    mask = np.ones(len(df), dtype=bool)
+    if start_date:
+        mask &= df['Date'] >= start_date
+    if end_date:
+        mask &= df['Date'] <= end_date
+    if categories:
+        mask &= df['Category'].isin(categories)
+    if regions:
+        mask &= df['Region'].isin(regions)
+    return df[mask]
+
+
+@pytest.mark.parametrize('filters', FILTERS, ids=['all', 'category', 'dates + regions'])
+def test_distinct_estimate_within_error_bound(transactions, filters):
+    sketch = CustomerSketch.build(transactions)
+    exact = select(transactions, **filters)['Customer_ID'].nunique()
+    # Four standard errors: a failure is a bug, not bad luck
+    assert abs(sketch.estimate(**filters) / exact - 1) < 4 * sketch.standard_error
+
+
+@pytest.mark.parametrize('filters', FILTERS, ids=['all', 'category', 'dates + regions'])
+def test_merged_registers_equal_a_sketch_of_the_rows(transactions, filters):
+    sketch = CustomerSketch.build(transactions)
+    direct = CustomerSketch.build(select(transactions, **filters))
+    np.testing.assert_array_equal(sketch.registers(**filters), direct.registers())
+
+
+def test_small_counts_use_linear_counting():
+    registers = np.zeros(4096, dtype=np.uint8)
+    assert hll_estimate(registers) == 0
+    df = pd.DataFrame({'Date': pd.Timestamp('2023-01-01'), 'Customer_ID': [f"C{i}" for i in range(50)],
+                       'Category': 'Books', 'Region': 'Asia'})
+    assert CustomerSketch.build(df).estimate() == pytest.approx(50, abs=2)
+
+
+def test_analyzer_answers_views_from_the_customer_sketch(sales_csv):
+    analyzer = SalesAnalyzer(str(sales_csv), compact=True)
+    analyzer.build_customer_sketch()
+    view = analyzer.filtered(categories=['Books'], regions=['Asia'])
+    exact = view.df['Customer_ID'].nunique()
+    assert abs(view.unique_customers(approximate=True) - exact) <= 4 * exact * analyzer.customer_sketch.standard_error
+
+
+@pytest.mark.parametrize('filters', FILTERS, ids=['all', 'category', 'dates + regions'])
+def test_quantiles_within_relative_accuracy(transactions, filters):
+    sketch = QuantileSketch.build(transactions, 'Total_Amount', relative_accuracy=0.01)
+    qs = (0.1, 0.5, 0.9, 0.99)
+    exact = value_quantiles(select(transactions, **filters)['Total_Amount'], qs)
+    result = sketch.quantiles(qs, **filters)
+    assert result['Transactions'][0] == exact['Transactions'][0]
+    for label in ['P10', 'P50', 'P90', 'P99']:
+        assert result[label][0] == pytest.approx(exact[label][0], rel=0.01)
+
+
+def test_grouped_quantiles(transactions):
+    sketch = QuantileSketch.build(transactions, 'Total_Amount', relative_accuracy=0.02)
+    result = sketch.quantiles((0.5,), by='Customer_Segment', categories=['Sports'])
+    rows = select(transactions, categories=['Sports'])
+    exact = value_quantiles(rows['Total_Amount'], (0.5,), rows['Customer_Segment'])
+    assert result['Customer_Segment'].tolist() == exact['Customer_Segment'].tolist()
+    assert result['Transactions'].tolist() == exact['Transactions'].tolist()
+    np.testing.assert_allclose(result['P50'], exact['P50'], rtol=0.02)
+
+
+def test_zero_values_and_empty_filters():
+    df = pd.DataFrame({'Date': pd.Timestamp('2023-01-01'), 'Total_Amount': [0.0, 0.0, 5.0],
+                       'Category': 'Books', 'Region': 'Asia', 'Customer_Segment': 'Regular'})
+    sketch = QuantileSketch.build(df, 'Total_Amount')
+    assert sketch.quantiles((0.5,))['P50'][0] == 0
+    empty = sketch.quantiles((0.5,), categories=['Sports'])
+    assert empty['Transactions'][0] == 0 and np.isnan(empty['P50'][0])
+
+
+def test_analyzer_answers_views_from_the_distribution_sketches(sales_csv):
+    analyzer = SalesAnalyzer(str(sales_csv), compact=True)
+    analyzer.build_distribution_sketches()
+    view = analyzer.filtered(categories=['Books'], regions=['Asia'])
+    approximate = view.value_distribution('Total_Amount', by='Customer_Segment')
+    exact = view.value_distribution('Total_Amount', by='Customer_Segment', approximate=False)
+    assert approximate['Transactions'].tolist() == exact['Transactions'].tolist()
+    for label in ['P50', 'P90', 'P99']:
+        np.testing.assert_allclose(approximate[label], exact[label], rtol=0.01)
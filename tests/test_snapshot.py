@@ -0,0 +1,77 @@
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.eda import SalesAnalyzer
+from analysis.snapshot import Snapshot, is_fresh, source_fingerprint, write_snapshot
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_round_trip_keeps_columns_and_dtypes(sales_csv, tmp_path, compact):
+    df = SalesAnalyzer(str(sales_csv), compact=compact).df
+    path = tmp_path / 'sales.snap'
+    write_snapshot(df, path, source=source_fingerprint(sales_csv), compact=compact)
+    snapshot = Snapshot(path)
+    restored = snapshot.to_frame()
+    # Categorical codes stay memmaps, so compare categoricals by value and dtype
+    pd.testing.assert_frame_equal(restored, df.reset_index(drop=True), check_categorical=False)
+    assert restored.dtypes.to_dict() == df.dtypes.to_dict()
+    assert restored.attrs == {k: v for k, v in df.attrs.items() if isinstance(v, (str, int, float, bool))}
+    assert snapshot.rows == len(df) and snapshot.compact == compact
+    # Every column is an aligned view of the mapping, not a copy
+    for name in snapshot.columns:
+        raw = snapshot.raw(name)
+        assert not raw.flags.writeable and raw.ctypes.data % 64 == 0
+
+
+def test_freshness_follows_source_and_schema(sales_csv, tmp_path):
+    data_path = tmp_path / 'sales.csv'
+    shutil.copy(sales_csv, data_path)
+    path = str(tmp_path / 'sales.snap')
+    SalesAnalyzer(str(data_path)).write_snapshot(path)
+    assert is_fresh(path, str(data_path), compact=False)
+    assert is_fresh(path)
+    assert not is_fresh(path, str(data_path), compact=True)
+    os.utime(data_path, ns=(0, 0))
+    assert not is_fresh(path, str(data_path))
+    assert not is_fresh(str(tmp_path / 'missing.snap'))
+    (tmp_path / 'junk.snap').write_bytes(b'not a snapshot at all')
+    assert not is_fresh(str(tmp_path / 'junk.snap'))
+
+
+def test_analyzer_reuses_a_fresh_snapshot(sales_csv, tmp_path):
+    path = str(tmp_path / 'sales.snap')
+    built = SalesAnalyzer(str(sales_csv), compact=True, snapshot_path=path)
+    mtime = os.stat(path).st_mtime_ns
+    reopened = SalesAnalyzer(str(sales_csv), compact=True, snapshot_path=path)
+    assert os.stat(path).st_mtime_ns == mtime
+    assert reopened.data_version == built.data_version
+    pd.testing.assert_frame_equal(reopened.sales_by_category(), built.sales_by_category())
+    standalone = SalesAnalyzer.from_snapshot(path)
+    assert standalone.memory_report()['mapped_bytes'] > 0
+    pd.testing.assert_frame_equal(standalone.sales_by_region(), built.sales_by_region())
+
+
+def test_concurrent_writes_leave_one_complete_snapshot(sales_csv, tmp_path):
+    df = SalesAnalyzer(str(sales_csv)).df
+    path = str(tmp_path / 'sales.snap')
+    errors = []
+
+    def write():
+        try:
+            write_snapshot(df, path)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert os.listdir(tmp_path) == ['sales.snap']
+    np.testing.assert_array_equal(Snapshot(path).column('Total_Amount'), df['Total_Amount'])
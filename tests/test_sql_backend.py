@@ -0,0 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from analysis.eda import SalesAnalyzer
+from analysis.sql_backend import SQLiteSalesAnalyzer, build_database, verify_parity
+
+
+@pytest.mark.parametrize('filters', [
+    None,
+    {'start_date': '2023-03-01', 'end_date': '2023-09-30'},
+    {'categories': ['Books', 'Electronics'], 'regions': ['Asia']},
+], ids=['unfiltered', 'date range', 'category + region'])
+def test_sqlite_matches_pandas(sales_csv, tmp_path, filters):
+    assert verify_parity(str(sales_csv), str(tmp_path / 'sales.db'), filters) == []
+
+
+def test_memory_report_counts_database_pages(sales_csv, tmp_path):
+    analyzer = SQLiteSalesAnalyzer.from_csv(str(sales_csv), str(tmp_path / 'sales.db'))
+    report = analyzer.memory_report()
+    assert report['rows'] == 3000
+    assert report['total_bytes'] == report['database_bytes'] == (tmp_path / 'sales.db').stat().st_size
+    assert report['bytes_per_row'] > 0
+
+
+def test_chained_views_keep_earlier_filters(sales_csv, tmp_path):
+    sqlite = SQLiteSalesAnalyzer.from_csv(str(sales_csv), str(tmp_path / 'sales.db'))
+    pandas = SalesAnalyzer(str(sales_csv), compact=True)
+    chain = [{'categories': ['Books', 'Sports']}, {'start_date': '2023-06-01'}, {'regions': ['Asia']}]
+    for filters in chain:
+        sqlite, pandas = sqlite.filtered(**filters), pandas.filtered(**filters)
+    assert sqlite.filters == pandas.filters
+    assert sqlite.row_count() == pandas.row_count() > 0
+    assert sqlite.get_summary_stats()['total_sales'] == pytest.approx(pandas.get_summary_stats()['total_sales'])
+
+
+def test_concurrent_builds_do_not_share_a_temporary_file(sales_csv, tmp_path):
+    db_path = str(tmp_path / 'sales.db')
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda _: build_database(str(sales_csv), db_path), range(4)))
+    assert SQLiteSalesAnalyzer(db_path).row_count() == 3000
+    assert [path.name for path in tmp_path.iterdir()] == ['sales.db']
@@ -0,0 +1,49 @@
+import os
+import json
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.run_benchmarks import default_worker_counts, parse_importtime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded only when a forecast, the SQLite backend or an affinity view first needs them
+HEAVY_MODULES = ['sklearn', 'scipy', 'joblib', 'analysis.model', 'analysis.sql_backend']
+
+
+def loaded_after(code, sales_csv):
+    env = {**os.environ, 'SALES_DATA_PATH': str(sales_csv)}
+    result = subprocess.run([sys.executable, '-c', f"{code}; import sys, json; print(json.dumps(list(sys.modules)))"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return set(json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def test_dashboard_start_up_skips_heavy_modules(sales_csv):
+    app = os.path.join(ROOT, 'dashboard', 'app.py')
+    modules = loaded_after(f"import runpy; runpy.run_path({app!r}, run_name='dashboard')", sales_csv)
+    assert 'analysis.eda' in modules
+    assert [name for name in HEAVY_MODULES if name in modules] == []
+
+
+def test_forecast_module_loads_scikit_learn(sales_csv):
+    modules = loaded_after("import analysis.model", sales_csv)
+    assert 'sklearn' in modules
+
+
+def test_parse_importtime():
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   _io\n"
+              "import time:      1500 |       2000 | pandas\n"
+              "unrelated line\n")
+    rows = parse_importtime(stderr)
+    assert rows['module'].tolist() == ['_io', 'pandas']
+    assert rows['depth'].tolist() == [1, 0]
+    assert rows['cumulative_ms'].tolist() == pytest.approx([0.12, 2.0])
+
+
+def test_default_worker_counts_end_at_the_core_count():
+    counts = default_worker_counts()
+    assert counts[0] == 1 and counts[-1] == (os.cpu_count() or 1)
+    assert counts == sorted(set(counts))
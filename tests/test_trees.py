@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression
+
+from analysis.eda import load_transactions
+from analysis.model import SalesForecastModel
+from analysis.trees import FlatForest, model_fingerprint, trees_path
+
+
+@pytest.fixture(scope='module')
+def data():
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(400, 6))
+    y = X[:, 0] * 3 + np.sin(X[:, 1]) + rng.normal(scale=0.1, size=400)
+    return X, y, rng.normal(size=(200, 6))
+
+
+@pytest.mark.parametrize('model', [
+    RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    GradientBoostingRegressor(n_estimators=30, max_depth=3, random_state=0),
+    GradientBoostingRegressor(n_estimators=10, init='zero', random_state=0),
+], ids=['random forest', 'gradient boosting', 'zero init'])
+def test_predictions_identical_to_sklearn(data, model):
+    X, y, X_new = data
+    model.fit(X, y)
+    engine = FlatForest.from_model(model)
+    np.testing.assert_array_equal(engine.predict(X_new), model.predict(X_new))
+    np.testing.assert_array_equal(engine.predict(X_new[0]), model.predict(X_new[:1]))
+
+
+def test_missing_values_follow_the_learned_direction(data):
+    X, y, X_new = data
+    X = X.copy()
+    X[::5, 0] = np.nan
+    X_new = X_new.copy()
+    X_new[::3, 0] = np.nan
+    X_new[::4, 2] = np.nan
+    model = RandomForestRegressor(n_estimators=20, random_state=0).fit(X, y)
+    np.testing.assert_array_equal(FlatForest.from_model(model).predict(X_new), model.predict(X_new))
+
+
+def test_save_and_load_round_trip(data, tmp_path):
+    X, y, X_new = data
+    model = GradientBoostingRegressor(n_estimators=15, random_state=0).fit(X, y)
+    engine = FlatForest.from_model(model)
+    engine.save(tmp_path / 'm.trees.npz')
+    loaded = FlatForest.load(tmp_path / 'm.trees.npz')
+    assert loaded.fingerprint == engine.fingerprint
+    np.testing.assert_array_equal(loaded.predict(X_new), model.predict(X_new))
+
+
+def test_unsupported_models_are_rejected():
+    with pytest.raises(ValueError):
+        FlatForest.from_model(LinearRegression().fit([[0.0], [1.0]], [0.0, 1.0]))
+
+
+def test_stale_sidecar_is_ignored(sales_csv, tmp_path):
+    df = load_transactions(str(sales_csv))
+    path = str(tmp_path / 'model.joblib')
+    forest = SalesForecastModel(df)
+    forest.train_model('random_forest')
+    forest.save_model(path)
+    stale = FlatForest.load(trees_path(path))
+
+    # Another model saved to the same path without its arrays, e.g. by an older version
+    boosting = SalesForecastModel(df)
+    boosting.train_model('gradient_boosting')
+    boosting.engine = None
+    boosting.save_model(path)
+    stale.save(trees_path(path))
+
+    loaded = SalesForecastModel(df)
+    loaded.load_model(path)
+    assert loaded.engine.fingerprint == model_fingerprint(boosting.model) != stale.fingerprint
+    assert loaded.engine.kind == 'sum'
+    X = boosting.X_test.to_numpy(np.float64)
+    np.testing.assert_allclose(loaded.predict_rows(X), boosting.model.predict(boosting.X_test))
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from analysis import tuning
+from analysis.eda import SalesAnalyzer
+from analysis.tuning import (CONFIG_FORMAT, SEARCH_SPACES, TrialCache, load_config, sample_candidates,
+                             save_config, successive_halving, tune, tuned_params)
+
+SEARCH = dict(n_candidates=9, eta=3, min_estimators=5, max_estimators=45, n_splits=3, n_jobs=1)
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1, (120, 4))
+    y = 100 * X[:, 0] + 20 * X[:, 1] ** 2 + rng.normal(0, 1, 120)
+    return X, y
+
+
+@pytest.fixture
+def fits(monkeypatch):
+    """Count the trials actually fitted"""
+    calls = []
+    fit_score = tuning._fit_score
+
+    def counted(*args):
+        calls.append(args[:2])
+        return fit_score(*args)
+
+    monkeypatch.setattr(tuning, '_fit_score', counted)
+    return calls
+
+
+def test_candidates_are_distinct_and_reproducible():
+    space = SEARCH_SPACES['random_forest']
+    picks = sample_candidates(space, 10)
+    assert picks == sample_candidates(space, 10)
+    assert len({json.dumps(p, sort_keys=True) for p in picks}) == 10
+    assert len(sample_candidates({'a': [1, 2], 'b': [3]}, 10)) == 2
+
+
+def test_each_rung_keeps_the_best_third_with_three_times_the_trees(data, fits):
+    result = successive_halving(*data, 'random_forest', **SEARCH)
+    assert [(r['n_estimators'], r['candidates']) for r in result['rungs']] == [(5, 9), (15, 3), (45, 1)]
+    assert result['params']['n_estimators'] == 45
+    assert len(fits) == (9 + 3 + 1) * 3
+    assert result['cv_mae'] == result['rungs'][-1]['best_mae']
+    baseline = successive_halving(*data, 'linear_regression', **SEARCH)
+    assert baseline['params'] == {} and baseline['rungs'] == []
+
+
+def test_search_resumes_from_the_trial_file(data, fits, tmp_path):
+    path = str(tmp_path / 'trials.jsonl')
+    first = successive_halving(*data, 'gradient_boosting', cache=TrialCache(path), **SEARCH)
+    n_trials = len(fits)
+    # An interrupted run leaves a partial last line behind
+    with open(path, 'a') as f:
+        f.write('{"key": "trunc')
+    cache = TrialCache(path)
+    assert len(cache) == n_trials
+    again = successive_halving(*data, 'gradient_boosting', cache=cache, **SEARCH)
+    assert again == first
+    assert len(fits) == n_trials and cache.reused == n_trials
+    # A search over more candidates only fits the new ones
+    cache = TrialCache(path)
+    wider = successive_halving(*data, 'gradient_boosting', cache=cache, **{**SEARCH, 'n_candidates': 12})
+    assert wider['rungs'][0]['candidates'] == 12
+    assert cache.reused > 0
+    assert len(fits) - n_trials + cache.reused == 3 * sum(rung['candidates'] for rung in wider['rungs'])
+
+
+def test_trials_only_match_the_same_data(data, fits, tmp_path):
+    path = str(tmp_path / 'trials.jsonl')
+    X, y = data
+    successive_halving(X, y, 'random_forest', cache=TrialCache(path), **SEARCH)
+    n_trials = len(fits)
+    cache = TrialCache(path)
+    successive_halving(X, y + 1, 'random_forest', cache=cache, **SEARCH)
+    assert cache.reused == 0 and len(fits) == 2 * n_trials
+
+
+def test_config_round_trip(tmp_path):
+    path = str(tmp_path / 'models' / 'config.json')
+    config = {'format': CONFIG_FORMAT, 'best': 'random_forest',
+              'models': {'random_forest': {'params': {'max_depth': None, 'n_estimators': 45}, 'cv_mae': 1.5}}}
+    assert load_config(path) is None
+    save_config(config, path)
+    assert load_config(path) == config
+    assert os.listdir(os.path.dirname(path)) == ['config.json']
+    assert tuned_params(load_config(path), 'random_forest') == {'max_depth': None, 'n_estimators': 45}
+    assert tuned_params(load_config(path), 'gradient_boosting') is None
+    assert tuned_params(None, 'random_forest') is None
+    save_config({**config, 'format': CONFIG_FORMAT + 1}, path)
+    assert load_config(path) is None
+    with open(path, 'w') as f:
+        f.write('{"format": 1, "be')
+    assert load_config(path) is None
+
+
+def test_concurrent_saves_leave_one_complete_config(tmp_path):
+    path = str(tmp_path / 'config.json')
+    configs = [{'format': CONFIG_FORMAT, 'best': str(i), 'models': {}} for i in range(4)]
+    errors = []
+
+    def save(config):
+        try:
+            for _ in range(50):
+                save_config(config, path)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=save, args=(config,)) for config in configs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert load_config(path) in configs
+    assert os.listdir(tmp_path) == ['config.json']
+
+
+def test_tune_searches_every_family_out_of_sample(sales_csv, tmp_path):
+    df = SalesAnalyzer(str(sales_csv)).df
+    config = tune(df, ['random_forest', 'linear_regression'], trials_path=str(tmp_path / 'trials.jsonl'),
+                  n_candidates=3, min_estimators=5, max_estimators=15, n_splits=2, n_jobs=1)
+    assert set(config['models']) == {'random_forest', 'linear_regression'}
+    assert config['best'] == min(config['models'], key=lambda m: config['models'][m]['cv_mae'])
+    assert config['n_splits'] == 2 and config['format'] == CONFIG_FORMAT
+    # The most recent fifth of the days is held out for train_model's test metrics
+    days = df['Date'].dt.normalize().nunique()
+    assert config['rows'] < 0.8 * days
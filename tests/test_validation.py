@@ -0,0 +1,97 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.eda import SalesAnalyzer, validate_transactions
+from analysis.validation import (REASONS_COLUMN, SALES_SCHEMA, SOURCE_ROW_COLUMN, load_schema,
+                                 sales_schema, schema_for, write_quarantine)
+from conftest import sales_frame
+
+ALLOWED = {'Region': ['North America', 'Europe', 'Asia'], 'Category': ['Electronics', 'Clothing', 'Books', 'Sports']}
+
+
+@pytest.fixture
+def dirty():
+    df = sales_frame(200).astype({'Quantity': object, 'Date': object})
+    df.loc[3, 'Quantity'] = 0
+    df.loc[4, 'Quantity'] = 'two'
+    df.loc[5, 'Date'] = 'not a date'
+    df.loc[6, 'Region'] = 'Atlantis'
+    df.loc[7, 'Discount_Percent'] = 150
+    df.loc[8, ['Quantity', 'Region']] = [1.5, np.nan]
+    df.loc[9, 'Customer_Segment'] = np.nan
+    return df
+
+
+def test_failing_rows_are_quarantined_with_every_reason(dirty):
+    result = sales_schema(allowed=ALLOWED).validate(dirty, first_row=2)
+    quarantined = result.quarantined.set_index(SOURCE_ROW_COLUMN)[REASONS_COLUMN]
+    assert quarantined.to_dict() == {
+        5: 'Quantity is below 1',
+        6: 'Quantity is not a valid number',
+        7: 'Date is not a valid date',
+        8: 'Region is not a known value',
+        9: 'Discount_Percent is above 100',
+        10: 'Quantity is not a whole number; Region is missing',
+    }
+    assert len(result.valid) == len(dirty) - 6
+    # Valid rows come back parsed; a null segment is allowed
+    assert pd.api.types.is_datetime64_any_dtype(result.valid['Date'])
+    assert pd.api.types.is_numeric_dtype(result.valid['Quantity'])
+    assert 9 in result.valid.index
+    assert result.summary().sum() == 7
+
+
+def test_categorical_columns_validate_like_text(dirty):
+    schema = sales_schema(allowed=ALLOWED)
+    text = schema.validate(dirty).quarantined
+    categorical = schema.validate(dirty.astype({'Region': 'category', 'Category': 'category'})).quarantined
+    assert text[REASONS_COLUMN].tolist() == categorical[REASONS_COLUMN].tolist()
+
+
+def test_ratio_check_and_required_columns():
+    df = sales_frame(50)
+    df.loc[2, 'Total_Amount'] *= 3
+    result = sales_schema(amount_ratio_bounds=(0.5, 1.01)).validate(df)
+    assert result.quarantined.index.tolist() == [2]
+    assert 'inconsistent' in result.quarantined[REASONS_COLUMN].iloc[0]
+    assert SALES_SCHEMA.validate(df).n_quarantined == 0
+    with pytest.raises(ValueError, match='Total_Amount'):
+        SALES_SCHEMA.validate(df.drop(columns='Total_Amount'))
+
+
+def test_schema_file_next_to_the_data(tmp_path, dirty):
+    data_path = tmp_path / 'sales.csv'
+    assert schema_for(str(data_path)) is SALES_SCHEMA
+    (tmp_path / 'sales.schema.json').write_text(json.dumps({'allowed': ALLOWED, 'amount_ratio_bounds': [0.5, 1.01]}))
+    schema = schema_for(str(data_path))
+    assert schema.columns['Region'].allowed == ALLOWED['Region'] and len(schema.checks) == 1
+    assert schema.validate(dirty).n_quarantined == load_schema(tmp_path / 'sales.schema.json').validate(dirty).n_quarantined
+
+
+def test_quarantine_file_reflects_the_latest_load(tmp_path, dirty):
+    path = tmp_path / 'quarantine.csv'
+    validate_transactions(dirty, sales_schema(allowed=ALLOWED), str(path), first_row=2)
+    assert len(pd.read_csv(path)) == 6
+    validate_transactions(dirty.iloc[:4], sales_schema(allowed=ALLOWED), str(path), first_row=2)
+    assert pd.read_csv(path)[SOURCE_ROW_COLUMN].tolist() == [5]
+    # Appended batches add rows under the existing header
+    validate_transactions(dirty.iloc[5:7], sales_schema(allowed=ALLOWED), str(path), first_row=100, append=True)
+    assert pd.read_csv(path)[SOURCE_ROW_COLUMN].tolist() == [5, 100, 101]
+    valid = validate_transactions(dirty.iloc[10:], SALES_SCHEMA, str(path))
+    assert not path.exists() and valid.attrs['quarantined_rows'] == 0
+    assert write_quarantine(dirty.iloc[:0], str(path)) is None
+
+
+def test_analyzer_skips_and_reports_invalid_rows(tmp_path, dirty):
+    data_path = tmp_path / 'sales.csv'
+    dirty.to_csv(data_path, index=False)
+    quarantine_path = tmp_path / 'quarantine.csv'
+    analyzer = SalesAnalyzer(str(data_path), compact=True, schema=sales_schema(allowed=ALLOWED),
+                             quarantine_path=str(quarantine_path))
+    assert analyzer.quarantined_rows == 6
+    assert len(analyzer.df) == len(dirty) - 6
+    # Line numbers in the file, counting the header
+    assert pd.read_csv(quarantine_path)[SOURCE_ROW_COLUMN].tolist() == [5, 6, 7, 8, 9, 10]